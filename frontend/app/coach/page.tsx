@@ -37,6 +37,9 @@ export default function CoachPage() {
   const [loginUserId, setLoginUserId] = useState("")
   const [isLoggingIn, setIsLoggingIn] = useState(false)
   const [userData, setUserData] = useState<any>(null)
+  const [sessionToken, setSessionToken] = useState<string | null>(null)
+  const [streamStatus, setStreamStatus] = useState("")
+  const [streamDraft, setStreamDraft] = useState("")
   const messagesEndRef = useRef<HTMLDivElement>(null)
   const inputRef = useRef<HTMLInputElement>(null)
 
@@ -66,6 +69,7 @@ export default function CoachPage() {
       if (data.success) {
         setIsLoggedIn(true)
         setUserData(data.user_data)
+        setSessionToken(data.session_token)
         setMessages([
           {
             id: "1",
@@ -100,28 +104,76 @@ export default function CoachPage() {
     setIsTyping(true)
 
     try {
-      const response = await fetch(`${API_BASE_URL}/api/chat`, {
+      const response = await fetch(`${API_BASE_URL}/api/chat/stream`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
         },
         body: JSON.stringify({ 
           message: content.trim(),
-          user_id: loginUserId 
+          user_id: loginUserId,
+          session_token: sessionToken
         }),
       })
 
-      if (!response.ok) {
+      if (response.status === 401) {
+        // Session expired or was evicted on the server; ask the user to log in again
+        setIsLoggedIn(false)
+        setSessionToken(null)
+        alert("Your session has expired. Please log in again.")
+        return
+      }
+
+      if (!response.ok || !response.body) {
         throw new Error(`HTTP error! status: ${response.status}`)
       }
 
-      const data = await response.json()
+      // Server-sent events: show progress and tokens as they arrive, then the final reply
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ""
+      let draftAgent = ""
+      let final: any = null
+      while (!final) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+        const chunks = buffer.split("\n\n")
+        buffer = chunks.pop() ?? ""
+        for (const chunk of chunks) {
+          const dataLine = chunk.split("\n").find(line => line.startsWith("data: "))
+          if (!dataLine) continue
+          const event = JSON.parse(dataLine.slice(6))
+          if (event.type === "delegation") {
+            setStreamStatus(`Asking the ${event.coworker}...`)
+          } else if (event.type === "agent") {
+            setStreamStatus(`${event.agent} is working...`)
+          } else if (event.type === "tool") {
+            setStreamStatus(`Using ${event.tool}...`)
+          } else if (event.type === "token") {
+            // Each agent's output replaces the previous one's draft
+            if (event.agent !== draftAgent) {
+              draftAgent = event.agent
+              setStreamDraft("")
+            }
+            setStreamDraft(prev => prev + event.text)
+          } else if (event.type === "final" || event.type === "error") {
+            final = event
+          }
+        }
+      }
+
+      if (!final) {
+        throw new Error("Stream ended without a reply")
+      }
 
       const coachMessage: Message = {
         id: (Date.now() + 1).toString(),
-        content: data.response,
+        content: final.type === "final"
+          ? final.response
+          : `I'm sorry, I'm having trouble processing your request right now. Error: ${final.detail}`,
         sender: "coach",
-        timestamp: new Date(data.timestamp),
+        timestamp: final.timestamp ? new Date(final.timestamp) : new Date(),
       }
 
       setMessages(prev => [...prev, coachMessage])
@@ -136,6 +188,8 @@ export default function CoachPage() {
       setMessages(prev => [...prev, errorMessage])
     } finally {
       setIsTyping(false)
+      setStreamStatus("")
+      setStreamDraft("")
     }
   }
 
@@ -379,10 +433,14 @@ export default function CoachPage() {
                       <Sparkles className="h-4 w-4 text-white" />
                     </div>
                     <div className="bg-white/10 border border-white/20 rounded-2xl px-4 py-2 backdrop-blur-sm">
-                      <div className="flex space-x-1">
+                      {streamDraft && (
+                        <p className="text-sm text-white/80 whitespace-pre-wrap mb-2">{streamDraft}</p>
+                      )}
+                      <div className="flex items-center space-x-1">
                         <div className="w-2 h-2 bg-white/60 rounded-full animate-pulse" />
                         <div className="w-2 h-2 bg-white/60 rounded-full animate-pulse" style={{ animationDelay: "0.2s" }} />
                         <div className="w-2 h-2 bg-white/60 rounded-full animate-pulse" style={{ animationDelay: "0.4s" }} />
+                        {streamStatus && <span className="pl-2 text-xs text-white/60">{streamStatus}</span>}
                       </div>
                     </div>
                   </div>
@@ -0,0 +1,344 @@
+"""Population analytics for the analytics dashboard.
+
+Each dataset is turned once into flat NumPy arrays (user code, date, one
+float64 column per metric) and every query is a vectorized group-by over
+them: np.unique/np.bincount for weekly and monthly rollups and for
+fitness_level/goals breakdowns, and cumulative sums for moving averages. No
+per-row Python runs at query time.
+
+Frames are rebuilt when the store reloads its base data. Rows appended
+through the store are folded into the cached frame: the next query
+concatenates them onto its arrays instead of rebuilding the whole frame.
+With the columnar backend the frame columns are the memory-mapped
+arrays themselves; with the sharded backend every shard is parsed in its own
+process.
+"""
+import math
+import threading
+from functools import partial
+
+import numpy as np
+
+from .data_store import get_data_store
+
+DATASETS = ("activities", "measurements", "nutrition")
+PERIODS = {"week": "datetime64[W]", "month": "datetime64[M]"}
+GROUP_FIELDS = ("fitness_level", "goals")
+WEEK_SHIFT = np.timedelta64(3, "D")
+
+
+class _Frame:
+    """Flat arrays for one dataset across all users"""
+
+    def __init__(self, users, user_codes, dates, column_getter, metrics):
+        self.users = users                  # user_id per user code
+        self.user_codes = user_codes        # int64 user code per row
+        self.dates = dates                  # datetime64[D] per row
+        self.metrics = metrics
+        self._column_getter = column_getter
+        self._columns = {}
+        self.groups = {}
+
+    def column(self, metric):
+        if metric not in self.metrics:
+            raise ValueError(f"Unknown metric: {metric}. Available: {', '.join(self.metrics)}")
+        array = self._columns.get(metric)
+        if array is None:
+            array = np.asarray(self._column_getter(metric), dtype=np.float64)
+            self._columns[metric] = array
+        return array
+
+    def extend(self, rows):
+        """Return a new frame with appended rows concatenated onto these arrays"""
+        codes = {user_id: code for code, user_id in enumerate(self.users)}
+        users = list(self.users)
+        for row in rows:
+            if row["user_id"] not in codes:
+                codes[row["user_id"]] = len(users)
+                users.append(row["user_id"])
+        user_codes = np.concatenate(
+            (self.user_codes, np.fromiter((codes[row["user_id"]] for row in rows), dtype=np.int64, count=len(rows)))
+        )
+        dates = np.concatenate((self.dates, np.array([row.get("date", "NaT") for row in rows], dtype="datetime64[D]")))
+        metrics = self.metrics + [m for m in _numeric_fields(rows) if m not in self.metrics]
+        # Materialize every column so the new frame keeps no reference to this one
+        columns = {
+            m: np.concatenate((
+                self.column(m) if m in self.metrics else np.full(len(self.dates), np.nan),
+                np.array([row.get(m, math.nan) for row in rows], dtype=np.float64),
+            ))
+            for m in metrics
+        }
+        frame = _Frame(users, user_codes, dates, columns.__getitem__, metrics)
+        if len(users) == len(self.users):
+            frame.groups = self.groups
+        return frame
+
+
+def _numeric_fields(rows):
+    fields = []
+    for row in rows:
+        for key, value in row.items():
+            if key not in fields and isinstance(value, (int, float)) and not isinstance(value, bool):
+                fields.append(key)
+    return fields
+
+
+def _frame_from_rows(rows_by_user):
+    """Build a frame from {user_id: rows}; the only per-row loop, run once per data change"""
+    users = list(rows_by_user)
+    lengths = np.fromiter((len(rows_by_user[u]) for u in users), dtype=np.int64, count=len(users))
+    rows = [row for u in users for row in rows_by_user[u]]
+    user_codes = np.repeat(np.arange(len(users), dtype=np.int64), lengths)
+    dates = np.array([row.get("date", "NaT") for row in rows], dtype="datetime64[D]")
+    metrics = _numeric_fields(rows)
+
+    def column(metric):
+        return [row.get(metric, math.nan) for row in rows]
+
+    return _Frame(users, user_codes, dates, column, metrics)
+
+
+def _frame_from_columnar(store, dataset):
+    spans = sorted(store.user_spans(dataset).items(), key=lambda item: item[1][0])
+    if not spans:
+        return _frame_from_rows({})
+    users = [user_id for user_id, _ in spans]
+    lengths = np.array([stop - start for _, (start, stop) in spans], dtype=np.int64)
+    user_codes = np.repeat(np.arange(len(users), dtype=np.int64), lengths)
+    dates = np.asarray(store.column(dataset, "date")).astype("datetime64[D]")
+    return _Frame(
+        users, user_codes, dates, lambda m: store.column(dataset, m), store.numeric_fields(dataset)
+    )
+
+
+def shard_frame_arrays(dataset, shard_dir):
+    """Process-pool worker: parse one shard and return its frame as plain arrays"""
+    from .data_store import JSONUserStore
+    frame = _frame_from_rows(JSONUserStore(shard_dir).rows_by_user(dataset))
+    lengths = np.bincount(frame.user_codes, minlength=len(frame.users))
+    return frame.users, lengths, frame.dates, {m: frame.column(m) for m in frame.metrics}
+
+
+def _frame_from_shards(store, dataset):
+    """Parse every shard in parallel and concatenate the per-shard arrays"""
+    from .shards import map_shards
+    parts = map_shards(partial(shard_frame_arrays, dataset), store.shards_dir)
+    if not parts:
+        return _frame_from_rows({})
+    users = [user_id for part in parts for user_id in part[0]]
+    lengths = np.concatenate([part[1] for part in parts])
+    user_codes = np.repeat(np.arange(len(users), dtype=np.int64), lengths)
+    dates = np.concatenate([part[2] for part in parts])
+    metrics = []
+    for part in parts:
+        metrics.extend(m for m in part[3] if m not in metrics)
+    columns = {
+        m: np.concatenate([part[3].get(m, np.full(len(part[2]), np.nan)) for part in parts])
+        for m in metrics
+    }
+    return _Frame(users, user_codes, dates, columns.__getitem__, metrics)
+
+
+def _summaries(sums, counts):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+    return means
+
+
+def _clean(value):
+    value = float(value)
+    return None if math.isnan(value) else round(value, 2)
+
+
+class AnalyticsEngine:
+    """Vectorized rollups, moving averages and cohort breakdowns over all users"""
+
+    def __init__(self, store=None):
+        self._store = store
+        self._subscribed = None
+        self._frames = {}
+        # Rows appended since each cached frame was built, and the datasets being rebuilt
+        self._pending = {dataset: [] for dataset in DATASETS}
+        self._building = {}
+        self._pending_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        store = self._store or get_data_store()
+        if self._subscribed is not store:
+            store.subscribe(self._on_append)
+            self._subscribed = store
+        return store
+
+    def _on_append(self, dataset, record):
+        with self._pending_lock:
+            if dataset in self._building:
+                # The row may or may not be in the snapshot being built
+                self._building[dataset] = True
+            elif dataset in self._pending:
+                self._pending[dataset].append(record)
+
+    def frame(self, dataset):
+        """Return the cached frame for a dataset, folding in appended rows or
+        rebuilding it if the base data was reloaded"""
+        if dataset not in DATASETS:
+            raise ValueError(f"Unknown dataset: {dataset}")
+        store = self.store
+        token = store.version()
+        cached = self._frames.get(dataset)
+        if cached is not None and cached[0] == token and not self._pending[dataset]:
+            return cached[1]
+
+        with self._lock:
+            cached = self._frames.get(dataset)
+            with self._pending_lock:
+                if cached is not None and cached[0] == token:
+                    rows, self._pending[dataset] = self._pending[dataset], []
+                else:
+                    rows = None
+                    self._pending[dataset] = []
+                    self._building[dataset] = False
+            if rows is not None:
+                if rows:
+                    self._frames[dataset] = (token, cached[1].extend(rows))
+                return self._frames[dataset][1]
+
+            try:
+                from .columnar import ColumnarUserStore
+                from .shards import ShardedUserStore
+                if isinstance(store, ColumnarUserStore):
+                    frame = _frame_from_columnar(store, dataset)
+                elif isinstance(store, ShardedUserStore):
+                    frame = _frame_from_shards(store, dataset)
+                else:
+                    frame = _frame_from_rows(store.rows_by_user(dataset))
+                # Deliver anything that became visible while the snapshot was read
+                store.version()
+            finally:
+                with self._pending_lock:
+                    raced = self._building.pop(dataset)
+            if raced:
+                # Serve this frame but do not cache it; the next query rebuilds
+                self._frames.pop(dataset, None)
+                return frame
+            self._frames[dataset] = (token, frame)
+            return frame
+
+    def _valid(self, frame, metric):
+        values = frame.column(metric)
+        mask = ~np.isnan(values) & ~np.isnat(frame.dates)
+        return values, mask
+
+    def rollups(self, dataset, metric, period="week"):
+        """Mean, total and row count of a metric per calendar week or month"""
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period: {period}. Use one of: {', '.join(PERIODS)}")
+        frame = self.frame(dataset)
+        values, mask = self._valid(frame, metric)
+        dates = frame.dates[mask]
+        # datetime64 weeks start on Thursday (the epoch's weekday); shift so they start on Monday
+        shift = WEEK_SHIFT if period == "week" else np.timedelta64(0, "D")
+        keys = (dates + shift).astype(PERIODS[period])
+        periods, inverse = np.unique(keys, return_inverse=True)
+        sums = np.bincount(inverse, weights=values[mask], minlength=len(periods))
+        counts = np.bincount(inverse, minlength=len(periods))
+        users = np.bincount(
+            np.unique(inverse * len(frame.users) + frame.user_codes[mask]) // max(len(frame.users), 1),
+            minlength=len(periods),
+        )
+        means = _summaries(sums, counts)
+        return [
+            {
+                "period": str(p.astype("datetime64[D]") - shift),
+                "mean": _clean(m),
+                "total": _clean(s),
+                "rows": int(c),
+                "users": int(u),
+            }
+            for p, m, s, c, u in zip(periods, means, sums, counts, users)
+        ]
+
+    def moving_average(self, dataset, metric, window=7):
+        """Daily population mean of a metric and its trailing moving average"""
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        frame = self.frame(dataset)
+        values, mask = self._valid(frame, metric)
+        dates = frame.dates[mask]
+        if not len(dates):
+            return []
+
+        start = dates.min()
+        offsets = (dates - start).astype(np.int64)
+        days = int(offsets.max()) + 1
+        sums = np.bincount(offsets, weights=values[mask], minlength=days)
+        counts = np.bincount(offsets, minlength=days)
+        daily = _summaries(sums, counts)
+
+        # Trailing window over days that have data: cumulative sums of the
+        # daily means and of the has-data flags, differenced `window` apart
+        has_data = counts > 0
+        csum = np.concatenate(([0.0], np.cumsum(np.where(has_data, daily, 0.0))))
+        cnt = np.concatenate(([0], np.cumsum(has_data)))
+        lo = np.maximum(np.arange(days) + 1 - window, 0)
+        hi = np.arange(days) + 1
+        window_days = cnt[hi] - cnt[lo]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            moving = np.where(window_days > 0, (csum[hi] - csum[lo]) / np.maximum(window_days, 1), np.nan)
+
+        calendar = start + np.arange(days)
+        return [
+            {"date": str(d), "mean": _clean(m), "moving_average": _clean(ma), "rows": int(c)}
+            for d, m, ma, c in zip(calendar, daily, moving, counts)
+            if c > 0
+        ]
+
+    def _group_codes(self, frame, by):
+        """Map each user code to a group code for fitness_level, goals or both"""
+        fields = GROUP_FIELDS if by == "both" else (by,)
+        if any(f not in GROUP_FIELDS for f in fields):
+            raise ValueError(f"Unknown grouping: {by}. Use fitness_level, goals or both")
+        cached = frame.groups.get(by)
+        if cached is None:
+            # One profile lookup per user (not per row), cached with the frame
+            store = self.store
+            labels = []
+            for user_id in frame.users:
+                profile = store.profile(user_id) or {}
+                labels.append(" / ".join(str(profile.get(f) or "unknown") for f in fields))
+            cached = np.unique(np.array(labels, dtype=np.str_), return_inverse=True)
+            frame.groups[by] = cached
+        return cached
+
+    def group_breakdown(self, dataset, metric, by="fitness_level"):
+        """Mean of a metric and user counts per fitness_level / goals group"""
+        frame = self.frame(dataset)
+        if not frame.users:
+            return []
+        values, mask = self._valid(frame, metric)
+        names, user_groups = self._group_codes(frame, by)
+        row_groups = user_groups[frame.user_codes[mask]]
+        sums = np.bincount(row_groups, weights=values[mask], minlength=len(names))
+        counts = np.bincount(row_groups, minlength=len(names))
+        users = np.bincount(user_groups, minlength=len(names))
+        means = _summaries(sums, counts)
+        return [
+            {"group": str(n), "mean": _clean(m), "rows": int(c), "users": int(u)}
+            for n, m, c, u in zip(names, means, counts, users)
+        ]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_analytics_engine():
+    """Return the process-wide analytics engine"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AnalyticsEngine()
+    return _engine
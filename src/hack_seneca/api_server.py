@@ -1,14 +1,30 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
+import asyncio
 import json
 import re
 import os
-from datetime import datetime
+from datetime import date, datetime
 
 # Import CrewAI
-from .crew import FitnessCrew
+from .crew_pool import PoolExhausted, get_crew_pool
+from .main import load_user_data
+from .data_store import get_data_store
+from .analytics import get_analytics_engine
+from .sketches import get_cohort_sketches
+from .sessions import get_session_store
+from .metrics import get_metrics
+from .kickoff_executor import Overloaded, get_kickoff_executor
+from .chat_stream import ChatStream, format_sse
+from .jobs import QueueFull, get_job_queue
+from .singleflight import get_chat_single_flight
+from .response_cache import get_response_cache
+from .intent import classify
+from .profiles import resolve_profile
+from .conversations import NEW_CONVERSATION, clean_response, get_conversation_store
 
 app = FastAPI(title="Fitness Coach AI API", version="1.0.0")
 
@@ -21,10 +37,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global variables to store current user session
-current_user_data = None
-current_user_id = None
-
 # Pydantic models for request/response
 class LoginRequest(BaseModel):
     user_id: str
@@ -33,15 +45,44 @@ class LoginResponse(BaseModel):
     success: bool
     message: str
     user_data: Optional[Dict[str, Any]] = None
+    session_token: Optional[str] = None
+
+class LogoutRequest(BaseModel):
+    session_token: str
 
 class ChatRequest(BaseModel):
     message: str
     user_id: str
+    session_token: Optional[str] = None
+    profile: Optional[str] = None  # "fast", "balanced" or "full"; default per tenant
 
 class ChatResponse(BaseModel):
     response: str
     timestamp: datetime
 
+class ChatJob(BaseModel):
+    job_id: str
+    status: str
+    position: Optional[int] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+class IngestRequest(BaseModel):
+    records: List[Dict[str, Any]]
+
+class IngestResponse(BaseModel):
+    dataset: str
+    accepted: int
+
+INGEST_DATASETS = ("activities", "measurements", "nutrition")
+
+@app.on_event("startup")
+async def warm_crew_pool():
+    """Build the crew pool before the first chat request arrives"""
+    await asyncio.to_thread(get_crew_pool().warm)
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -52,11 +93,20 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.now()}
 
+@app.get("/api/metrics")
+async def api_metrics():
+    """Crew pool utilization, session and chat job counts and request timings"""
+    return {
+        "crew_pool": get_crew_pool().stats(),
+        "kickoff": get_kickoff_executor().stats(),
+        "sessions": await asyncio.to_thread(get_session_store().stats),
+        "chat_jobs": await asyncio.to_thread(get_job_queue().stats),
+        **get_metrics().snapshot(),
+    }
+
 @app.post("/api/login", response_model=LoginResponse)
 async def api_login(request: LoginRequest):
-    """Handle user login - simplified version for testing"""
-    global current_user_data, current_user_id
-    
+    """Handle user login against the shared user data store and start a session"""
     try:
         user_id = request.user_id.strip()
         
@@ -67,90 +117,125 @@ async def api_login(request: LoginRequest):
                 message="Invalid user ID format. Please use format: user_XXXXX"
             )
         
-        # Mock user data for testing
-        mock_user_data = {
-            "user_id": user_id,
-            "profile": {"name": "Test User", "age": 25, "weight": 70, "height": 175},
-            "activities": [],
-            "measurements": [],
-            "nutrition": []
-        }
+        user_data = await asyncio.to_thread(load_user_data, user_id)
+        if not user_data["profile"]:
+            return LoginResponse(
+                success=False,
+                message=f"No fitness profile found for {user_id}"
+            )
         
-        current_user_data = mock_user_data
-        current_user_id = user_id
+        session = get_session_store().create(user_id, user_data)
         
         return LoginResponse(
             success=True,
-            message="Welcome back, Test User!",
-            user_data=mock_user_data
+            message=f"Welcome back, {user_id}!",
+            user_data=user_data,
+            session_token=session.token
         )
     
     except Exception as e:
+        # A data backend failure is a server error, not an unknown user
         print(f"❌ Login error: {str(e)}")
-        return LoginResponse(
-            success=False,
-            message=f"Login failed: {str(e)}"
-        )
+        raise HTTPException(status_code=500, detail=f"Login failed: {str(e)}")
+
+@app.post("/api/logout")
+async def api_logout(request: LogoutRequest):
+    """End a session"""
+    return {"success": get_session_store().end(request.session_token)}
+
+def greeting_reply(user_data):
+    """Direct reply to a greeting, without invoking CrewAI"""
+    user_name = (user_data.get("profile") or {}).get("name", "there")
+    return (
+        f"Hi {user_name}! 👋 What would you like help with today — a workout plan, nutrition guidance (like meal ideas), or something else?"
+    )
+
+def crew_inputs(request: ChatRequest, user_data, context=NEW_CONVERSATION):
+    """Prepare inputs in the format expected by the crew"""
+    return {
+        "user_message": request.message,
+        "user_id": request.user_id,
+        "user_profile": user_data.get('profile', {}),
+        "user_activities": user_data.get('recent_activities', []),
+        "user_measurements": user_data.get('recent_measurements', []),
+        "user_nutrition": user_data.get('recent_nutrition', []),
+        "context": context  # Conversation history, or the new-conversation line
+    }
+
+def authorize_chat(request: ChatRequest):
+    """Return the live session for a chat request, or raise 401"""
+    session = get_session_store().get(request.session_token)
+    if session is None or session.user_id != request.user_id:
+        raise HTTPException(status_code=401, detail="Session expired or invalid. Please log in again")
+    return session
+
+def chat_profile(request: ChatRequest):
+    """Return the execution profile for a chat request, or raise 400 for an unknown one"""
+    try:
+        return resolve_profile(request.profile, request.user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def overloaded_error(e):
+    """Map a rejected kickoff to an HTTP error with Retry-After"""
+    if isinstance(e, Overloaded):
+        return HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return HTTPException(status_code=503, detail=f"All fitness coaches are busy. {e}", headers={"Retry-After": "5"})
+
+def chat_flight_key(session, profile, message, stream=False):
+    """Key identical messages from one user; streamed and plain replies are coalesced separately"""
+    return (session.user_id, profile, " ".join(message.split()), stream)
 
 @app.post("/api/chat", response_model=ChatResponse)
 async def api_chat(request: ChatRequest):
     """Handle chat messages with CrewAI fitness coach"""
-    global current_user_data, current_user_id
+    # Check if user is logged in
+    session = authorize_chat(request)
+    profile = chat_profile(request)
     
     try:
-        # Check if user is logged in
-        if not current_user_id or current_user_id != request.user_id:
-            raise HTTPException(status_code=401, detail="User not authenticated")
-        
-        if not current_user_data:
-            raise HTTPException(status_code=400, detail="User data not loaded")
+        # Evicted or invalidated user data is re-loaded from the summary view
+        current_user_data = await asyncio.to_thread(get_session_store().user_data, session)
         
         print(f"🤖 Starting CrewAI chat for user: {request.user_id}")
         print(f"💬 User message: {request.message}")
 
-        # Lightweight intent guard: if it's just a greeting, respond directly without invoking CrewAI
-        text = (request.message or "").strip().lower()
-        # Normalize punctuation and extra spaces
-        text_clean = re.sub(r"[^a-z\s]", "", text)
-        greetings = {
-            "hi", "hello", "hey", "yo", "sup", "hej", "hola", "salut",
-            "good morning", "good afternoon", "good evening"
-        }
-        # Consider it a greeting if it's short and composed of greeting words only
-        if text_clean and (len(text_clean.split()) <= 4) and all(
-            any(g in w for g in greetings) for w in text_clean.split()
-        ):
-            user_name = current_user_data.get("profile", {}).get("name", "there")
-            reply = (
-                f"Hi {user_name}! 👋 What would you like help with today — a workout plan, nutrition guidance (like meal ideas), or something else?"
-            )
-            return ChatResponse(response=reply, timestamp=datetime.now())
-        
-        # Initialize the CrewAI fitness coach
-        fitness_crew = FitnessCrew()
-        crew_instance = fitness_crew.chat_crew()
+        # Local intent classifier: greetings are answered directly, clear requests skip the manager
+        intent = classify(request.message)
+        print(f"🧭 Intent: {intent.label} ({intent.confidence:.2f}) -> {intent.route}")
+        if intent.label == "greeting":
+            return ChatResponse(response=greeting_reply(current_user_data), timestamp=datetime.now())
         
-        # Prepare inputs in the format expected by the crew
-        inputs = {
-            "user_message": request.message,
-            "user_id": request.user_id,
-            "user_profile": current_user_data.get('profile', {}),
-            "user_activities": current_user_data.get('activities', []),
-            "user_measurements": current_user_data.get('measurements', []),
-            "user_nutrition": current_user_data.get('nutrition', []),
-            "context": "This is the start of a new conversation."  # Add context for conversation history
-        }
+        conversations = get_conversation_store()
+        history = await asyncio.to_thread(conversations.context, session.user_id)
+        inputs = crew_inputs(request, current_user_data, history)
         
         print(f"📊 Inputs prepared for CrewAI: {list(inputs.keys())}")
         
-        # Get response from CrewAI
-        print("🚀 Calling CrewAI...")
-        result = crew_instance.kickoff(inputs=inputs)
-        response_text = str(result).strip()
+        # A paraphrase of an earlier message in the same context reuses its reply
+        cache = get_response_cache()
+        cached = await asyncio.to_thread(cache.lookup, inputs, profile) if cache is not None else None
+        if cached is not None:
+            print(f"💾 Response cache hit (similarity {cached[1]})")
+            await asyncio.to_thread(conversations.append, session.user_id, request.message, cached[0])
+            return ChatResponse(response=cached[0], timestamp=datetime.now())
         
-        # Clean up response text (remove any extra formatting)
-        if response_text.startswith("Assistant:"):
-            response_text = response_text[10:].strip()
+        # Get response from a pooled CrewAI fitness coach, off the event loop
+        print("🚀 Calling CrewAI...")
+        def run_crew():
+            with get_crew_pool().checkout() as pooled_crew:
+                return pooled_crew.kickoff(inputs, route=intent.route, profile=profile)
+        async def kickoff():
+            result = await get_kickoff_executor().run(run_crew, key=session.user_id)
+            response_text = clean_response(result)
+            if cache is not None:
+                await asyncio.to_thread(cache.store, inputs, response_text, profile)
+            # Coalesced duplicates share this kickoff, so the exchange is recorded once
+            await asyncio.to_thread(conversations.append, session.user_id, request.message, response_text)
+            return response_text
+        # Identical messages from the same user while this one runs share its kickoff
+        flight_key = chat_flight_key(session, profile, request.message)
+        response_text = await get_chat_single_flight().do(flight_key, kickoff)
         
         print(f"✅ CrewAI response received: {response_text[:100]}...")
         
@@ -159,6 +244,10 @@ async def api_chat(request: ChatRequest):
             timestamp=datetime.now()
         )
     
+    except HTTPException:
+        raise
+    except (Overloaded, PoolExhausted) as e:
+        raise overloaded_error(e)
     except Exception as e:
         print(f"❌ Chat error: {str(e)}")
         # Fallback to a helpful error message
@@ -167,6 +256,241 @@ async def api_chat(request: ChatRequest):
             timestamp=datetime.now()
         )
 
+@app.post("/api/chat/stream")
+async def api_chat_stream(request: ChatRequest):
+    """Stream a chat reply as server-sent events: delegations, tokens and tool progress, then the final reply"""
+    session = authorize_chat(request)
+    profile = chat_profile(request)
+    current_user_data = await asyncio.to_thread(get_session_store().user_data, session)
+    print(f"🤖 Starting streaming CrewAI chat for user: {request.user_id}")
+
+    intent = classify(request.message)
+    if intent.label == "greeting":
+        reply = greeting_reply(current_user_data)
+        async def greeting():
+            yield format_sse({"type": "final", "response": reply, "timestamp": datetime.now().isoformat()})
+        return StreamingResponse(greeting(), media_type="text/event-stream")
+
+    conversations = get_conversation_store()
+    history = await asyncio.to_thread(conversations.context, session.user_id)
+    inputs = crew_inputs(request, current_user_data, history)
+    cache = get_response_cache()
+    cached = await asyncio.to_thread(cache.lookup, inputs, profile) if cache is not None else None
+    if cached is not None:
+        await asyncio.to_thread(conversations.append, session.user_id, request.message, cached[0])
+        async def cache_hit():
+            yield format_sse({"type": "final", "response": cached[0], "cached": True,
+                              "timestamp": datetime.now().isoformat()})
+        return StreamingResponse(cache_hit(), media_type="text/event-stream")
+
+    def run_crew():
+        with get_crew_pool().checkout() as pooled_crew:
+            result = pooled_crew.kickoff(inputs, stream=True, route=intent.route, profile=profile)
+        # Cleaned once: the client, the cache and the history all get this text
+        response_text = clean_response(result)
+        if cache is not None:
+            cache.store(inputs, response_text, profile)
+        conversations.append(session.user_id, request.message, response_text)
+        return response_text
+
+    def start():
+        stream = ChatStream()
+        stream.emit({"type": "intent", "label": intent.label, "confidence": round(intent.confidence, 3),
+                     "route": intent.route, "profile": profile})
+        future = get_kickoff_executor().submit(stream.bind(run_crew), key=session.user_id)
+        return stream, asyncio.wrap_future(future)
+
+    try:
+        # Identical messages from the same user while this one runs follow its stream instead of kicking off again.
+        # Admission happens before the response starts, so overload is still a plain 503/429
+        flight_key = chat_flight_key(session, profile, request.message, stream=True)
+        stream, run, leader = get_chat_single_flight().share(flight_key, start)
+    except Overloaded as e:
+        raise overloaded_error(e)
+    if not leader:
+        print("🔗 Joining the streamed reply already in flight")
+
+    def finish(response_text):
+        print(f"✅ CrewAI streamed response: {response_text[:100]}...")
+        return {"response": response_text, "timestamp": datetime.now().isoformat()}
+
+    return StreamingResponse(
+        stream.events(run, finish),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def _timestamp(value):
+    return datetime.fromtimestamp(value) if value is not None else None
+
+def chat_job(job, jobs):
+    """Build the status view of a job"""
+    return ChatJob(
+        job_id=job["id"],
+        status=job["status"],
+        position=jobs.position(job) if job["status"] == "queued" else None,
+        created_at=_timestamp(job["created_at"]),
+        started_at=_timestamp(job["started_at"]),
+        finished_at=_timestamp(job["finished_at"]),
+        error=job["error"],
+    )
+
+def authorize_user(user_id, session_token):
+    """Return the session if it belongs to user_id, or raise 401"""
+    session = get_session_store().get(session_token)
+    if session is None or session.user_id != user_id:
+        raise HTTPException(status_code=401, detail="Session expired or invalid. Please log in again")
+    return session
+
+def authorized_job(job_id, user_id, session_token):
+    """Return a job the session's user owns, or raise 401/404"""
+    authorize_user(user_id, session_token)
+    job = get_job_queue().get(job_id)
+    if job is None or job["user_id"] != user_id:
+        raise HTTPException(status_code=404, detail=f"Unknown chat job: {job_id}")
+    return job
+
+@app.post("/api/chat/jobs", response_model=ChatJob, status_code=202)
+async def api_chat_job_submit(request: ChatRequest):
+    """Queue a chat message for the chat_worker processes and return the job to poll"""
+    session = authorize_chat(request)
+    profile = chat_profile(request)
+    current_user_data = await asyncio.to_thread(get_session_store().user_data, session)
+    jobs = get_job_queue()
+
+    intent = classify(request.message)
+    conversations = get_conversation_store()
+    history = await asyncio.to_thread(conversations.context, session.user_id)
+    payload = {
+        "message": request.message,
+        "inputs": crew_inputs(request, current_user_data, history),
+        "route": intent.route,
+        "profile": profile,
+    }
+    reply = greeting_reply(current_user_data) if intent.label == "greeting" else None
+    cache = get_response_cache()
+    if reply is None and cache is not None:
+        # A cache hit is stored as an already finished job
+        cached = await asyncio.to_thread(cache.lookup, payload["inputs"], profile)
+        reply = cached[0] if cached is not None else None
+        if reply is not None:
+            await asyncio.to_thread(conversations.append, session.user_id, request.message, reply)
+    try:
+        job_id = await asyncio.to_thread(jobs.submit, request.user_id, payload, reply)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    print(f"📥 Queued chat job {job_id} for user: {request.user_id}")
+    return chat_job(await asyncio.to_thread(jobs.get, job_id), jobs)
+
+@app.get("/api/chat/jobs/{job_id}", response_model=ChatJob)
+async def api_chat_job_status(job_id: str, user_id: str, session_token: str):
+    """Report whether a chat job is queued, running, done or failed"""
+    job = await asyncio.to_thread(authorized_job, job_id, user_id, session_token)
+    return await asyncio.to_thread(chat_job, job, get_job_queue())
+
+@app.get("/api/chat/jobs/{job_id}/result", response_model=ChatResponse)
+async def api_chat_job_result(job_id: str, user_id: str, session_token: str):
+    """Return a finished chat job's reply; 409 while it is still queued or running"""
+    job = await asyncio.to_thread(authorized_job, job_id, user_id, session_token)
+    if job["status"] == "failed":
+        return ChatResponse(
+            response=f"I'm sorry, I'm having trouble processing your request right now. Error: {job['error']}",
+            timestamp=_timestamp(job["finished_at"]),
+        )
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Chat job is still {job['status']}")
+    return ChatResponse(response=job["result"], timestamp=_timestamp(job["finished_at"]))
+
+@app.post("/api/ingest/{dataset}", response_model=IngestResponse)
+async def api_ingest(dataset: str, request: IngestRequest):
+    """Append a batch of tracker records; returns once the batch is durable and visible"""
+    if dataset not in INGEST_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset}")
+    
+    try:
+        # append() blocks until the group commit covering this batch has been fsynced
+        accepted = await asyncio.to_thread(get_data_store().append, dataset, request.records)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    
+    return IngestResponse(dataset=dataset, accepted=accepted)
+
+async def _run_analytics(method, *args):
+    """Run an analytics query off the event loop and map bad parameters to 400"""
+    try:
+        return await asyncio.to_thread(method, *args)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/analytics/{dataset}/rollups")
+async def api_analytics_rollups(dataset: str, metric: str, period: str = "week"):
+    """Weekly or monthly population rollups of one metric"""
+    engine = get_analytics_engine()
+    rollups = await _run_analytics(engine.rollups, dataset, metric, period)
+    return {"dataset": dataset, "metric": metric, "period": period, "rollups": rollups}
+
+@app.get("/api/analytics/{dataset}/moving-average")
+async def api_analytics_moving_average(dataset: str, metric: str, window: int = 7):
+    """Daily population mean of one metric with a trailing moving average"""
+    engine = get_analytics_engine()
+    series = await _run_analytics(engine.moving_average, dataset, metric, window)
+    return {"dataset": dataset, "metric": metric, "window": window, "series": series}
+
+@app.get("/api/analytics/{dataset}/groups")
+async def api_analytics_groups(dataset: str, metric: str, by: str = "fitness_level"):
+    """Per fitness_level / goals breakdown of one metric"""
+    engine = get_analytics_engine()
+    groups = await _run_analytics(engine.group_breakdown, dataset, metric, by)
+    return {"dataset": dataset, "metric": metric, "by": by, "groups": groups}
+
+@app.get("/api/users/{user_id}/percentiles")
+async def api_user_percentiles(user_id: str, session_token: Optional[str] = None):
+    """Where a user's latest steps, calories, protein and body fat fall within their cohort; the session must be the user's"""
+    if not re.match(r'^user_\d{5}$', user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID format. Please use format: user_XXXXX")
+    await asyncio.to_thread(authorize_user, user_id, session_token)
+    result = await asyncio.to_thread(get_cohort_sketches().percentiles, user_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"No fitness profile found for {user_id}")
+    return result
+
+@app.get("/api/users/{user_id}/{dataset}")
+async def api_user_dataset_range(
+    user_id: str,
+    dataset: str,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    fields: Optional[str] = None,
+    session_token: Optional[str] = None,
+):
+    """A user's activities, measurements or nutrition between two dates (inclusive); the session must be the user's"""
+    if not re.match(r'^user_\d{5}$', user_id):
+        raise HTTPException(status_code=400, detail="Invalid user ID format. Please use format: user_XXXXX")
+    await asyncio.to_thread(authorize_user, user_id, session_token)
+    if dataset not in INGEST_DATASETS:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset}")
+    for value in (date_from, date_to):
+        if value is not None:
+            try:
+                date.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid date: {value}. Use YYYY-MM-DD")
+    
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    rows = await asyncio.to_thread(
+        get_data_store().date_range, dataset, user_id, date_from, date_to, field_list
+    )
+    return {
+        "user_id": user_id,
+        "dataset": dataset,
+        "from": date_from,
+        "to": date_to,
+        "count": len(rows),
+        "rows": rows,
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="localhost", port=8000, reload=True)
\ No newline at end of file
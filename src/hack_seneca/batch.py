@@ -0,0 +1,170 @@
+"""Batch chat: run many chat messages from a JSONL file without the API.
+
+``run_crew --batch messages.jsonl`` reads one ``{"user_id": ..., "message":
+...}`` object per line, optionally with a ``profile``, and runs each message
+the way the CLI does: intent routing, execution profile and the user's data
+from the summary view. The conversation starts fresh and is not recorded.
+
+At most --concurrency kickoffs (default HACK_SENECA_BATCH_CONCURRENCY, 4) run
+at once, each on its own pooled crew, and at most --rate kickoffs start per
+minute (default HACK_SENECA_BATCH_RATE_PER_MINUTE, 0 for unlimited). The
+input is read as it is consumed, so files of any size work. Each result is
+written to --output (default <batch>.results.jsonl, since the crews log to
+stdout) as one JSON line as soon as it finishes. Lines therefore come out in
+completion order and carry their input line number. A line that cannot be
+parsed or whose kickoff fails becomes an ``error`` result and the run goes on.
+The exit status is 1 if any line failed.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .conversations import NEW_CONVERSATION, clean_response
+from .crew_pool import CrewPool
+from .intent import classify
+from .metrics import get_metrics
+from .profiles import resolve_profile
+from .summary_view import get_summary_view
+
+CONCURRENCY = int(os.getenv("HACK_SENECA_BATCH_CONCURRENCY", "4"))
+RATE_PER_MINUTE = float(os.getenv("HACK_SENECA_BATCH_RATE_PER_MINUTE", "0"))
+
+
+class RateLimiter:
+    """Spaces calls to acquire() at least 60 / rate_per_minute seconds apart; 0 means no limit"""
+
+    def __init__(self, rate_per_minute, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self._clock = clock
+        self._sleep = sleep
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = self._clock()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            self._sleep(start - now)
+
+
+def batch_inputs(user_id, message):
+    """Build the crew inputs for one batch message from the summary view"""
+    entry = get_summary_view().get(user_id)
+    if entry.profile is None:
+        raise ValueError(f"Unknown user: {user_id}")
+    return {
+        "user_message": message,
+        "user_id": user_id,
+        "user_profile": entry.profile,
+        "user_activities": entry.recent("activities"),
+        "user_measurements": entry.recent("measurements"),
+        "user_nutrition": entry.recent("nutrition"),
+        "context": NEW_CONVERSATION,
+    }
+
+
+class BatchRunner:
+    """Runs JSONL chat requests concurrently and writes JSONL results as they finish"""
+
+    def __init__(self, out, concurrency=CONCURRENCY, rate_per_minute=RATE_PER_MINUTE, pool=None, metrics=None):
+        self.out = out
+        self.concurrency = concurrency
+        self.pool = pool or CrewPool(size=concurrency)
+        self.limiter = RateLimiter(rate_per_minute)
+        self.ok = 0
+        self.failed = 0
+        self._metrics = metrics or get_metrics()
+        self._write_lock = threading.Lock()
+
+    def _write(self, record):
+        with self._write_lock:
+            if record["status"] == "ok":
+                self.ok += 1
+            else:
+                self.failed += 1
+            self._metrics.incr(f"batch.{record['status']}")
+            self.out.write(json.dumps(record, default=str) + "\n")
+            self.out.flush()
+
+    def run_line(self, line_number, line):
+        """Run one input line and write its result; never raises"""
+        record = {"line": line_number}
+        start = time.perf_counter()
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Each line must be a JSON object")
+            record["user_id"] = user_id = request.get("user_id")
+            message = request.get("message")
+            if not user_id or not message:
+                raise ValueError("Each line needs a user_id and a message")
+            profile = resolve_profile(request.get("profile"), user_id)
+            intent = classify(message)
+            record.update(profile=profile, route=intent.route or "manager")
+            inputs = batch_inputs(user_id, message)
+            self.limiter.acquire()
+            with self.pool.checkout() as pooled_crew:
+                result = pooled_crew.kickoff(inputs, route=intent.route or "manager", profile=profile)
+            record.update(status="ok", response=clean_response(result))
+        except Exception as e:
+            record.update(status="error", error=f"{type(e).__name__}: {e}")
+        record["seconds"] = round(time.perf_counter() - start, 3)
+        self._write(record)
+
+    def run(self, lines):
+        """Run every non-blank line; at most twice the concurrency are read ahead"""
+        slots = threading.BoundedSemaphore(self.concurrency * 2)
+
+        def task(line_number, line):
+            try:
+                self.run_line(line_number, line)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as executor:
+            for line_number, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                slots.acquire()
+                executor.submit(task, line_number, line)
+        return self.ok, self.failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run chat messages from a JSONL file and write JSONL results")
+    parser.add_argument("--batch", required=True, help='JSONL file of {"user_id", "message"} lines, or - for stdin')
+    parser.add_argument("--output", default=None,
+                        help="JSONL results file, or - for stdout (default: <batch>.results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=RATE_PER_MINUTE, help="Kickoffs per minute (0: no limit)")
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    output = args.output or ("-" if args.batch == "-" else os.path.splitext(args.batch)[0] + ".results.jsonl")
+    source = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+    out = sys.stdout if output == "-" else open(output, "w", encoding="utf-8")
+    start = time.perf_counter()
+    print(f"📦 Batch chat from {args.batch} to {output}: concurrency {args.concurrency}, "
+          f"{'no rate limit' if args.rate <= 0 else f'{args.rate:g} kickoffs/minute'}", file=sys.stderr)
+    try:
+        ok, failed = BatchRunner(out, args.concurrency, args.rate).run(source)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"✅ {ok} ok, ❌ {failed} failed in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
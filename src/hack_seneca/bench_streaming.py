@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+"""Benchmark json.load vs streaming for one user's measurements.
+
+Generates a synthetic fitness-measurements.json of the requested size and runs
+each strategy in a fresh interpreter so peak RSS is measured per strategy:
+
+    python -m hack_seneca.bench_streaming --users 20000 --rows-per-user 50
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from hack_seneca.streaming import scan_user_rows
+
+METRICS = (
+    "weight", "body_fat", "muscle_mass", "bmi", "waist", "chest",
+    "bicep", "thigh", "body_water", "bone_mass",
+)
+
+
+def generate_measurements(path, users, rows_per_user, seed=42):
+    """Write a synthetic measurements file without holding it in memory"""
+    rng = random.Random(seed)
+    start = date(2024, 1, 1)
+    with open(path, "w") as f:
+        f.write("[\n")
+        first = True
+        for u in range(1, users + 1):
+            user_id = f"user_{u:05d}"
+            for i in range(rows_per_user):
+                row = {
+                    "measurement_id": f"measurement_{user_id}_{i:02d}",
+                    "user_id": user_id,
+                    "date": (start + timedelta(days=rng.randrange(600))).isoformat(),
+                }
+                for metric in METRICS:
+                    row[metric] = round(rng.uniform(10, 120), 1)
+                row["notes"] = f"Measurement {i + 1} for {user_id}"
+                f.write(("  " if first else ",\n  ") + json.dumps(row))
+                first = False
+        f.write("\n]\n")
+
+
+def _json_load(path, user_id, limit):
+    # Mirrors the original load_user_data path
+    with open(path, "r") as f:
+        measurements = json.load(f)
+    rows = [m for m in measurements if m["user_id"] == user_id]
+    rows.sort(key=lambda x: x["date"], reverse=True)
+    return rows[:limit]
+
+
+def _streaming(path, user_id, limit):
+    rows, _ = scan_user_rows(path, user_id, limit)
+    return rows
+
+
+STRATEGIES = {"json_load": _json_load, "streaming": _streaming}
+
+
+def _worker(strategy, path, user_id, limit):
+    started = time.perf_counter()
+    rows = STRATEGIES[strategy](path, user_id, limit)
+    elapsed = time.perf_counter() - started
+    # ru_maxrss is KiB on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({
+        "strategy": strategy,
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": round(peak_mb, 1),
+        "rows": len(rows),
+        "dates": [r["date"] for r in rows],
+    }))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--rows-per-user", type=int, default=50)
+    parser.add_argument("--user-id", default="user_00001")
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--file", help="Use an existing measurements file instead of generating one")
+    parser.add_argument("--worker", choices=sorted(STRATEGIES), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        _worker(args.worker, args.file, args.user_id, args.limit)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.file
+        if not path:
+            path = os.path.join(tmp, "fitness-measurements.json")
+            print(f"📝 Generating {args.users * args.rows_per_user:,} measurement rows...")
+            generate_measurements(path, args.users, args.rows_per_user)
+        print(f"📁 {path}: {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+        results = []
+        for strategy in STRATEGIES:
+            out = subprocess.run(
+                [sys.executable, "-m", "hack_seneca.bench_streaming", "--worker", strategy,
+                 "--file", path, "--user-id", args.user_id, "--limit", str(args.limit)],
+                check=True, capture_output=True, text=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    for r in results:
+        print(f"{r['strategy']:>10}: {r['seconds']:7.3f}s  peak RSS {r['peak_rss_mb']:8.1f} MB  rows={r['rows']}")
+    if len({tuple(r["dates"]) for r in results}) != 1:
+        print("⚠️ Strategies returned different rows!")
+
+
+if __name__ == "__main__":
+    main()
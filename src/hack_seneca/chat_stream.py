@@ -0,0 +1,187 @@
+"""Incremental chat events for the streaming chat endpoint.
+
+A crew run reports its progress on the global crewai event bus, and handlers
+run synchronously in the thread that emits. The handlers registered here turn
+the events into small JSON-able dicts and hand them to the ChatStream bound to
+the current thread. Runs that are not streaming have no ChatStream bound, so
+their events are ignored.
+
+Event types, in the order a client usually sees them:
+
+- ``intent``: the local intent classifier's label, confidence and route
+- ``agent``: an agent (the manager or a specialist) started working on a task
+- ``delegation``: the manager handed work or a question to a coworker
+- ``llm``: an agent sent a request to the LLM
+- ``token``: a chunk of LLM output as it was generated
+- ``tool`` / ``tool_done`` / ``tool_error``: tool progress
+- ``final`` or ``error``: the run finished; nothing follows
+"""
+import asyncio
+import contextvars
+import json
+import threading
+import time
+
+from .metrics import get_metrics
+
+DELEGATION_TOOLS = {"Delegate work to coworker", "Ask question to coworker"}
+
+_current = contextvars.ContextVar("hack_seneca_chat_stream", default=None)
+_installed = False
+_install_lock = threading.Lock()
+
+
+def format_sse(event):
+    """Encode one event dict as a server-sent event"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+def _role(agent):
+    return getattr(agent, "role", None) if agent is not None else None
+
+
+def _tool_args(args):
+    if isinstance(args, str):
+        try:
+            args = json.loads(args)
+        except ValueError:
+            return {"input": args}
+    return args if isinstance(args, dict) else {}
+
+
+def _emit(event):
+    stream = _current.get()
+    if stream is not None:
+        stream.emit(event)
+
+
+def install_handlers():
+    """Register the event bus handlers once per process"""
+    global _installed
+    if _installed:
+        return
+    with _install_lock:
+        if _installed:
+            return
+        from crewai.events import (
+            AgentExecutionStartedEvent,
+            LLMCallStartedEvent,
+            LLMStreamChunkEvent,
+            ToolUsageErrorEvent,
+            ToolUsageFinishedEvent,
+            ToolUsageStartedEvent,
+            crewai_event_bus,
+        )
+
+        def on_agent_started(source, event):
+            _emit({"type": "agent", "agent": _role(event.agent)})
+
+        def on_llm_started(source, event):
+            _emit({"type": "llm", "agent": event.agent_role})
+
+        def on_chunk(source, event):
+            if event.chunk:
+                _emit({"type": "token", "agent": event.agent_role, "text": event.chunk})
+
+        def on_tool_started(source, event):
+            if event.tool_name in DELEGATION_TOOLS:
+                args = _tool_args(event.tool_args)
+                _emit({
+                    "type": "delegation",
+                    "agent": event.agent_role,
+                    "coworker": args.get("coworker"),
+                    "task": args.get("task") or args.get("question"),
+                })
+            else:
+                _emit({"type": "tool", "agent": event.agent_role, "tool": event.tool_name})
+
+        def on_tool_finished(source, event):
+            _emit({"type": "tool_done", "agent": event.agent_role, "tool": event.tool_name,
+                   "from_cache": event.from_cache})
+
+        def on_tool_error(source, event):
+            _emit({"type": "tool_error", "agent": event.agent_role, "tool": event.tool_name,
+                   "error": str(event.error)})
+
+        crewai_event_bus.register_handler(AgentExecutionStartedEvent, on_agent_started)
+        crewai_event_bus.register_handler(LLMCallStartedEvent, on_llm_started)
+        crewai_event_bus.register_handler(LLMStreamChunkEvent, on_chunk)
+        crewai_event_bus.register_handler(ToolUsageStartedEvent, on_tool_started)
+        crewai_event_bus.register_handler(ToolUsageFinishedEvent, on_tool_finished)
+        crewai_event_bus.register_handler(ToolUsageErrorEvent, on_tool_error)
+        _installed = True
+
+
+class ChatStream:
+    """Events of one streaming run, passed from the worker thread to the event loop"""
+
+    def __init__(self, loop=None, metrics=None):
+        self._loop = loop or asyncio.get_running_loop()
+        # Every event so far, replayed to clients that join a coalesced run late
+        self._history = []
+        self._queues = []
+        self._metrics = metrics or get_metrics()
+        self._started = time.perf_counter()
+        self._first_token = False
+
+    def emit(self, event):
+        """Queue an event; safe to call from any thread"""
+        if event["type"] == "token" and not self._first_token:
+            self._first_token = True
+            self._metrics.observe("chat_stream.first_token_seconds", time.perf_counter() - self._started)
+        self._loop.call_soon_threadsafe(self._publish, event)
+
+    def _publish(self, event):
+        self._history.append(event)
+        for queue in self._queues:
+            queue.put_nowait(event)
+
+    def subscribe(self):
+        """Return a queue of the events so far and every later one; call on the event loop"""
+        queue = asyncio.Queue()
+        for event in self._history:
+            queue.put_nowait(event)
+        self._queues.append(queue)
+        return queue
+
+    def bind(self, fn):
+        """Wrap fn so the events it causes, in whatever thread runs it, go to this stream"""
+        install_handlers()
+
+        def bound(*args, **kwargs):
+            token = _current.set(self)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _current.reset(token)
+
+        return bound
+
+    async def events(self, future, finish):
+        """Yield SSE chunks until the run's future resolves, ending with finish(result) or an error.
+
+        Any number of clients may consume the same run; each gets every event.
+        """
+        done = asyncio.wrap_future(future)
+        queue = self.subscribe()
+        try:
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                finished, _ = await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+                if getter in finished:
+                    yield format_sse(getter.result())
+                    continue
+                getter.cancel()
+                break
+            # Events are published with call_soon_threadsafe before the future resolves, so they are all here
+            while not queue.empty():
+                yield format_sse(queue.get_nowait())
+        finally:
+            self._queues.remove(queue)
+        try:
+            event = {"type": "final", **finish(done.result())}
+        except Exception as e:
+            print(f"❌ Error in streaming chat: {e}")
+            event = {"type": "error", "detail": str(e)}
+        self._metrics.observe("chat_stream.run_seconds", time.perf_counter() - self._started)
+        yield format_sse(event)
@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+"""Columnar, memory-mapped copy of the users_data/ datasets.
+
+The converter writes one typed .npy array per field (steps, calories_burned,
+protein_g, weight, body_fat, ...) with rows grouped by user and sorted by date,
+plus a manifest holding the per-user [start, stop) offsets and the profiles.
+Readers np.load the arrays with mmap_mode="r", so every uvicorn worker maps
+the same page-cache pages instead of holding its own parsed JSON, and
+per-user aggregates are slice reductions.
+
+Layout (each conversion is a new generation; CURRENT is swapped atomically):
+
+    users_data/columnar/CURRENT
+    users_data/columnar/gen-<timestamp>/manifest.json
+    users_data/columnar/gen-<timestamp>/<dataset>.<field>.npy
+
+Convert with ``convert_columnar`` (or ``python -m hack_seneca.columnar``).
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from .data_store import DATASET_FILES, default_users_data_dir, project
+from .streaming import iter_json_array
+
+FORMAT_VERSION = 1
+ROW_DATASETS = ("activities", "measurements", "nutrition")
+
+
+def default_columnar_dir():
+    """Return the columnar directory, overridable with HACK_SENECA_COLUMNAR_DIR"""
+    return os.getenv("HACK_SENECA_COLUMNAR_DIR") or os.path.join(default_users_data_dir(), "columnar")
+
+
+def _column_dtype(values):
+    """Pick the narrowest of int64 / float64 / unicode that holds every value"""
+    kinds = set()
+    for v in values:
+        if v is None:
+            kinds.add("missing")
+        elif isinstance(v, bool) or not isinstance(v, (int, float)):
+            kinds.add("str")
+        elif isinstance(v, int):
+            kinds.add("int")
+        else:
+            kinds.add("float")
+    if "str" in kinds:
+        return "str"
+    if "float" in kinds or "missing" in kinds:
+        return "float64"
+    return "int64"
+
+
+def _to_array(values, dtype):
+    if dtype == "str":
+        return np.array(["" if v is None else str(v) for v in values], dtype=np.str_)
+    if dtype == "float64":
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return np.array(values, dtype=np.int64)
+
+
+def convert_dataset(records, out_dir, dataset):
+    """Write one dataset as per-field arrays and return its manifest entry"""
+    # Same-date rows go in reverse file order so reading a user's slice from
+    # the end matches a stable newest-first sort, like the JSON store
+    order = sorted(
+        range(len(records)),
+        key=lambda i: (records[i]["user_id"], records[i].get("date", ""), -i),
+    )
+    records = [records[i] for i in order]
+
+    fields = []
+    for record in records:
+        for key in record:
+            if key not in fields:
+                fields.append(key)
+
+    users = {}
+    for i, record in enumerate(records):
+        span = users.get(record["user_id"])
+        if span is None:
+            users[record["user_id"]] = [i, i + 1]
+        else:
+            span[1] = i + 1
+
+    columns = {}
+    for field in fields:
+        if field == "user_id":
+            continue  # implied by the offset table
+        values = [r.get(field) for r in records]
+        dtype = _column_dtype(values)
+        np.save(os.path.join(out_dir, f"{dataset}.{field}.npy"), _to_array(values, dtype))
+        columns[field] = dtype
+
+    return {"rows": len(records), "fields": fields, "columns": columns, "users": users}
+
+
+def convert(users_data_dir=None, columnar_dir=None, keep=2):
+    """Convert users_data/*.json into a new columnar generation and make it current"""
+    users_data_dir = users_data_dir or default_users_data_dir()
+    columnar_dir = columnar_dir or default_columnar_dir()
+    os.makedirs(columnar_dir, exist_ok=True)
+
+    generation = f"gen-{time.strftime('%Y%m%d_%H%M%S')}-{os.getpid()}"
+    out_dir = os.path.join(columnar_dir, generation)
+    os.makedirs(out_dir)
+
+    manifest = {"version": FORMAT_VERSION, "profiles": [], "datasets": {}}
+    users_file = os.path.join(users_data_dir, DATASET_FILES["users"])
+    if os.path.exists(users_file):
+        manifest["profiles"] = list(iter_json_array(users_file))
+
+    for dataset in ROW_DATASETS:
+        path = os.path.join(users_data_dir, DATASET_FILES[dataset])
+        if not os.path.exists(path):
+            continue
+        print(f"🗂️ Converting {dataset} from {path}")
+        entry = convert_dataset(list(iter_json_array(path)), out_dir, dataset)
+        manifest["datasets"][dataset] = entry
+        print(f"   {entry['rows']} rows, {len(entry['users'])} users, {len(entry['columns'])} columns")
+
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+    # Swap the CURRENT pointer atomically so readers never see a half-written generation
+    tmp_pointer = os.path.join(columnar_dir, f"CURRENT.{os.getpid()}.tmp")
+    with open(tmp_pointer, "w") as f:
+        f.write(generation)
+    os.replace(tmp_pointer, os.path.join(columnar_dir, "CURRENT"))
+
+    # Old generations may still be mapped by running workers; keep a few around
+    generations = sorted(d for d in os.listdir(columnar_dir) if d.startswith("gen-"))
+    for old in generations[:-keep] if keep > 0 else []:
+        if old != generation:
+            shutil.rmtree(os.path.join(columnar_dir, old), ignore_errors=True)
+
+    print(f"✅ Columnar data written to {out_dir}")
+    return out_dir
+
+
+class _Generation:
+    """Manifest and lazily memory-mapped arrays of one columnar generation"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar format version in {path}")
+        self.profiles = {}
+        for profile in manifest["profiles"]:
+            self.profiles.setdefault(profile["user_id"], profile)
+        self.datasets = manifest["datasets"]
+        self._arrays = {}
+
+    def column(self, dataset, field):
+        key = (dataset, field)
+        array = self._arrays.get(key)
+        if array is None:
+            array = np.load(os.path.join(self.path, f"{dataset}.{field}.npy"), mmap_mode="r")
+            self._arrays[key] = array
+        return array
+
+
+class ColumnarUserStore:
+    """Read-only user store over memory-mapped columnar arrays"""
+
+    def __init__(self, columnar_dir=None):
+        self.columnar_dir = columnar_dir or default_columnar_dir()
+        self.users_data_dir = self.columnar_dir
+        self._pointer = None
+        self._generation = None
+        self._lock = threading.Lock()
+
+    def _current(self):
+        """Return the current generation, switching when CURRENT changes"""
+        pointer_path = os.path.join(self.columnar_dir, "CURRENT")
+        try:
+            with open(pointer_path, "r") as f:
+                pointer = f.read().strip()
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                f"No columnar data in {self.columnar_dir}; run convert_columnar first"
+            ) from None
+
+        if pointer != self._pointer:
+            with self._lock:
+                if pointer != self._pointer:
+                    self._generation = _Generation(os.path.join(self.columnar_dir, pointer))
+                    self._pointer = pointer
+        return self._generation
+
+    def _span(self, dataset, user_id):
+        entry = self._current().datasets.get(dataset)
+        if entry is None:
+            return None, 0, 0
+        start, stop = entry["users"].get(user_id, (0, 0))
+        return entry, start, stop
+
+    def version(self):
+        """Return a token that changes whenever a new generation becomes current"""
+        return self._current().path
+
+    def subscribe(self, callback):
+        """No-op: columnar generations are immutable, new data arrives as a new generation"""
+
+    def append(self, dataset, records):
+        raise NotImplementedError(
+            "The columnar store is read-only; ingest with the json or sqlite backend and re-run convert_columnar"
+        )
+
+    def profile(self, user_id):
+        """Return the profile dict for a user, or None"""
+        return self._current().profiles.get(user_id)
+
+    def user_spans(self, dataset):
+        """Return {user_id: [start, stop)} row offsets of a dataset"""
+        entry = self._current().datasets.get(dataset)
+        return entry["users"] if entry else {}
+
+    def numeric_fields(self, dataset):
+        """Return the names of a dataset's int64/float64 columns"""
+        entry = self._current().datasets.get(dataset)
+        if entry is None:
+            return []
+        return [field for field, dtype in entry["columns"].items() if dtype in ("int64", "float64")]
+
+    def column(self, dataset, field):
+        """Return one field across all users as a memory-mapped array"""
+        return self._current().column(dataset, field)
+
+    def column_slice(self, dataset, user_id, field, limit=None):
+        """Return a user's values for one field, oldest first, as a mapped array slice"""
+        entry, start, stop = self._span(dataset, user_id)
+        if entry is None or field not in entry["columns"]:
+            return np.empty(0)
+        if limit is not None:
+            start = max(start, stop - max(limit, 0))
+        return self._current().column(dataset, field)[start:stop]
+
+    def _materialize(self, dataset, user_id, start, stop):
+        generation = self._current()
+        entry = generation.datasets[dataset]
+        columns = {
+            field: generation.column(dataset, field)[start:stop].tolist()
+            for field in entry["columns"]
+        }
+        rows = []
+        for i in range(stop - start):
+            row = {}
+            for field in entry["fields"]:
+                row[field] = user_id if field == "user_id" else columns[field][i]
+            rows.append(row)
+        return rows
+
+    def date_range(self, dataset, user_id, start=None, end=None, fields=None):
+        """Return a user's rows with start <= date <= end, oldest first.
+
+        The date column is sorted within each user's slice, so the window is two
+        searchsorted calls on the mapped array and only matching rows are built.
+        """
+        entry, first, stop = self._span(dataset, user_id)
+        if entry is None or first == stop:
+            return []
+        dates = self._current().column(dataset, "date")[first:stop]
+        lo = int(np.searchsorted(dates, start, side="left")) if start else 0
+        hi = int(np.searchsorted(dates, end, side="right")) if end else stop - first
+        return project(self._materialize(dataset, user_id, first + lo, first + hi), fields)
+
+    def rows(self, dataset, user_id):
+        """Return all rows for a user sorted by date, oldest first"""
+        entry, start, stop = self._span(dataset, user_id)
+        if entry is None:
+            return []
+        return self._materialize(dataset, user_id, start, stop)
+
+    def recent(self, dataset, user_id, limit=None):
+        """Return a user's most recent rows, newest first"""
+        entry, start, stop = self._span(dataset, user_id)
+        if entry is None:
+            return []
+        if limit is not None:
+            start = max(start, stop - max(limit, 0))
+        return self._materialize(dataset, user_id, start, stop)[::-1]
+
+    def rows_by_user(self, dataset):
+        """Return {user_id: rows oldest first} for a whole dataset"""
+        return {user_id: self.rows(dataset, user_id) for user_id in self.user_spans(dataset)}
+
+    def count(self, dataset, user_id):
+        """Return the number of rows a user has in a dataset"""
+        _, start, stop = self._span(dataset, user_id)
+        return stop - start
+
+    def user_count(self):
+        """Return the number of user profiles in the store"""
+        return len(self._current().profiles)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert users_data/*.json into the columnar format")
+    parser.add_argument("--users-data-dir", default=None)
+    parser.add_argument("--out", default=None, help="Columnar directory (default: users_data/columnar)")
+    parser.add_argument("--keep", type=int, default=2, help="Generations to keep for running readers")
+    args = parser.parse_args(argv)
+    convert(args.users_data_dir, args.out, args.keep)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""Persistent per-user conversation history with a rolling summary.
+
+Each user's conversation is one row in a WAL-mode SQLite file
+(HACK_SENECA_CONVERSATIONS_PATH, default users_data/conversations.db), so the
+CLI picks up where it left off and every API worker sees the same history.
+A conversation holds the newest turns verbatim plus a summary of older ones.
+Rendered as the crew's ``context`` input, headers and role prefixes
+included, it stays within HACK_SENECA_CONVERSATION_BUDGET tokens (default
+500):
+
+- a single turn longer than a third of what the headers and prefixes leave is
+  clipped when stored
+- when a new exchange pushes it over budget, the oldest exchanges are folded
+  into the summary, one line each (the first sentence of the question and of
+  the reply), until it fits again; the newest exchange is always kept
+- the summary itself may use a third of the budget, beyond which its oldest
+  lines are dropped; if the newest exchange still does not fit, the summary
+  gives way first and then the longest kept turn is clipped further
+
+Summaries are built locally, so folding costs no LLM call. Conversations idle
+for HACK_SENECA_CONVERSATION_TTL_SECONDS (default 30 days) are deleted, so
+storage stays bounded too. Nothing is kept in process memory.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from .data_store import default_users_data_dir
+from .metrics import get_metrics
+from .prompt_context import get_token_counter
+
+BUDGET = int(os.getenv("HACK_SENECA_CONVERSATION_BUDGET", "500"))
+TTL_SECONDS = float(os.getenv("HACK_SENECA_CONVERSATION_TTL_SECONDS", str(30 * 86400)))
+NEW_CONVERSATION = "This is the start of a new conversation."
+PURGE_INTERVAL = 3600
+
+
+def default_conversations_path():
+    """Return the conversation database path, overridable with HACK_SENECA_CONVERSATIONS_PATH"""
+    return os.getenv("HACK_SENECA_CONVERSATIONS_PATH") or os.path.join(default_users_data_dir(), "conversations.db")
+
+
+def clean_response(result):
+    """Turn a crew result into the reply text shown to the user and recorded in the history"""
+    text = str(result).strip()
+    # The crew sometimes echoes the transcript's speaker label
+    if text.startswith("Assistant:"):
+        text = text[10:].strip()
+    return text
+
+
+def first_sentence(text, limit):
+    """Return the first sentence of text on one line, cut to limit characters"""
+    text = " ".join((text or "").split())
+    match = re.match(r"(.+?[.!?])(\s|$)", text)
+    sentence = match.group(1) if match else text
+    return sentence if len(sentence) <= limit else sentence[:limit - 3].rstrip() + "..."
+
+
+def summarize_exchange(user_message, reply):
+    """Fold one exchange into a single summary line"""
+    line = f"- User: {first_sentence(user_message, 120)}"
+    if reply:
+        line += f" / Coach: {first_sentence(reply, 160)}"
+    return line
+
+
+class ConversationStore:
+    """Per-user turns and rolling summary, bounded by a token budget"""
+
+    def __init__(self, path=None, budget=BUDGET, ttl=TTL_SECONDS, counter=None, metrics=None, clock=time.time):
+        self.path = path or default_conversations_path()
+        self.budget = budget
+        self.ttl = ttl
+        self._counter = counter
+        self._metrics = metrics or get_metrics()
+        self._clock = clock
+        self._local = threading.local()
+        self._last_purge = 0.0
+
+    @property
+    def counter(self):
+        if self._counter is None:
+            self._counter = get_token_counter()
+        return self._counter
+
+    def _conn(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "user_id TEXT PRIMARY KEY, summary TEXT NOT NULL, turns TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_conversations_updated ON conversations (updated_at)")
+            self._local.conn = conn
+        return conn
+
+    def _read(self, conn, user_id):
+        row = conn.execute(
+            "SELECT summary, turns FROM conversations WHERE user_id = ? AND updated_at >= ?",
+            (user_id, self._clock() - self.ttl),
+        ).fetchone()
+        if row is None:
+            return [], []
+        return json.loads(row[0]), json.loads(row[1])
+
+    @staticmethod
+    def render(summary, turns):
+        """Render a summary and turns as the crew's context input"""
+        if not summary and not turns:
+            return NEW_CONVERSATION
+        parts = []
+        if summary:
+            parts.append("Earlier in this conversation:")
+            parts.extend(summary)
+        if turns:
+            if summary:
+                parts.append("Recent messages:")
+            parts.extend(f"{'User' if role == 'user' else 'Assistant'}: {text}" for role, text in turns)
+        return "\n".join(parts)
+
+    def context(self, user_id):
+        """Return a user's conversation rendered for the crew, or the new-conversation line"""
+        summary, turns = self._read(self._conn(), user_id)
+        return self.render(summary, turns)
+
+    def _turn_limit(self):
+        # Reserve the headers and role prefixes of a full render before sharing out the budget
+        overhead = self.counter.count(self.render([""], [["user", ""], ["assistant", ""]]))
+        return max(1, (self.budget - overhead) // 3)
+
+    def _clip(self, text, limit):
+        limit = max(1, limit)
+        tokens = self.counter.count(text)
+        while tokens > limit and len(text) > 4:
+            text = text[:max(1, len(text) * limit // tokens - 3)].rstrip() + "..."
+            tokens = self.counter.count(text)
+        return text
+
+    def _excess(self, summary, turns):
+        return self.counter.count(self.render(summary, turns)) - self.budget
+
+    def _fold(self, summary, turns):
+        folded = 0
+        while len(turns) > 2 and self._excess(summary, turns) > 0:
+            user_message = turns.pop(0)[1] if turns[0][0] == "user" else None
+            reply = turns.pop(0)[1] if turns and turns[0][0] == "assistant" else None
+            summary.append(summarize_exchange(user_message or "", reply))
+            folded += 1
+        while len(summary) > 1 and self.counter.count("\n".join(summary)) > self.budget // 3:
+            summary.pop(0)
+        # The newest exchange is always kept: the summary gives way to it, then its longest turn is clipped
+        while summary and self._excess(summary, turns) > 0:
+            summary.pop(0)
+        excess = self._excess(summary, turns)
+        while excess > 0:
+            turn = max(turns, key=lambda turn: len(turn[1]))
+            clipped = self._clip(turn[1], self.counter.count(turn[1]) - excess)
+            if clipped == turn[1]:
+                break
+            turn[1] = clipped
+            excess = self._excess(summary, turns)
+        return folded
+
+    def append(self, user_id, user_message, reply):
+        """Add an exchange, folding older turns into the summary while over budget"""
+        limit = self._turn_limit()
+        turns_added = [["user", self._clip(user_message, limit)], ["assistant", self._clip(reply, limit)]]
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            summary, turns = self._read(conn, user_id)
+            turns.extend(turns_added)
+            folded = self._fold(summary, turns)
+            conn.execute(
+                "INSERT OR REPLACE INTO conversations (user_id, summary, turns, updated_at) VALUES (?, ?, ?, ?)",
+                (user_id, json.dumps(summary), json.dumps(turns), self._clock()),
+            )
+        self._metrics.incr("conversations.exchanges")
+        if folded:
+            self._metrics.incr("conversations.folded", folded)
+        if time.monotonic() - self._last_purge > PURGE_INTERVAL:
+            self.purge()
+
+    def clear(self, user_id):
+        """Forget a user's conversation; returns False if there was none"""
+        cursor = self._conn().execute("DELETE FROM conversations WHERE user_id = ?", (user_id,))
+        return cursor.rowcount > 0
+
+    def purge(self):
+        """Delete conversations idle for longer than the TTL and return how many went"""
+        self._last_purge = time.monotonic()
+        cursor = self._conn().execute(
+            "DELETE FROM conversations WHERE updated_at < ?", (self._clock() - self.ttl,)
+        )
+        return cursor.rowcount
+
+
+_conversations = None
+_conversations_lock = threading.Lock()
+
+
+def get_conversation_store():
+    """Return the process-wide conversation store"""
+    global _conversations
+    if _conversations is None:
+        with _conversations_lock:
+            if _conversations is None:
+                _conversations = ConversationStore()
+    return _conversations
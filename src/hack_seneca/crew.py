@@ -1,7 +1,7 @@
 from crewai import Agent, Crew, Process, Task
-from crewai.llm import LLM
-import os
 from dotenv import load_dotenv
+from .llm_config import create_role_llms
+from .local_memory import crew_memory
 from .tools.custom_tool import FluxImageGenerator
 
 load_dotenv()
@@ -10,33 +10,9 @@ class FitnessCrew:
     """Hierarchical fitness crew with manager delegation"""
     
     def __init__(self):
-        # Configure Azure LLM
-        model = os.getenv("model")
-        api_key = os.getenv("AZURE_AI_API_KEY")
-        base_url = os.getenv("AZURE_AI_ENDPOINT")
-        api_version = os.getenv("AZURE_AI_API_VERSION")
-        
-        print(f"🔧 Configuring Azure LLM:")
-        print(f"   Model: {model}")
-        print(f"   Base URL: {base_url}")
-        print(f"   API Version: {api_version}")
-        print(f"   API Key: {'✅ Set' if api_key else '❌ Missing'}")
-        
-        if not api_key or not base_url:
-            print("Warning: Azure AI API credentials not found in environment variables.")
-            # Set a dummy OpenAI key to satisfy CrewAI validation
-            os.environ["OPENAI_API_KEY"] = "dummy-key-for-azure"
-            self.llm = LLM(model="gpt-3.5-turbo")
-        else:
-            # Set a dummy OpenAI key to satisfy CrewAI validation even when using Azure
-            os.environ["OPENAI_API_KEY"] = "dummy-key-for-azure"
-            self.llm = LLM(
-                model=model,
-                api_key=api_key,
-                base_url=base_url,
-                api_version=api_version,
-                temperature=0.1
-            )
+        # One LLM per role (manager, function_calling, fitness, nutrition); see llm_config.py
+        self.llms = create_role_llms()
+        self.llm = self.llms["manager"]
         
         # Tools
         self.flux_tool = FluxImageGenerator()
@@ -46,7 +22,7 @@ class FitnessCrew:
         self.fitness_agent = self.create_fitness_coach_agent()
         self.nutritionist_agent = self.create_nutritionist_agent()
 
-    def create_manager_agent(self):
+    def create_manager_agent(self, reasoning=True):
         """Manager agent that delegates to appropriate specialists"""
         return Agent(
             role="Fitness & Nutrition Manager",
@@ -73,11 +49,11 @@ class FitnessCrew:
                 
                 "When delegating, simply say: 'I'm delegating this [nutrition/fitness] request to our specialist.'"
             ),
-            llm=self.llm,
+            llm=self.llms["manager"],
             verbose=True,
             memory=True,  # Disable memory to prevent wrong delegation patterns
             allow_delegation=True,
-            reasoning=True
+            reasoning=reasoning
         )
 
     def create_fitness_coach_agent(self):
@@ -112,7 +88,7 @@ class FitnessCrew:
                 
                 "DO NOT provide meal plans, recipes, nutrition advice, or food suggestions under any circumstances."
             ),
-            llm=self.llm,
+            llm=self.llms["fitness"],
             verbose=True,
             allow_delegation=False,
         )
@@ -150,8 +126,8 @@ class FitnessCrew:
                 
                 "You focus EXCLUSIVELY on nutrition and food. You do not provide workout plans."
             ),
-            llm=self.llm,
-            function_calling_llm=self.llm,
+            llm=self.llms["nutrition"],
+            function_calling_llm=self.llms["function_calling"],
             verbose=True,
             allow_delegation=False,
             tools=[self.flux_tool],
@@ -161,15 +137,8 @@ class FitnessCrew:
         """Create the nutritionist task with image generation capability"""
         return Task(
             description=(
-                "Provide comprehensive nutrition guidance for: {user_message}\n\n"
-                "USER PROFILE & DATA:\n"
-                "User ID: {user_id}\n"
-                "Profile: {user_profile}\n"
-                "Recent Activities: {user_activities}\n"
-                "Body Measurements: {user_measurements}\n"
-                "Nutrition Intake: {user_nutrition}\n"
-                "Context: {context}\n\n"
-                
+                # Static instructions first so providers can cache the prompt prefix; see prompt_context.py
+                "Provide comprehensive nutrition guidance for the user request at the end of this task.\n\n"
                 "Instructions:\n"
                 "1. Provide CONCISE, straight-to-the-point nutrition advice\n"
                 "2. For meal suggestions, give 1-3 specific recipes with ingredients and macros\n"
@@ -182,7 +151,17 @@ class FitnessCrew:
                 "- Create detailed, appetizing descriptions\n"
                 "- Include food presentation, plating, colors, and visual appeal\n"
                 "- Call the tool with just the description text (no JSON formatting)\n"
-                "- Images should be saved under assets/images/ with timestamped filename"
+                "- Images should be saved under assets/images/ with timestamped filename\n\n"
+                
+                "USER PROFILE & DATA:\n"
+                "User ID: {user_id}\n"
+                "Profile: {user_profile}\n"
+                "Recent Activities: {user_activities}\n"
+                "Body Measurements: {user_measurements}\n"
+                "Nutrition Intake: {user_nutrition}\n"
+                "Context: {context}\n\n"
+                
+                "USER REQUEST: {user_message}"
             ),
             expected_output="Concise nutrition guidance with specific meal suggestions and generated meal images when applicable",
             agent=self.nutritionist_agent,
@@ -192,35 +171,28 @@ class FitnessCrew:
         """Create the fitness task for workout and exercise requests"""
         return Task(
             description=(
-                "Provide a complete workout plan for: {user_message}\n\n"
+                "Provide a complete workout plan for the user request at the end of this task.\n\n"
+                "Instructions:\n"
+                "1. If the request is about workouts, provide a structured plan with exercises, sets, reps, and rest.\n"
+                "2. Include 1-2 progression guidelines and safety/form notes.\n"
+                "3. If the request is about meals, nutrition, recipes, or pasta, reply 'Not applicable' and DO NOT answer.\n\n"
                 "USER PROFILE & DATA:\n"
                 "User ID: {user_id}\n"
                 "Profile: {user_profile}\n"
                 "Recent Activities: {user_activities}\n"
                 "Body Measurements: {user_measurements}\n"
                 "Context: {context}\n\n"
-                "Instructions:\n"
-                "1. If the request is about workouts, provide a structured plan with exercises, sets, reps, and rest.\n"
-                "2. Include 1-2 progression guidelines and safety/form notes.\n"
-                "3. If the request is about meals, nutrition, recipes, or pasta, reply 'Not applicable' and DO NOT answer."
+                "USER REQUEST: {user_message}"
             ),
             expected_output="A clear, structured workout plan or 'Not applicable' if the request is not fitness-related.",
             agent=self.fitness_agent,
         )
 
-    def create_main_task(self):
-        """Main task that the manager will delegate appropriately"""
+    def create_main_task(self, agent=None, assign=True):
+        """Main task that the manager will delegate appropriately; assign=False leaves it without an agent"""
         return Task(
             description=(
-                "Handle this user request with personalized guidance: {user_message}\n\n"
-                "USER PROFILE & DATA:\n"
-                "User ID: {user_id}\n"
-                "Profile: {user_profile}\n"
-                "Recent Activities: {user_activities}\n"
-                "Body Measurements: {user_measurements}\n"
-                "Nutrition Intake: {user_nutrition}\n"
-                "Conversation History: {context}\n\n"
-                
+                "Handle the user request at the end of this task with personalized guidance.\n\n"
                 "DELEGATION INSTRUCTIONS:\n"
                 "As the manager, analyze this request and delegate to the appropriate specialist:\n\n"
                 
@@ -245,14 +217,39 @@ class FitnessCrew:
                 
                 "Ensure the specialist receives all relevant user data for personalized advice. "
                 "The specialist should provide a complete, detailed response that fully addresses "
-                "the user's specific request."
+                "the user's specific request.\n\n"
+                
+                "USER PROFILE & DATA:\n"
+                "User ID: {user_id}\n"
+                "Profile: {user_profile}\n"
+                "Recent Activities: {user_activities}\n"
+                "Body Measurements: {user_measurements}\n"
+                "Nutrition Intake: {user_nutrition}\n"
+                "Conversation History: {context}\n\n"
+                
+                "USER REQUEST: {user_message}"
             ),
             expected_output=(
                 "A comprehensive, personalized response that fully addresses the user's request. "
                 "This should be either a detailed workout plan (from fitness coach) or complete "
                 "nutrition guidance (from nutritionist), tailored to the user's data and goals."
             ),
-            agent=self.manager_agent,
+            agent=(agent or self.manager_agent) if assign else None,
+        )
+
+    def specialist_crew(self, specialist, memory=True):
+        """Create a sequential crew that sends the request straight to one specialist"""
+        agent, task = {
+            "fitness": (self.fitness_agent, self.create_fitness_task),
+            "nutrition": (self.nutritionist_agent, self.create_nutritionist_task),
+        }[specialist]
+        return Crew(
+            agents=[agent],
+            tasks=[task()],
+            process=Process.sequential,
+            verbose=True,
+            memory=memory,
+            **crew_memory(memory),
         )
 
     def chat_crew(self):
@@ -270,7 +267,26 @@ class FitnessCrew:
                 self.create_nutritionist_task(),
             ],
             process=Process.hierarchical,
-            manager_llm=self.llm,
+            manager_llm=self.llms["manager"],
             verbose=True,
             memory=True,  # Disable Crew memory to avoid LiteLLM/Azure memory errors
-        )
\ No newline at end of file
+            **crew_memory(),  # Local embeddings and bounded storage; see local_memory.py
+        )
+
+    def lite_chat_crew(self):
+        """Create a hierarchical crew with only the main task, no manager reasoning and no memory"""
+        # Passed as manager_agent (not manager_llm), so this agent, not a crewai-built one, manages
+        manager = self.create_manager_agent(reasoning=False)
+        # A task without an agent lets the manager delegate to either specialist
+        task = self.create_main_task(assign=False)
+        return Crew(
+            agents=[
+                self.fitness_agent,
+                self.nutritionist_agent,
+            ],
+            tasks=[task],
+            process=Process.hierarchical,
+            manager_agent=manager,
+            verbose=True,
+            memory=False,
+        )
@@ -0,0 +1,239 @@
+"""Pool of pre-built FitnessCrew instances for the chat endpoints.
+
+Building a FitnessCrew creates the LLM client, the FluxImageGenerator tool, three
+agents and the hierarchical chat crew; the crews other execution profiles and
+intent routes use are built from it on first use. The pool builds
+HACK_SENECA_CREW_POOL_SIZE of them once (warmed at server startup) and hands
+one to each request.
+
+A crew is only ever used by one run at a time. Kickoff leaves per-run state
+behind on the crew, its agents and its tasks, so every crew is reset before it
+goes back to the pool. That state includes the hierarchical manager agent,
+which a second kickoff refuses to reuse, token counters, tool results, retry
+counts and task outputs. Crew memory storage is shared, as it was when each
+request built its own crew.
+"""
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from crewai.agents.agent_builder.utilities.base_token_process import TokenProcess
+
+from .llm_config import record_token_usage
+from .metrics import get_metrics
+from .profiles import DEFAULT_PROFILE, crew_name
+from .prompt_context import build_context
+
+POOL_SIZE = int(os.getenv("HACK_SENECA_CREW_POOL_SIZE", "4"))
+CHECKOUT_TIMEOUT = float(os.getenv("HACK_SENECA_CREW_POOL_TIMEOUT", "30"))
+
+
+class PoolExhausted(TimeoutError):
+    """No crew became free within the checkout timeout"""
+
+
+class PooledCrew:
+    """A FitnessCrew and the crews built from it, reusable across runs"""
+
+    def __init__(self, metrics=None):
+        from .crew import FitnessCrew
+        self.fitness_crew = FitnessCrew()
+        self.crew = self.fitness_crew.chat_crew()
+        # Crews by name (see profiles.PROFILES); the others are built on first use
+        self.crews = {"manager": self.crew}
+        # The manager agent each crew was built with, if any, by crew id
+        self._managers = {id(self.crew): self.crew.manager_agent}
+        self.runs = 0
+        self._metrics = metrics or get_metrics()
+
+    def _build_crew(self, name):
+        fitness_crew = self.fitness_crew
+        if name == "lite_manager":
+            return fitness_crew.lite_chat_crew()
+        if name in ("fitness", "nutrition"):
+            return fitness_crew.specialist_crew(name)
+        if name in ("lite_fitness", "lite_nutrition"):
+            return fitness_crew.specialist_crew(name[len("lite_"):], memory=False)
+        raise ValueError(f"Unknown crew: {name}")
+
+    def get_crew(self, name):
+        """Return a crew by name, building it the first time"""
+        crew = self.crews.get(name)
+        if crew is None:
+            crew = self.crews[name] = self._build_crew(name)
+            self._managers[id(crew)] = crew.manager_agent
+        return crew
+
+    def kickoff(self, inputs, stream=False, route="manager", profile=DEFAULT_PROFILE):
+        """Run the crew a profile uses for a route once and reset it for the next run.
+
+        With stream=True the LLM streams its responses, emitting
+        LLMStreamChunkEvent on the crewai event bus as tokens arrive.
+        """
+        crew = self.get_crew(crew_name(profile, route))
+        inputs = build_context(inputs, profile, metrics=self._metrics)
+        self._set_stream(stream)
+        start = time.perf_counter()
+        try:
+            result = crew.kickoff(inputs=inputs)
+        finally:
+            self.runs += 1
+            self._set_stream(False)
+            self._metrics.observe(f"profile.{profile}.seconds", time.perf_counter() - start)
+            # Token counters live on the agents and are cleared by reset()
+            record_token_usage(crew, self._metrics)
+            self.reset(crew)
+        self._record_usage(profile, result)
+        return result
+
+    def _set_stream(self, stream):
+        for llm in self.fitness_crew.llms.values():
+            llm.stream = stream
+
+    def _record_usage(self, profile, result):
+        self._metrics.incr(f"profile.{profile}.runs")
+        usage = getattr(result, "token_usage", None)
+        if usage is None:
+            return
+        self._metrics.incr(f"profile.{profile}.total_tokens", usage.total_tokens)
+        self._metrics.incr(f"profile.{profile}.prompt_tokens", usage.prompt_tokens)
+        self._metrics.incr(f"profile.{profile}.completion_tokens", usage.completion_tokens)
+        self._metrics.incr(f"profile.{profile}.llm_requests", usage.successful_requests)
+
+    def reset(self, crew=None):
+        """Clear the state a kickoff leaves on a crew (default: the chat crew), its agents and its tasks"""
+        crew = crew or self.crew
+        # Hierarchical kickoff with manager_llm builds a manager with delegation tools and keeps it;
+        # the next kickoff raises if it finds a manager with tools, so start fresh. A manager
+        # the crew was built with stays, and is cleared like the other agents.
+        manager = self._managers.get(id(crew))
+        crew.manager_agent = manager
+        crew.usage_metrics = None
+        crew._inputs = None
+        agents = list(crew.agents)
+        if manager is not None:
+            manager.tools = []
+            agents.append(manager)
+        for agent in agents:
+            agent._token_process = TokenProcess()
+            agent.tools_results = []
+            if hasattr(agent, "_times_executed"):
+                agent._times_executed = 0
+        for task in crew.tasks:
+            task.output = None
+            task.used_tools = 0
+            task.tools_errors = 0
+            task.delegations = 0
+            task.retry_count = 0
+            task.processed_by_agents = set()
+            task.start_time = None
+            task.end_time = None
+
+
+class CrewPool:
+    """Fixed-size pool of PooledCrew instances, built lazily or warmed up front"""
+
+    def __init__(self, size=POOL_SIZE, factory=PooledCrew, metrics=None):
+        if size < 1:
+            raise ValueError("Crew pool size must be at least 1")
+        self.size = size
+        self._factory = factory
+        self._idle = queue.LifoQueue()
+        self._built = 0
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self._metrics = metrics or get_metrics()
+        self._metrics.gauge("crew_pool.size", lambda: self.size)
+        self._metrics.gauge("crew_pool.built", lambda: self._built)
+        self._metrics.gauge("crew_pool.in_use", lambda: self._in_use)
+        self._metrics.gauge("crew_pool.utilization", lambda: round(self._in_use / self.size, 3))
+
+    def _build(self):
+        start = time.perf_counter()
+        crew = self._factory()
+        self._metrics.observe("crew_pool.build_seconds", time.perf_counter() - start)
+        return crew
+
+    def _reserve_build(self):
+        with self._lock:
+            if self._built >= self.size:
+                return False
+            self._built += 1
+            return True
+
+    def warm(self):
+        """Build every crew the pool is missing"""
+        while self._reserve_build():
+            try:
+                self._idle.put(self._build())
+            except Exception:
+                with self._lock:
+                    self._built -= 1
+                raise
+        print(f"🏊 Crew pool ready with {self._built} crews")
+
+    def _acquire(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        if self._reserve_build():
+            try:
+                return self._build()
+            except Exception:
+                with self._lock:
+                    self._built -= 1
+                raise
+        self._metrics.incr("crew_pool.waits")
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            self._metrics.incr("crew_pool.exhausted")
+            raise PoolExhausted(f"No crew became free within {timeout:.0f}s") from None
+
+    @contextmanager
+    def checkout(self, timeout=CHECKOUT_TIMEOUT):
+        """Borrow a crew for one run; it is reset and returned when the block exits"""
+        start = time.perf_counter()
+        crew = self._acquire(timeout)
+        self._metrics.observe("crew_pool.checkout_wait_seconds", time.perf_counter() - start)
+        self._metrics.incr("crew_pool.checkouts")
+        with self._lock:
+            self._in_use += 1
+        healthy = True
+        try:
+            yield crew
+        except BaseException:
+            healthy = False
+            raise
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            if healthy:
+                self._idle.put(crew)
+            else:
+                # A failed run may leave state reset() does not know about; build a new one later
+                with self._lock:
+                    self._built -= 1
+                self._metrics.incr("crew_pool.discarded")
+
+    def stats(self):
+        """Return size, built, idle and in-use counts"""
+        with self._lock:
+            return {"size": self.size, "built": self._built, "in_use": self._in_use, "idle": self._idle.qsize()}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_crew_pool():
+    """Return the process-wide crew pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = CrewPool()
+    return _pool
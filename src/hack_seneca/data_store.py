@@ -0,0 +1,333 @@
+"""Process-wide user data store over the users_data/ JSON files.
+
+Each file is parsed once and indexed by user_id. Rows are kept sorted by date
+(oldest first) so the most recent entries are a cheap slice from the end. A
+file is only re-parsed when its mtime or size changes on disk.
+
+Files larger than HACK_SENECA_STREAM_THRESHOLD_MB are never indexed in memory;
+they are streamed per lookup and only the requested user's rows are kept.
+"""
+import bisect
+import json
+import os
+import threading
+
+from .streaming import iter_json_array, scan_user_rows
+
+DATASET_FILES = {
+    "users": "fitness-users.json",
+    "activities": "fitness-activities.json",
+    "measurements": "fitness-measurements.json",
+    "nutrition": "fitness-nutrition.json",
+}
+
+
+STREAM_THRESHOLD_BYTES = int(float(os.getenv("HACK_SENECA_STREAM_THRESHOLD_MB", "256")) * 1024 * 1024)
+
+
+def default_users_data_dir():
+    """Return the users_data/ directory at the project root"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(os.path.dirname(current_dir))
+    return os.path.join(project_root, "users_data")
+
+
+def _date_key(row):
+    return row.get("date", "")
+
+
+def project(rows, fields=None):
+    """Keep only the requested fields (plus date) of each row"""
+    if not fields:
+        return list(rows)
+    keep = ["date"] + [f for f in fields if f != "date"]
+    return [{f: row[f] for f in keep if f in row} for row in rows]
+
+
+class _Table:
+    """One parsed data file plus its user_id index.
+
+    For streamed datasets the index only holds rows from the ingest log; the
+    base file is scanned per lookup.
+    """
+
+    __slots__ = ("path", "signature", "index", "streamed", "log_position")
+
+    def __init__(self, path, signature, index, streamed=False):
+        self.path = path
+        self.signature = signature
+        self.index = index
+        self.streamed = streamed
+        self.log_position = (None, 0)
+
+
+class JSONUserStore:
+    """In-memory user_id index over the users_data JSON files with mtime-based invalidation.
+
+    Rows appended through append() go to the ingest log (see ingest_log.py)
+    and are merged into the index as the log is tailed, so they are visible
+    without rewriting the base files.
+    """
+
+    def __init__(self, users_data_dir=None, stream_threshold=STREAM_THRESHOLD_BYTES):
+        self.users_data_dir = users_data_dir or default_users_data_dir()
+        self.stream_threshold = stream_threshold
+        self._tables = {}
+        self._scans = {}
+        self._subscribers = []
+        self._generation = 0
+        self._log = None
+        self._lock = threading.Lock()
+
+    def path_for(self, dataset):
+        """Return the on-disk path for a dataset name"""
+        if dataset not in DATASET_FILES:
+            raise KeyError(f"Unknown dataset: {dataset}")
+        return os.path.join(self.users_data_dir, DATASET_FILES[dataset])
+
+    def _log_path(self, dataset):
+        from .ingest_log import default_log_dir, log_path
+        return log_path(default_log_dir(self.users_data_dir), dataset)
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def _build_index(dataset, records):
+        index = {}
+        if dataset == "users":
+            for record in records:
+                # Keep the first profile for a user_id, like the original linear scan did
+                index.setdefault(record["user_id"], record)
+            return index
+
+        # Rows are kept oldest first with same-date rows in reverse file order,
+        # so reading from the end gives the same order as a stable newest-first sort
+        for record in reversed(records):
+            index.setdefault(record["user_id"], []).append(record)
+        for rows in index.values():
+            rows.sort(key=_date_key)
+        return index
+
+    @staticmethod
+    def _insert(index, record):
+        rows = index.setdefault(record["user_id"], [])
+        bisect.insort_left(rows, record, key=_date_key)
+
+    def _is_streamed(self, dataset, signature):
+        return dataset != "users" and signature is not None and signature[1] > self.stream_threshold
+
+    def _load(self, dataset, path, signature):
+        streamed = self._is_streamed(dataset, signature)
+        if signature is None or streamed:
+            index = {}
+        else:
+            print(f"📁 Indexing {dataset} from {path}")
+            with open(path, "r") as f:
+                index = self._build_index(dataset, json.load(f))
+        table = _Table(path, signature, index, streamed)
+
+        if dataset != "users":
+            # Rows appended since the last compaction are part of the dataset too
+            from .ingest_log import read_log
+            records, table.log_position = read_log(self._log_path(dataset))
+            for record in records:
+                self._insert(table.index, record)
+        if dataset in self._tables:
+            # Only a reload changes the token; opening a dataset for the first time does not
+            self._generation += 1
+        return table
+
+    def _table(self, dataset):
+        """Return the table for a dataset, reloading the file only if it changed
+        and merging any rows appended to the ingest log since the last call."""
+        path = self.path_for(dataset)
+        signature = self._signature(path)
+        table = self._tables.get(dataset)
+        if table is None or table.signature != signature:
+            with self._lock:
+                table = self._tables.get(dataset)
+                if table is None or table.signature != signature:
+                    table = self._load(dataset, path, signature)
+                    self._tables[dataset] = table
+        if dataset == "users":
+            return table
+        return self._tail_log(dataset, table)
+
+    def _tail_log(self, dataset, table):
+        from .ingest_log import log_position, read_log
+        log_path = self._log_path(dataset)
+        current = log_position(log_path)
+        if current == table.log_position:
+            return table
+
+        with self._lock:
+            if self._tables.get(dataset) is not table:
+                return self._tables[dataset]
+            if table.log_position[0] is not None and current[0] != table.log_position[0]:
+                # The log was compacted into the base file and replaced; start over from disk
+                table = self._load(dataset, table.path, self._signature(table.path))
+                self._tables[dataset] = table
+                return table
+            records, table.log_position = read_log(log_path, table.log_position)
+            for record in records:
+                self._insert(table.index, record)
+
+        for record in records:
+            for callback in self._subscribers:
+                callback(dataset, record)
+        return table
+
+    def subscribe(self, callback):
+        """Call ``callback(dataset, record)`` for every row appended after this point"""
+        self._subscribers.append(callback)
+
+    def append(self, dataset, records):
+        """Durably append records through the group-commit ingest log and make them visible"""
+        if self._log is None:
+            from .ingest_log import GroupCommitLog, default_log_dir
+            with self._lock:
+                if self._log is None:
+                    self._log = GroupCommitLog(default_log_dir(self.users_data_dir))
+        count = self._log.append(dataset, records)
+        self._table(dataset)
+        return count
+
+    def version(self):
+        """Sync with disk and return a token that changes whenever a base file is reloaded.
+
+        Rows picked up from the ingest log do not change the token; they are
+        delivered to subscribers instead.
+        """
+        for dataset in DATASET_FILES:
+            self._table(dataset)
+        return self._generation
+
+    def profile(self, user_id):
+        """Return the profile dict for a user, or None"""
+        return self._table("users").index.get(user_id)
+
+    def _scan(self, dataset, user_id, limit):
+        """Stream a large dataset for one user, reusing the previous scan when possible.
+
+        load_user_data asks for the recent rows and then the row count of the
+        same user, so remembering the last scan per dataset saves a second pass.
+        """
+        path = self.path_for(dataset)
+        signature = self._signature(path)
+        last = self._scans.get(dataset)
+        if last is not None:
+            last_user, last_signature, last_limit, rows, total = last
+            if last_user == user_id and last_signature == signature and (
+                last_limit is None or (limit is not None and limit <= last_limit)
+            ):
+                return rows[:limit] if limit is not None else rows, total
+
+        print(f"📁 Streaming {dataset} from {path}")
+        rows, total = scan_user_rows(path, user_id, limit)
+        self._scans[dataset] = (user_id, signature, limit, rows, total)
+        return rows, total
+
+    def _streamed_recent(self, table, dataset, user_id, limit):
+        rows, total = self._scan(dataset, user_id, limit)
+        appended = table.index.get(user_id)
+        if appended:
+            # Logged rows come after the base file, so they sort after it on date ties
+            rows = sorted(list(rows) + appended[::-1], key=_date_key, reverse=True)
+            if limit is not None:
+                rows = rows[:max(limit, 0)]
+            total += len(appended)
+        return list(rows), total
+
+    def rows(self, dataset, user_id):
+        """Return all rows for a user sorted by date, oldest first (do not mutate)"""
+        table = self._table(dataset)
+        if table.streamed:
+            rows, _ = self._streamed_recent(table, dataset, user_id, None)
+            return rows[::-1]
+        return table.index.get(user_id, [])
+
+    def recent(self, dataset, user_id, limit=None):
+        """Return a user's most recent rows, newest first"""
+        table = self._table(dataset)
+        if table.streamed:
+            rows, _ = self._streamed_recent(table, dataset, user_id, limit)
+            return rows
+
+        rows = table.index.get(user_id, [])
+        if limit is not None:
+            rows = rows[-limit:] if limit > 0 else []
+        return rows[::-1]
+
+    def date_range(self, dataset, user_id, start=None, end=None, fields=None):
+        """Return a user's rows with start <= date <= end, oldest first.
+
+        The per-user rows are already date-sorted, so the window is found with
+        two binary searches and only the matching slice is copied.
+        """
+        rows = self.rows(dataset, user_id)
+        lo = bisect.bisect_left(rows, start, key=_date_key) if start else 0
+        hi = bisect.bisect_right(rows, end, key=_date_key) if end else len(rows)
+        return project(rows[lo:hi], fields)
+
+    def rows_by_user(self, dataset):
+        """Return {user_id: rows oldest first} for a whole dataset (do not mutate)"""
+        table = self._table(dataset)
+        if not table.streamed:
+            return table.index
+        index = {}
+        for record in iter_json_array(table.path):
+            index.setdefault(record["user_id"], []).append(record)
+        for user_id, appended in table.index.items():
+            index.setdefault(user_id, []).extend(appended)
+        for rows in index.values():
+            rows.sort(key=_date_key)
+        return index
+
+    def count(self, dataset, user_id):
+        """Return the number of rows a user has in a dataset"""
+        table = self._table(dataset)
+        if table.streamed:
+            _, total = self._streamed_recent(table, dataset, user_id, 0)
+            return total
+        return len(table.index.get(user_id, []))
+
+    def user_count(self):
+        """Return the number of user profiles in the store"""
+        return len(self._table("users").index)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def create_data_store(backend=None):
+    """Create a user data store for a backend name ("json", "columnar", "sqlite" or "sharded")"""
+    backend = (backend or os.getenv("HACK_SENECA_DATA_BACKEND") or "json").lower()
+    if backend == "json":
+        return JSONUserStore()
+    if backend == "columnar":
+        from .columnar import ColumnarUserStore
+        return ColumnarUserStore()
+    if backend == "sqlite":
+        from .sqlite_store import SQLiteUserStore
+        return SQLiteUserStore()
+    if backend == "sharded":
+        from .shards import ShardedUserStore
+        return ShardedUserStore()
+    raise ValueError(f"Unknown data backend: {backend}")
+
+
+def get_data_store():
+    """Return the process-wide user data store selected by HACK_SENECA_DATA_BACKEND"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_data_store()
+    return _store
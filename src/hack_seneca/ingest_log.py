@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+"""Append-only ingestion log for tracker data.
+
+New activity, nutrition and measurement records are appended as JSON lines to
+users_data/ingest_log/<dataset>.jsonl instead of rewriting the base JSON
+files. A single writer thread group-commits every batch that is pending when
+it wakes up: one write and one fsync per dataset file, however many requests
+are waiting on it. The JSON data store tails these files so appended rows are
+visible to readers right away.
+
+``compact_ingest_log`` folds the log back into the base files and replaces it
+with a new, empty log file.
+"""
+import argparse
+import json
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from datetime import date
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-process locking is unavailable
+    fcntl = None
+
+from .data_store import DATASET_FILES, default_users_data_dir
+from .streaming import JSONArrayWriter, iter_json_array
+
+ROW_DATASETS = ("activities", "measurements", "nutrition")
+# Numeric fields every record must carry; the summary view, sketches and analytics read them all
+REQUIRED_FIELDS = {
+    "activities": ("steps", "calories_burned", "active_minutes", "distance_km", "heart_rate_avg",
+                   "workout_duration"),
+    "measurements": ("weight", "body_fat", "muscle_mass", "bmi", "waist", "chest", "bicep", "thigh",
+                     "body_water", "bone_mass"),
+    "nutrition": ("calories_consumed", "protein_g", "carbs_g", "fat_g", "fiber_g", "sugar_g", "sodium_mg"),
+}
+MAX_GROUP_RECORDS = 50000
+
+
+def default_log_dir(users_data_dir=None):
+    """Return the ingest log directory inside users_data/"""
+    return os.path.join(users_data_dir or default_users_data_dir(), "ingest_log")
+
+
+def log_path(log_dir, dataset):
+    return os.path.join(log_dir, f"{dataset}.jsonl")
+
+
+class _FileLock:
+    """Exclusive advisory lock shared by writers and the compactor across processes"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+def validate_record(dataset, record):
+    """Raise ValueError unless the record can be indexed by the data store"""
+    if dataset not in ROW_DATASETS:
+        raise ValueError(f"Unknown dataset: {dataset}")
+    if not isinstance(record, dict):
+        raise ValueError("Records must be JSON objects")
+    if not isinstance(record.get("user_id"), str) or not record["user_id"]:
+        raise ValueError("Every record needs a user_id")
+    value = record.get("date")
+    try:
+        # Rows are ordered by their date string, so only ISO calendar dates sort correctly
+        if not isinstance(value, str) or len(value) != 10:
+            raise ValueError
+        date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Every record needs a date (YYYY-MM-DD), got {value!r}") from None
+    for field in REQUIRED_FIELDS[dataset]:
+        value = record.get(field)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"{dataset} records need a numeric {field}, got {value!r}")
+
+
+def _file_id(st):
+    return (st.st_dev, st.st_ino)
+
+
+def log_position(path):
+    """Return the ``(file_id, size)`` of a log file, or ``(None, 0)`` if there is none"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return (None, 0)
+    return (_file_id(st), st.st_size)
+
+
+def read_log(path, position=None):
+    """Return ``(records, new_position)`` for the complete lines after ``position``.
+
+    A position is ``(file_id, offset)``. Compaction replaces the log with a new
+    file, so a position in any other file reads the current one from the start.
+    """
+    try:
+        with open(path, "rb") as f:
+            file_id = _file_id(os.fstat(f.fileno()))
+            offset = position[1] if position is not None and position[0] == file_id else 0
+            f.seek(offset)
+            data = f.read()
+    except FileNotFoundError:
+        return [], (None, 0)
+
+    end = data.rfind(b"\n") + 1  # ignore a trailing partial line still being written
+    records = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return records, (file_id, offset + end)
+
+
+class GroupCommitLog:
+    """Append-only JSONL log with a background group-commit writer"""
+
+    def __init__(self, log_dir=None, max_group_records=MAX_GROUP_RECORDS):
+        self.log_dir = log_dir or default_log_dir()
+        self.max_group_records = max_group_records
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.commits = 0
+        self.records_committed = 0
+
+    def _ensure_writer(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    os.makedirs(self.log_dir, exist_ok=True)
+                    self._thread = threading.Thread(
+                        target=self._writer_loop, name="ingest-log-writer", daemon=True
+                    )
+                    self._thread.start()
+
+    def submit(self, dataset, records):
+        """Queue a batch and return a Future resolved with its size once it is durable"""
+        for record in records:
+            validate_record(dataset, record)
+        future = Future()
+        if not records:
+            future.set_result(0)
+            return future
+        self._ensure_writer()
+        self._queue.put((dataset, list(records), future))
+        return future
+
+    def append(self, dataset, records):
+        """Append a batch and block until it has been committed"""
+        return self.submit(dataset, records).result()
+
+    def _writer_loop(self):
+        while True:
+            group = [self._queue.get()]
+            pending = len(group[0][1])
+            # Everything that queued up while the last fsync ran joins this commit
+            while pending < self.max_group_records:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                group.append(item)
+                pending += len(item[1])
+            self._commit(group)
+
+    def _commit(self, group):
+        by_dataset = {}
+        for dataset, records, future in group:
+            by_dataset.setdefault(dataset, []).append((records, future))
+
+        for dataset, batches in by_dataset.items():
+            futures = [future for _, future in batches]
+            try:
+                payload = "".join(
+                    json.dumps(record, separators=(",", ":")) + "\n"
+                    for records, _ in batches
+                    for record in records
+                ).encode()
+                path = log_path(self.log_dir, dataset)
+                with _FileLock(path + ".lock"):
+                    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                    try:
+                        os.write(fd, payload)
+                        os.fsync(fd)
+                    finally:
+                        os.close(fd)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            self.commits += 1
+            for records, future in batches:
+                self.records_committed += len(records)
+                future.set_result(len(records))
+
+
+def _chain_base(base_path, appended):
+    if os.path.exists(base_path):
+        yield from iter_json_array(base_path)
+    yield from appended
+
+
+def _write_array(f, records):
+    """Stream records out in the same indent=2 layout as the original files"""
+    writer = JSONArrayWriter(f)
+    for record in records:
+        writer.write(record)
+    writer.close()
+
+
+def compact(users_data_dir=None, log_dir=None):
+    """Fold the ingest log into the base JSON files and start a new, empty log"""
+    users_data_dir = users_data_dir or default_users_data_dir()
+    log_dir = log_dir or default_log_dir(users_data_dir)
+    folded = {}
+
+    for dataset in ROW_DATASETS:
+        path = log_path(log_dir, dataset)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            continue
+
+        # Writers block on the same lock, so nothing is appended while we fold
+        with _FileLock(path + ".lock"):
+            appended, _ = read_log(path)
+            if not appended:
+                continue
+
+            base_path = os.path.join(users_data_dir, DATASET_FILES[dataset])
+            tmp_path = f"{base_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                _write_array(f, _chain_base(base_path, appended))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, base_path)
+
+            # Swap in a new empty file rather than truncating in place: a reader's
+            # position in the old file can then never land inside a newer record.
+            # Readers that see the new base before the swap re-read both once the
+            # log file changes, so the overlap is never served for long
+            empty_path = f"{path}.{os.getpid()}.tmp"
+            open(empty_path, "wb").close()
+            os.replace(empty_path, path)
+            folded[dataset] = len(appended)
+            print(f"🗜️ Folded {len(appended)} {dataset} records into {base_path}")
+
+    if not folded:
+        print("✅ Ingest log is already empty")
+    return folded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fold the ingest log back into users_data/*.json")
+    parser.add_argument("--users-data-dir", default=None)
+    parser.add_argument("--shards", action="store_true", help="Compact every shard of users_data/shards in parallel")
+    args = parser.parse_args(argv)
+    if args.shards:
+        from .shards import map_shards
+        map_shards(compact)
+    else:
+        compact(args.users_data_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""Local intent classifier that routes chat messages without the manager LLM.
+
+The hierarchical crew spends a full manager LLM round trip just deciding
+between the fitness coach and the nutritionist. classify() makes that decision
+locally. Greetings are recognized by the word list the API has always used.
+Anything else goes to a small multinomial Naive Bayes model trained on the
+seed examples and keyword lists below, with classes fitness, nutrition and
+other, using the response cache's tokenizer.
+
+A fitness or nutrition prediction with at least HACK_SENECA_INTENT_THRESHOLD
+posterior probability (default 0.8) is sent straight to that specialist's
+task. Everything else is ``unclear`` and goes to the manager as before. That
+includes messages using keywords of both specialists and messages the model
+has no words for. Set
+HACK_SENECA_INTENT_ROUTING=0 to always use the manager.
+"""
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from .metrics import get_metrics
+from .response_cache import normalize_message
+
+ROUTING_ENABLED = os.getenv("HACK_SENECA_INTENT_ROUTING", "1") not in ("0", "false", "no")
+THRESHOLD = float(os.getenv("HACK_SENECA_INTENT_THRESHOLD", "0.8"))
+
+GREETINGS = {
+    "hi", "hello", "hey", "yo", "sup", "hej", "hola", "salut",
+    "good morning", "good afternoon", "good evening"
+}
+
+# Labels a confident prediction routes to; "other" and low confidence go to the manager
+SPECIALISTS = ("fitness", "nutrition")
+
+SEED_EXAMPLES = {
+    "fitness": [
+        "give me a push pull legs split",
+        "3 day full body workout plan",
+        "build me a 4 day upper lower routine",
+        "how many sets and reps for hypertrophy",
+        "best exercises for bigger arms",
+        "suggest a quick workout",
+        "hiit session I can do at home",
+        "how do I improve my squat form",
+        "deadlift technique tips",
+        "beginner strength training program",
+        "cardio routine for endurance",
+        "how should I warm up before lifting",
+        "core exercises for abs",
+        "training plan for my first 10k run",
+        "how long should I rest between sets",
+        "bench press plateau what should I change",
+        "mobility and stretching routine",
+        "leg day exercises without a barbell",
+        "gym program to build muscle",
+        "bodyweight workout with no equipment",
+        "increase my running pace",
+        "how many days a week should I train",
+        "progressive overload for pull ups",
+        "cycling intervals for fat loss",
+    ],
+    "nutrition": [
+        "what should I eat for lunch",
+        "give me a meal plan for the week",
+        "high protein breakfast ideas",
+        "pasta recipe for dinner",
+        "how many calories should I eat",
+        "how much protein do I need per day",
+        "healthy snacks for work",
+        "meal prep ideas for cutting",
+        "vegetarian dinner recipe",
+        "what should I eat before a workout",
+        "post workout meal suggestions",
+        "is creatine worth taking",
+        "should I take protein powder",
+        "macros for muscle gain",
+        "low carb diet plan",
+        "how do I reduce my sugar intake",
+        "what foods are high in fiber",
+        "grocery list for healthy eating",
+        "calorie deficit meal ideas",
+        "keto friendly recipes",
+        "how much water should I drink",
+        "smoothie recipe with oats",
+        "what to eat to lose weight",
+        "cheap high protein foods",
+    ],
+    "other": [
+        "how is my progress this week",
+        "I am feeling unmotivated",
+        "plan my rest day",
+        "review my goals",
+        "how am I doing",
+        "thanks",
+        "what can you help me with",
+        "tell me about my stats",
+        "I feel tired today",
+        "how did I sleep",
+        "am I on track",
+        "can you summarize my week",
+        "help",
+        "who are you",
+        "I need some advice",
+        "what do you think",
+    ],
+}
+
+
+# Domain vocabulary, trained as one extra document per class
+KEYWORDS = {
+    "fitness": (
+        "workout exercise training train routine split program gym lift lifting strength hypertrophy muscle "
+        "squat deadlift bench press row pull up push up lunge curl plank abs core cardio run running jog "
+        "cycling swim hiit interval sets reps rest form technique warm stretch mobility bodybuilding "
+        "powerlifting endurance marathon 5k 10k kettlebell dumbbell barbell glutes legs arms chest back shoulders"
+    ),
+    "nutrition": (
+        "eat eating food meal diet nutrition recipe recipes breakfast lunch dinner snack snacks calories protein "
+        "carbs fat fiber sugar sodium macros vitamin supplement creatine whey powder vegetarian vegan keto "
+        "pasta rice chicken salmon fish eggs oats fruit vegetables salad smoothie cook cooking grocery hydration "
+        "water fasting cutting bulking deficit surplus portion"
+    ),
+}
+
+
+class Intent:
+    """A classified message: label, confidence and the crew route it maps to"""
+
+    __slots__ = ("label", "confidence", "route")
+
+    def __init__(self, label, confidence, route):
+        self.label = label
+        self.confidence = confidence
+        self.route = route
+
+    def __repr__(self):
+        return f"Intent({self.label!r}, {self.confidence:.3f}, route={self.route!r})"
+
+
+def is_greeting(message):
+    """True if a message is short and made of greeting words only"""
+    text = (message or "").strip().lower()
+    # Normalize punctuation and extra spaces
+    text_clean = re.sub(r"[^a-z\s]", "", text)
+    return bool(text_clean) and len(text_clean.split()) <= 4 and all(
+        any(g in w for g in GREETINGS) for w in text_clean.split()
+    )
+
+
+class IntentClassifier:
+    """Multinomial Naive Bayes over message tokens with additive smoothing"""
+
+    def __init__(self, examples=SEED_EXAMPLES, keywords=KEYWORDS, threshold=THRESHOLD, alpha=0.1, metrics=None):
+        self.threshold = threshold
+        self._metrics = metrics or get_metrics()
+        self._log_priors = {}
+        self._log_likelihoods = {}
+        self._log_unseen = {}
+        total = sum(len(texts) for texts in examples.values())
+        counts = {}
+        for label, texts in examples.items():
+            counts[label] = Counter(t for text in (*texts, keywords.get(label, "")) for t in normalize_message(text))
+        self.vocabulary = set().union(*counts.values())
+        self._keywords = {label: set(normalize_message(text)) for label, text in keywords.items()}
+        for label, texts in examples.items():
+            denominator = sum(counts[label].values()) + alpha * len(self.vocabulary)
+            self._log_priors[label] = math.log(len(texts) / total)
+            self._log_likelihoods[label] = {
+                token: math.log((count + alpha) / denominator) for token, count in counts[label].items()
+            }
+            self._log_unseen[label] = math.log(alpha / denominator)
+
+    def probabilities(self, message):
+        """Return the posterior probability of each label, or {} if no token is known"""
+        tokens = [t for t in normalize_message(message) if t in self.vocabulary]
+        if not tokens:
+            return {}
+        scores = {
+            label: prior + sum(self._log_likelihoods[label].get(t, self._log_unseen[label]) for t in tokens)
+            for label, prior in self._log_priors.items()
+        }
+        top = max(scores.values())
+        exp = {label: math.exp(score - top) for label, score in scores.items()}
+        total = sum(exp.values())
+        return {label: value / total for label, value in exp.items()}
+
+    def _mixed(self, message):
+        tokens = set(normalize_message(message))
+        return all(tokens & self._keywords[label] for label in SPECIALISTS)
+
+    def classify(self, message):
+        """Classify a message as greeting, fitness, nutrition or unclear"""
+        if is_greeting(message):
+            intent = Intent("greeting", 1.0, None)
+        else:
+            probabilities = self.probabilities(message)
+            label, confidence = max(probabilities.items(), key=lambda item: item[1], default=("other", 0.0))
+            if self._mixed(message):
+                # "a workout and a meal plan" needs both specialists, which only the manager can combine
+                intent = Intent("unclear", confidence, "manager")
+            elif label in SPECIALISTS and confidence >= self.threshold and ROUTING_ENABLED:
+                intent = Intent(label, confidence, label)
+            else:
+                intent = Intent("unclear", confidence, "manager")
+        self._metrics.incr(f"intent.{intent.label}")
+        return intent
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_intent_classifier():
+    """Return the process-wide intent classifier"""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = IntentClassifier()
+    return _classifier
+
+
+def classify(message):
+    """Classify a message with the process-wide classifier"""
+    return get_intent_classifier().classify(message)
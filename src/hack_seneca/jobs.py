@@ -0,0 +1,292 @@
+"""Durable chat job queue and the worker processes that run it.
+
+``POST /api/chat/jobs`` stores the crew inputs as a job in a WAL-mode SQLite
+file (HACK_SENECA_JOBS_PATH, default users_data/jobs.db) and returns at once.
+Worker processes started with ``chat_worker --processes N`` claim queued jobs,
+run them on their own PooledCrew and store the reply, which the client polls
+for. API latency therefore does not depend on LLM latency, and workers can be
+scaled, restarted or run on their own without touching the API server.
+
+A claimed job holds a lease of HACK_SENECA_JOB_LEASE_SECONDS. If its worker
+dies, the job is claimed again once the lease expires, up to
+HACK_SENECA_JOB_MAX_ATTEMPTS times, and then marked failed. Finished jobs are
+deleted after HACK_SENECA_JOB_RETENTION_SECONDS.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from .conversations import clean_response, get_conversation_store
+from .data_store import default_users_data_dir
+from .profiles import DEFAULT_PROFILE
+
+MAX_QUEUED = int(os.getenv("HACK_SENECA_JOBS_MAX_QUEUED", "1000"))
+LEASE_SECONDS = float(os.getenv("HACK_SENECA_JOB_LEASE_SECONDS", "600"))
+MAX_ATTEMPTS = int(os.getenv("HACK_SENECA_JOB_MAX_ATTEMPTS", "2"))
+RETENTION_SECONDS = float(os.getenv("HACK_SENECA_JOB_RETENTION_SECONDS", "86400"))
+POLL_INTERVAL = 0.5
+
+STATUSES = ("queued", "running", "done", "failed")
+
+
+def default_jobs_path():
+    """Return the job queue database path, overridable with HACK_SENECA_JOBS_PATH"""
+    return os.getenv("HACK_SENECA_JOBS_PATH") or os.path.join(default_users_data_dir(), "jobs.db")
+
+
+class QueueFull(Exception):
+    """The job queue already holds HACK_SENECA_JOBS_MAX_QUEUED queued jobs"""
+
+
+class JobQueue:
+    """Chat jobs in one SQLite file shared by the API server and every worker"""
+
+    def __init__(self, path=None, max_queued=MAX_QUEUED, lease=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS,
+                 clock=time.time):
+        self.path = path or default_jobs_path()
+        self.max_queued = max_queued
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self._clock = clock
+        self._local = threading.local()
+
+    def _conn(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, user_id TEXT NOT NULL, status TEXT NOT NULL, "
+                "payload TEXT NOT NULL, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+                "worker TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL, lease_until REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+            self._local.conn = conn
+        return conn
+
+    def submit(self, user_id, payload, result=None):
+        """Queue a job and return its id; a job given a result is stored as already done"""
+        now = self._clock()
+        job_id = uuid.uuid4().hex
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if result is None:
+                (queued,) = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()
+                if queued >= self.max_queued:
+                    raise QueueFull(f"{queued} chat jobs are already queued, please retry shortly")
+            conn.execute(
+                "INSERT INTO jobs (id, user_id, status, payload, result, created_at, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, user_id, "queued" if result is None else "done", json.dumps(payload, default=str),
+                 result, now, None if result is None else now),
+            )
+        return job_id
+
+    def claim(self, worker):
+        """Take the oldest runnable job for a worker, or return None if there is none"""
+        now = self._clock()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Jobs whose worker died keep their lease until it expires; give up on them after max_attempts
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, "
+                "error = 'The worker running this job stopped responding' "
+                "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                (now, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started_at = ?, lease_until = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (worker, now, now + self.lease, row["id"]),
+            )
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return self._to_dict(job, payload=True)
+
+    def _finish(self, job_id, worker, status, result=None, error=None):
+        # Only the worker holding the job may finish it; a re-claimed job belongs to its new worker
+        cursor = self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL "
+            "WHERE id = ? AND worker = ? AND status = 'running'",
+            (status, result, error, self._clock(), job_id, worker),
+        )
+        return cursor.rowcount > 0
+
+    def complete(self, job_id, worker, result):
+        """Store a job's reply; returns False if the job was no longer this worker's"""
+        return self._finish(job_id, worker, "done", result=result)
+
+    def fail(self, job_id, worker, error):
+        """Mark a job failed; returns False if the job was no longer this worker's"""
+        return self._finish(job_id, worker, "failed", error=error)
+
+    def get(self, job_id):
+        """Return a job as a dict, or None if it does not exist"""
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def position(self, job):
+        """Return how many queued jobs are ahead of a queued job"""
+        (ahead,) = self._conn().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at < ?", (job["created_at"],)
+        ).fetchone()
+        return ahead
+
+    def purge(self, older_than=RETENTION_SECONDS):
+        """Delete finished jobs older than older_than seconds and return how many went"""
+        cursor = self._conn().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (self._clock() - older_than,),
+        )
+        return cursor.rowcount
+
+    def stats(self):
+        """Return the number of jobs in each status"""
+        counts = dict.fromkeys(STATUSES, 0)
+        for status, count in self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = count
+        return counts
+
+    @staticmethod
+    def _to_dict(row, payload=False):
+        job = {key: row[key] for key in row.keys() if key != "payload"}
+        if payload:
+            job["payload"] = json.loads(row["payload"])
+        return job
+
+
+_jobs = None
+_jobs_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Return the process-wide job queue"""
+    global _jobs
+    if _jobs is None:
+        with _jobs_lock:
+            if _jobs is None:
+                _jobs = JobQueue()
+    return _jobs
+
+
+class JobWorker:
+    """Claims chat jobs and runs them on one PooledCrew until stopped"""
+
+    def __init__(self, jobs=None, crew_factory=None, name=None, poll_interval=POLL_INTERVAL):
+        self.jobs = jobs or get_job_queue()
+        self._crew_factory = crew_factory
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.poll_interval = poll_interval
+        self.processed = 0
+        self._crew = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Finish the current job, then leave run()"""
+        self._stop.set()
+
+    def _get_crew(self):
+        if self._crew is None:
+            if self._crew_factory is None:
+                from .crew_pool import PooledCrew
+                self._crew_factory = PooledCrew
+            self._crew = self._crew_factory()
+        return self._crew
+
+    def run_one(self):
+        """Run the next job if there is one; returns False when the queue was empty"""
+        job = self.jobs.claim(self.name)
+        if job is None:
+            return False
+        print(f"🛠️ Worker {self.name} running job {job['id']} for user {job['user_id']}")
+        try:
+            payload = job["payload"]
+            result = self._get_crew().kickoff(
+                payload["inputs"],
+                route=payload.get("route", "manager"),
+                profile=payload.get("profile", DEFAULT_PROFILE),
+            )
+        except Exception as e:
+            print(f"❌ Job {job['id']} failed: {e}")
+            # The crew may be left in a state reset() does not cover; build a fresh one next time
+            self._crew = None
+            self.jobs.fail(job["id"], self.name, str(e))
+        else:
+            reply = clean_response(result)
+            if self.jobs.complete(job["id"], self.name, reply) and payload.get("message"):
+                try:
+                    get_conversation_store().append(job["user_id"], payload["message"], reply)
+                except Exception as e:
+                    print(f"⚠️ Could not record job {job['id']} in the conversation history: {e}")
+            print(f"✅ Job {job['id']} done")
+        self.processed += 1
+        return True
+
+    def run(self):
+        """Poll for jobs until stop() is called"""
+        last_purge = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() - last_purge > 60:
+                self.jobs.purge()
+                last_purge = time.monotonic()
+            if not self.run_one():
+                self._stop.wait(self.poll_interval)
+
+
+def _worker_process(index, poll_interval):
+    worker = JobWorker(name=f"{socket.gethostname()}:{os.getpid()}:{index}", poll_interval=poll_interval)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    print(f"👷 Chat worker {worker.name} waiting for jobs in {worker.jobs.path}")
+    worker.run()
+    print(f"👋 Chat worker {worker.name} stopped after {worker.processed} jobs")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run chat job worker processes")
+    parser.add_argument("--processes", type=int, default=int(os.getenv("HACK_SENECA_JOB_WORKERS", "2")))
+    parser.add_argument("--poll-interval", type=float, default=POLL_INTERVAL)
+    args = parser.parse_args(argv)
+
+    # Create the schema once before the workers race for it
+    JobQueue()._conn()
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_worker_process, args=(i, args.poll_interval), name=f"chat-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def forward(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Bounded worker pool for blocking crew kickoffs.
+
+``crew.kickoff`` blocks for as long as the LLM chain takes, so async handlers
+hand it to this executor instead of calling it on the event loop. At most
+HACK_SENECA_KICKOFF_WORKERS kickoffs run at once and at most
+HACK_SENECA_KICKOFF_QUEUE_DEPTH wait behind them. Anything beyond that is
+rejected immediately with a Retry-After estimate, rather than waiting
+indefinitely. A single user may have at most HACK_SENECA_KICKOFF_PER_USER
+kickoffs admitted at a time.
+
+Queue wait and run time are reported as kickoff.queue_wait_seconds and
+kickoff.run_seconds in /api/metrics.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .crew_pool import POOL_SIZE
+from .metrics import get_metrics
+
+WORKERS = int(os.getenv("HACK_SENECA_KICKOFF_WORKERS", str(POOL_SIZE)))
+QUEUE_DEPTH = int(os.getenv("HACK_SENECA_KICKOFF_QUEUE_DEPTH", "16"))
+PER_USER_LIMIT = int(os.getenv("HACK_SENECA_KICKOFF_PER_USER", "2"))
+DEFAULT_RUN_SECONDS = 30.0
+
+
+class Overloaded(Exception):
+    """A kickoff was rejected; status_code is 503 for a full queue and 429 for a busy user"""
+
+    def __init__(self, message, retry_after, status_code=503):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class KickoffExecutor:
+    """Thread pool with admission control in front of it"""
+
+    def __init__(self, workers=WORKERS, queue_depth=QUEUE_DEPTH, per_user=PER_USER_LIMIT, metrics=None):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.per_user = per_user
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kickoff")
+        self._pending = 0
+        self._running = 0
+        self._per_key = {}
+        self._avg_run = DEFAULT_RUN_SECONDS
+        self._lock = threading.Lock()
+        self._metrics = metrics or get_metrics()
+        self._metrics.gauge("kickoff.running", lambda: self._running)
+        self._metrics.gauge("kickoff.queued", lambda: self._pending - self._running)
+
+    def _retry_after(self):
+        # Time for the work already admitted to drain through the workers
+        backlog = max(self._pending - self.workers + 1, 1)
+        return max(1, min(120, math.ceil(self._avg_run * backlog / self.workers)))
+
+    def _admit(self, key):
+        with self._lock:
+            if self._pending >= self.workers + self.queue_depth:
+                self._metrics.incr("kickoff.rejected_overloaded")
+                raise Overloaded("The coach is at capacity, please retry shortly", self._retry_after())
+            if key is not None and self._per_key.get(key, 0) >= self.per_user:
+                self._metrics.incr("kickoff.rejected_per_user")
+                raise Overloaded(
+                    "You already have requests in progress, please wait for them to finish",
+                    self._retry_after(),
+                    status_code=429,
+                )
+            self._pending += 1
+            if key is not None:
+                self._per_key[key] = self._per_key.get(key, 0) + 1
+
+    def _release(self, key):
+        with self._lock:
+            self._pending -= 1
+            if key is not None:
+                remaining = self._per_key[key] - 1
+                if remaining:
+                    self._per_key[key] = remaining
+                else:
+                    del self._per_key[key]
+
+    def _call(self, submitted, fn, args):
+        started = time.perf_counter()
+        self._metrics.observe("kickoff.queue_wait_seconds", started - submitted)
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._metrics.observe("kickoff.run_seconds", elapsed)
+            with self._lock:
+                self._running -= 1
+                self._avg_run = 0.8 * self._avg_run + 0.2 * elapsed
+
+    def submit(self, fn, *args, key=None):
+        """Queue fn(*args) for a worker thread and return its Future, or raise Overloaded"""
+        self._admit(key)
+        try:
+            future = self._pool.submit(self._call, time.perf_counter(), fn, args)
+        except BaseException:
+            self._release(key)
+            raise
+        # Released when the work actually finishes, even if the client went away first
+        future.add_done_callback(lambda _: self._release(key))
+        self._metrics.incr("kickoff.admitted")
+        return future
+
+    async def run(self, fn, *args, key=None):
+        """Run fn(*args) on a worker thread, or raise Overloaded if it cannot be admitted"""
+        return await asyncio.wrap_future(self.submit(fn, *args, key=key))
+
+    def stats(self):
+        """Return worker, running and queued counts"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "running": self._running,
+                "queued": self._pending - self._running,
+            }
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_kickoff_executor():
+    """Return the process-wide kickoff executor"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = KickoffExecutor()
+    return _executor
@@ -0,0 +1,139 @@
+"""Per-role LLM configuration and per-role latency and token tracking.
+
+The crew uses the LLM in four roles:
+
+- ``manager``: the manager agent and the hierarchical crew's manager_llm
+- ``function_calling``: the nutritionist's function_calling_llm, for tool calls
+- ``fitness``: the fitness coach
+- ``nutrition``: the nutritionist
+
+Every role falls back to the shared Azure settings (``model``,
+``AZURE_AI_API_KEY``, ``AZURE_AI_ENDPOINT``, ``AZURE_AI_API_VERSION``, and
+temperature 0.1). Any of them can be overridden per role with
+HACK_SENECA_LLM_<ROLE>_MODEL, _API_KEY, _BASE_URL, _API_VERSION and
+_TEMPERATURE, for example HACK_SENECA_LLM_MANAGER_MODEL=azure/gpt-4o-mini to
+classify and delegate on a cheaper model.
+
+Each role gets its own LLM instance, even when configurations match, so every
+call can be attributed. The time spent in LLM calls is reported as
+llm.<role>.seconds, and failed calls as llm.<role>.failures. Prompt and
+completion tokens are counted as llm.<role>.prompt_tokens and
+llm.<role>.completion_tokens. They come from the agents' token counters, so
+they cover the agent roles; tool-calling requests made with
+function_calling_llm are timed but crewai does not count their tokens.
+"""
+import os
+import threading
+import time
+import weakref
+
+from crewai.llm import LLM
+
+from .metrics import get_metrics
+
+ROLES = ("manager", "function_calling", "fitness", "nutrition")
+
+_roles = weakref.WeakKeyDictionary()
+_calls = threading.local()
+_installed = False
+_install_lock = threading.Lock()
+
+
+def role_config(role):
+    """Return the model, credentials and temperature for a role, with per-role overrides applied"""
+    prefix = f"HACK_SENECA_LLM_{role.upper()}_"
+    temperature = os.getenv(prefix + "TEMPERATURE")
+    return {
+        "model": os.getenv(prefix + "MODEL") or os.getenv("model"),
+        "api_key": os.getenv(prefix + "API_KEY") or os.getenv("AZURE_AI_API_KEY"),
+        "base_url": os.getenv(prefix + "BASE_URL") or os.getenv("AZURE_AI_ENDPOINT"),
+        "api_version": os.getenv(prefix + "API_VERSION") or os.getenv("AZURE_AI_API_VERSION"),
+        "temperature": float(temperature) if temperature else 0.1,
+    }
+
+
+def create_llm(role):
+    """Build the LLM for a role and remember which role it serves"""
+    config = role_config(role)
+    # Set a dummy OpenAI key to satisfy CrewAI validation even when using Azure
+    os.environ["OPENAI_API_KEY"] = "dummy-key-for-azure"
+    if not config["api_key"] or not config["base_url"]:
+        print(f"Warning: Azure AI API credentials for the {role} LLM not found in environment variables.")
+        llm = LLM(model="gpt-3.5-turbo")
+    else:
+        llm = LLM(**config)
+    _roles[llm] = role
+    return llm
+
+
+def create_role_llms():
+    """Build one LLM per role and print the configuration"""
+    install_llm_metrics()
+    print("🔧 Configuring Azure LLMs:")
+    llms = {}
+    for role in ROLES:
+        config = role_config(role)
+        print(f"   {role}: {config['model']} at {config['base_url']} "
+              f"(API version {config['api_version']}, API key {'✅ Set' if config['api_key'] else '❌ Missing'})")
+        llms[role] = create_llm(role)
+    return llms
+
+
+def role_of(llm):
+    """Return the role an LLM was built for, or None"""
+    try:
+        return _roles.get(llm)
+    except TypeError:
+        # Not weak-referenceable, e.g. a model name string
+        return None
+
+
+def install_llm_metrics():
+    """Register event bus handlers that time LLM calls per role, once per process"""
+    global _installed
+    if _installed:
+        return
+    with _install_lock:
+        if _installed:
+            return
+        from crewai.events import LLMCallCompletedEvent, LLMCallFailedEvent, LLMCallStartedEvent, crewai_event_bus
+
+        metrics = get_metrics()
+
+        def started(source, event):
+            role = role_of(source)
+            if role is not None:
+                # Handlers run in the calling thread, so a thread-local start time is enough
+                starts = getattr(_calls, "starts", None)
+                if starts is None:
+                    starts = _calls.starts = {}
+                starts[id(source)] = time.perf_counter()
+
+        def finished(source, event, outcome):
+            role = role_of(source)
+            start = getattr(_calls, "starts", {}).pop(id(source), None)
+            if role is None or start is None:
+                return
+            metrics.observe(f"llm.{role}.seconds", time.perf_counter() - start)
+            metrics.incr(f"llm.{role}.{outcome}")
+
+        crewai_event_bus.register_handler(LLMCallStartedEvent, started)
+        crewai_event_bus.register_handler(LLMCallCompletedEvent, lambda s, e: finished(s, e, "calls"))
+        crewai_event_bus.register_handler(LLMCallFailedEvent, lambda s, e: finished(s, e, "failures"))
+        _installed = True
+
+
+def record_token_usage(crew, metrics=None):
+    """Add each agent's token counters after a kickoff to its LLM role's totals"""
+    metrics = metrics or get_metrics()
+    agents = list(crew.agents)
+    if crew.manager_agent is not None and all(agent is not crew.manager_agent for agent in agents):
+        agents.append(crew.manager_agent)
+    for agent in agents:
+        role = role_of(agent.llm)
+        if role is None:
+            continue
+        usage = agent._token_process.get_summary()
+        metrics.incr(f"llm.{role}.prompt_tokens", usage.prompt_tokens)
+        metrics.incr(f"llm.{role}.completion_tokens", usage.completion_tokens)
+        metrics.incr(f"llm.{role}.requests", usage.successful_requests)
@@ -0,0 +1,217 @@
+"""Bounded, offline storage for crew memory.
+
+With memory=True, crewai's default storage embeds every short-term and entity
+memory with a remote embedding API and keeps them in a Chroma collection that
+never shrinks. Crews built by crew.py use the storages here instead (with the
+default HACK_SENECA_MEMORY_BACKEND=local; set it to ``crewai`` for crewai's
+default storage):
+
+- text is embedded locally, with the response cache's hashed word and bigram
+  vectors, so saving and searching memory makes no network call
+- saves are buffered and written to SQLite in batches of
+  HACK_SENECA_MEMORY_BATCH_SIZE (default 16); a search writes pending saves
+  first, and so does interpreter exit
+- each memory type keeps its newest HACK_SENECA_MEMORY_MAX_ITEMS (default 500)
+  entries, and older ones are evicted from disk and from memory
+- long-term memory, crewai's task evaluations, is capped the same way
+
+Everything lives in one SQLite file (HACK_SENECA_MEMORY_PATH, default
+users_data/memory.db). Hashed-vector similarity is lower than dense-embedding
+similarity, so searches use HACK_SENECA_MEMORY_SCORE_THRESHOLD (default 0.2)
+rather than crewai's threshold. Each process searches the entries it loaded
+or wrote itself. Writes, evictions and search timings are reported as
+memory.<type>.* in /api/metrics.
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from crewai.memory.entity.entity_memory import EntityMemory
+from crewai.memory.long_term.long_term_memory import LongTermMemory
+from crewai.memory.short_term.short_term_memory import ShortTermMemory
+from crewai.memory.storage.interface import Storage
+from crewai.memory.storage.ltm_sqlite_storage import LTMSQLiteStorage
+
+from .data_store import default_users_data_dir
+from .metrics import get_metrics
+from .response_cache import cosine, normalize_message, vectorize
+
+BACKEND = os.getenv("HACK_SENECA_MEMORY_BACKEND", "local")
+MAX_ITEMS = int(os.getenv("HACK_SENECA_MEMORY_MAX_ITEMS", "500"))
+BATCH_SIZE = int(os.getenv("HACK_SENECA_MEMORY_BATCH_SIZE", "16"))
+SCORE_THRESHOLD = float(os.getenv("HACK_SENECA_MEMORY_SCORE_THRESHOLD", "0.2"))
+
+
+def default_memory_path():
+    """Return the memory database path, overridable with HACK_SENECA_MEMORY_PATH"""
+    return os.getenv("HACK_SENECA_MEMORY_PATH") or os.path.join(default_users_data_dir(), "memory.db")
+
+
+def embed(text):
+    """Embed text locally as a sparse hashed word and bigram vector"""
+    return vectorize(normalize_message(text))
+
+
+class LocalMemoryStorage(Storage):
+    """One memory type's newest entries, embedded locally and saved to SQLite in batches"""
+
+    def __init__(self, type, path=None, max_items=MAX_ITEMS, batch_size=BATCH_SIZE,
+                 score_threshold=SCORE_THRESHOLD, metrics=None, clock=time.time):
+        self.type = type
+        self.path = path or default_memory_path()
+        self.max_items = max_items
+        self.batch_size = batch_size
+        self.score_threshold = score_threshold
+        self._metrics = metrics or get_metrics()
+        self._clock = clock
+        self._items = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _conn(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS memories ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, type TEXT NOT NULL, content TEXT NOT NULL, "
+                "metadata TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_memories_type ON memories (type, id)")
+            self._local.conn = conn
+        return conn
+
+    def _load_locked(self):
+        if self._items is not None:
+            return
+        rows = self._conn().execute(
+            "SELECT id, content, metadata FROM memories WHERE type = ? ORDER BY id DESC LIMIT ?",
+            (self.type, self.max_items),
+        ).fetchall()
+        self._items = OrderedDict(
+            (row_id, (content, json.loads(metadata), embed(content))) for row_id, content, metadata in reversed(rows)
+        )
+
+    def save(self, value, metadata):
+        """Buffer a memory; the buffer is written once it holds batch_size entries"""
+        with self._lock:
+            self._pending.append((str(value), metadata or {}, self._clock()))
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        """Write buffered memories now"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        self._load_locked()
+        batch, self._pending = self._pending, []
+        vectors = [embed(content) for content, _, _ in batch]
+        conn = self._conn()
+        ids = []
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for content, metadata, created_at in batch:
+                cursor = conn.execute(
+                    "INSERT INTO memories (type, content, metadata, created_at) VALUES (?, ?, ?, ?)",
+                    (self.type, content, json.dumps(metadata, default=str), created_at),
+                )
+                ids.append(cursor.lastrowid)
+            # Keep the newest max_items rows of this type, whichever process wrote them
+            evicted = conn.execute(
+                "DELETE FROM memories WHERE type = ? AND id <= "
+                "(SELECT id FROM memories WHERE type = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (self.type, self.type, self.max_items),
+            ).rowcount
+        for row_id, (content, metadata, _), vector in zip(ids, batch, vectors):
+            self._items[row_id] = (content, metadata, vector)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+        self._metrics.incr(f"memory.{self.type}.writes", len(batch))
+        if evicted:
+            self._metrics.incr(f"memory.{self.type}.evicted", evicted)
+
+    def search(self, query, limit=5, score_threshold=None, **kwargs):
+        """Return the stored memories most similar to query, best first"""
+        start = time.perf_counter()
+        query_vector = embed(query)
+        with self._lock:
+            self._flush_locked()
+            self._load_locked()
+            scored = [
+                (cosine(query_vector, vector), row_id, content, metadata)
+                for row_id, (content, metadata, vector) in self._items.items()
+            ]
+        scored = sorted((item for item in scored if item[0] >= self.score_threshold), reverse=True)[:limit]
+        self._metrics.observe(f"memory.{self.type}.search_seconds", time.perf_counter() - start)
+        return [
+            {"id": str(row_id), "content": content, "metadata": metadata, "score": round(score, 3)}
+            for score, row_id, content, metadata in scored
+        ]
+
+    def reset(self):
+        """Forget every memory of this type"""
+        with self._lock:
+            self._pending = []
+            self._items = OrderedDict()
+            self._conn().execute("DELETE FROM memories WHERE type = ?", (self.type,))
+
+
+class BoundedLTMStorage(LTMSQLiteStorage):
+    """crewai's long-term memory table, trimmed to its newest max_items rows after each save"""
+
+    def __init__(self, db_path=None, max_items=MAX_ITEMS):
+        self.max_items = max_items
+        super().__init__(db_path=db_path or default_memory_path())
+
+    def save(self, task_description, metadata, datetime, score):
+        super().save(task_description, metadata, datetime, score)
+        with sqlite3.connect(self.db_path, timeout=30) as conn:
+            conn.execute(
+                "DELETE FROM long_term_memories WHERE id <= "
+                "(SELECT id FROM long_term_memories ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (self.max_items,),
+            )
+
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+def get_memory_storage(type):
+    """Return the process-wide storage for a memory type ("short_term", "entities" or "long_term")"""
+    storage = _storages.get(type)
+    if storage is None:
+        with _storages_lock:
+            storage = _storages.get(type)
+            if storage is None:
+                if type == "long_term":
+                    storage = BoundedLTMStorage()
+                else:
+                    storage = LocalMemoryStorage(type)
+                    atexit.register(storage.flush)
+                _storages[type] = storage
+    return storage
+
+
+def crew_memory(enabled=True):
+    """Return the Crew keyword arguments that put its memory on the local storages"""
+    if not enabled or BACKEND != "local":
+        return {}
+    # Memory wrappers track the crew's current agent and task, so each crew gets its own
+    return {
+        "short_term_memory": ShortTermMemory(storage=get_memory_storage("short_term")),
+        "entity_memory": EntityMemory(storage=get_memory_storage("entities")),
+        "long_term_memory": LongTermMemory(storage=get_memory_storage("long_term")),
+    }
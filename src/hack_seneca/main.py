@@ -4,7 +4,6 @@ import os
 import warnings
 import re
 import json
-from collections import deque
 from datetime import datetime, timedelta
 
 # Ensure src/ is on the path when running this file directly (python src/hack_seneca/main.py)
@@ -15,7 +14,12 @@ if _src_dir not in sys.path:
 
 try:
     # Import via the package so relative imports inside modules work
-    from hack_seneca.crew import FitnessCrew
+    from hack_seneca.crew_pool import PooledCrew
+    from hack_seneca.data_store import get_data_store
+    from hack_seneca.summary_view import get_summary_view
+    from hack_seneca.intent import classify
+    from hack_seneca.profiles import resolve_profile
+    from hack_seneca.conversations import NEW_CONVERSATION, clean_response, get_conversation_store
 except ImportError as e:
     print(f"Error: Could not import required modules: {e}")
     print("Tip: Run with 'python -m hack_seneca.main --interactive' from the project root, or use 'uv run run_crew'.")
@@ -50,7 +54,7 @@ def login():
             print("Examples: user_00001, user_12345, user_99999")
 
 def load_user_data(user_id):
-    """Load comprehensive user data from JSON files"""
+    """Load comprehensive user data from the process-wide data store"""
     print(f"📊 Loading user data for {user_id}...")
     
     user_data = {
@@ -62,101 +66,41 @@ def load_user_data(user_id):
         "summary": {}
     }
     
-    # Get the project root directory (two levels up from current file)
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(os.path.dirname(current_dir))
-    users_data_dir = os.path.join(project_root, "users_data")
+    store = get_data_store()
+    print(f"🔍 Looking for data files in: {store.users_data_dir}")
     
-    print(f"🔍 Looking for data files in: {users_data_dir}")
+    # Profile, recent rows and summary come from the materialized per-user view.
+    # Backend errors propagate; a missing profile (None) means the user was not found
+    view_entry = get_summary_view().get(user_id)
     
-    try:
-        # Load user profile
-        users_file = os.path.join(users_data_dir, "fitness-users.json")
-        print(f"📁 Checking users file: {users_file}")
-        print(f"📁 File exists: {os.path.exists(users_file)}")
-        
-        if os.path.exists(users_file):
-            with open(users_file, 'r') as f:
-                users = json.load(f)
-                print(f"📋 Found {len(users)} users in database")
-                user_data["profile"] = next((user for user in users if user["user_id"] == user_id), None)
-                print(f"👤 User profile found: {user_data['profile'] is not None}")
-        
-        # Load recent activities (last 7 days)
-        activities_file = os.path.join(users_data_dir, "fitness-activities.json")
-        print(f"📁 Checking activities file: {activities_file}")
-        print(f"📁 File exists: {os.path.exists(activities_file)}")
-        
-        if os.path.exists(activities_file):
-            with open(activities_file, 'r') as f:
-                activities = json.load(f)
-                user_activities = [activity for activity in activities if activity["user_id"] == user_id]
-                print(f"🏃 Found {len(user_activities)} activities for user")
-                # Sort by date and get recent ones
-                user_activities.sort(key=lambda x: x["date"], reverse=True)
-                user_data["recent_activities"] = user_activities[:7]  # Last 7 entries
-        
-        # Load recent measurements (last 5)
-        measurements_file = os.path.join(users_data_dir, "fitness-measurements.json")
-        print(f"📁 Checking measurements file: {measurements_file}")
-        print(f"📁 File exists: {os.path.exists(measurements_file)}")
-        
-        if os.path.exists(measurements_file):
-            with open(measurements_file, 'r') as f:
-                measurements = json.load(f)
-                user_measurements = [m for m in measurements if m["user_id"] == user_id]
-                print(f"📏 Found {len(user_measurements)} measurements for user")
-                # Sort by date and get recent ones
-                user_measurements.sort(key=lambda x: x["date"], reverse=True)
-                user_data["recent_measurements"] = user_measurements[:5]  # Last 5 entries
-        
-        # Load recent nutrition (last 7 days)
-        nutrition_file = os.path.join(users_data_dir, "fitness-nutrition.json")
-        print(f"📁 Checking nutrition file: {nutrition_file}")
-        print(f"📁 File exists: {os.path.exists(nutrition_file)}")
-        
-        if os.path.exists(nutrition_file):
-            with open(nutrition_file, 'r') as f:
-                nutrition = json.load(f)
-                user_nutrition = [n for n in nutrition if n["user_id"] == user_id]
-                print(f"🍎 Found {len(user_nutrition)} nutrition entries for user")
-                # Sort by date and get recent ones
-                user_nutrition.sort(key=lambda x: x["date"], reverse=True)
-                user_data["recent_nutrition"] = user_nutrition[:7]  # Last 7 entries
-        
-        # Create summary
-        if user_data["profile"]:
-            user_data["summary"]["profile"] = f"Age: {user_data['profile']['age']}, Weight: {user_data['profile']['weight']}kg, Height: {user_data['profile']['height']}cm, BMI: {user_data['profile']['bmi']}, Fitness Level: {user_data['profile']['fitness_level']}, Goals: {user_data['profile']['goals']}"
-        
-        if user_data["recent_activities"]:
-            avg_steps = sum(a["steps"] for a in user_data["recent_activities"]) / len(user_data["recent_activities"])
-            avg_calories = sum(a["calories_burned"] for a in user_data["recent_activities"]) / len(user_data["recent_activities"])
-            user_data["summary"]["activities"] = f"Recent avg: {avg_steps:.0f} steps/day, {avg_calories:.0f} calories burned/day"
-        
-        if user_data["recent_measurements"] and len(user_data["recent_measurements"]) >= 2:
-            latest = user_data["recent_measurements"][0]
-            previous = user_data["recent_measurements"][1]
-            weight_change = latest["weight"] - previous["weight"]
-            user_data["summary"]["measurements"] = f"Latest: {latest['weight']}kg, {latest['body_fat']}% body fat. Weight change: {weight_change:+.1f}kg since last measurement"
-        
-        if user_data["recent_nutrition"]:
-            avg_calories = sum(n["calories_consumed"] for n in user_data["recent_nutrition"]) / len(user_data["recent_nutrition"])
-            avg_protein = sum(n["protein_g"] for n in user_data["recent_nutrition"]) / len(user_data["recent_nutrition"])
-            user_data["summary"]["nutrition"] = f"Recent avg: {avg_calories:.0f} calories/day, {avg_protein:.0f}g protein/day"
-        
-        print("✅ User data loaded successfully!")
-        print(f"📊 Summary created: {len(user_data['summary'])} sections")
-        print(f"📋 Data loaded:")
-        print(f"   👤 Profile: {'✅' if user_data['profile'] else '❌'}")
-        print(f"   🏃 Activities: {len(user_data['recent_activities'])} entries")
-        print(f"   📏 Measurements: {len(user_data['recent_measurements'])} entries") 
-        print(f"   🍎 Nutrition: {len(user_data['recent_nutrition'])} entries")
-        return user_data
-        
-    except Exception as e:
-        print(f"⚠️ Warning: Could not load user data: {e}")
-        print("Continuing with basic functionality...")
-        return user_data
+    # Load user profile
+    user_data["profile"] = view_entry.profile
+    print(f"📋 Found {store.user_count()} users in database")
+    print(f"👤 User profile found: {user_data['profile'] is not None}")
+    
+    # Load recent activities (last 7 days)
+    user_data["recent_activities"] = view_entry.recent("activities")
+    print(f"🏃 Found {store.count('activities', user_id)} activities for user")
+    
+    # Load recent measurements (last 5)
+    user_data["recent_measurements"] = view_entry.recent("measurements")
+    print(f"📏 Found {store.count('measurements', user_id)} measurements for user")
+    
+    # Load recent nutrition (last 7 days)
+    user_data["recent_nutrition"] = view_entry.recent("nutrition")
+    print(f"🍎 Found {store.count('nutrition', user_id)} nutrition entries for user")
+    
+    # Create summary
+    user_data["summary"] = view_entry.summary()
+    
+    print("✅ User data loaded successfully!")
+    print(f"📊 Summary created: {len(user_data['summary'])} sections")
+    print(f"📋 Data loaded:")
+    print(f"   👤 Profile: {'✅' if user_data['profile'] else '❌'}")
+    print(f"   🏃 Activities: {len(user_data['recent_activities'])} entries")
+    print(f"   📏 Measurements: {len(user_data['recent_measurements'])} entries") 
+    print(f"   🍎 Nutrition: {len(user_data['recent_nutrition'])} entries")
+    return user_data
 
 def chat():
     """Start the conversational fitness chatbot"""
@@ -164,16 +108,23 @@ def chat():
     user_id = login()
     
     # Load user data
-    user_data = load_user_data(user_id)
+    try:
+        user_data = load_user_data(user_id)
+    except Exception as e:
+        print(f"❌ Could not load user data: {e}")
+        sys.exit(1)
+    if not user_data["profile"]:
+        print(f"⚠️ No fitness profile found for {user_id}. Continuing with basic functionality...")
     
     print("\n🏋️‍♂️ Fitness Chatbot Activated!")
     print("=" * 50)
     
     print("\n⚡ Initializing fitness assistant...")
     
-    # Initialize fitness crew
-    fitness_crew = FitnessCrew()
-    crew_instance = fitness_crew.chat_crew()
+    # Initialize fitness crew; PooledCrew resets it between turns so it can be kicked off repeatedly
+    crew_instance = PooledCrew()
+    profile = resolve_profile(user_id=user_id)
+    print(f"⚙️ Execution profile: {profile}")
     
     print("✅ Fitness assistant ready!")
     print("\n" + "=" * 50)
@@ -181,8 +132,10 @@ def chat():
     print("� Ask about workouts, nutrition, progress, or anything fitness-related")
     print("=" * 50 + "\n")
     
-    # Initialize conversation history for current session
-    conversation_history = deque(maxlen=6)  # Keep last 6 exchanges for context
+    # Conversation history persists across sessions, bounded by a rolling summary
+    conversations = get_conversation_store()
+    if conversations.context(user_id) != NEW_CONVERSATION:
+        print("🧠 Continuing your previous conversation")
 
     while True:
         try:
@@ -198,11 +151,8 @@ def chat():
         if not user_input:
             continue
 
-        # Add user message to session history
-        conversation_history.append(f"User: {user_input}")
-
-        # Prepare context from recent conversation history
-        recent_context = "\n".join(conversation_history)
+        # Prepare context from the stored conversation history
+        recent_context = conversations.context(user_id)
         
         # Format user data for the crew
         user_profile = user_data.get("summary", {}).get("profile", "No profile data available")
@@ -229,16 +179,13 @@ def chat():
         }
 
         try:
-            # Get response from crew
-            response = crew_instance.kickoff(inputs=inputs)
-            response_text = str(response).strip()
-            
-            # Clean up response text (remove any extra formatting)
-            if response_text.startswith("Assistant:"):
-                response_text = response_text[10:].strip()
+            # Get response from crew; clear fitness or nutrition requests skip the manager
+            intent = classify(user_input)
+            response = crew_instance.kickoff(inputs, route=intent.route or "manager", profile=profile)
+            response_text = clean_response(response)
             
-            # Add assistant response to session history
-            conversation_history.append(f"Assistant: {response_text}")
+            # Record the exchange in the conversation history
+            conversations.append(user_id, user_input, response_text)
             
             print(f"\nFitness Coach: {response_text}\n")
             
@@ -250,7 +197,10 @@ def chat():
 
 def run():
     """Console entry point used by pyproject scripts (run_crew, hack_seneca)."""
-    # For now we simply start the interactive chat flow
+    # --batch runs chat messages from a JSONL file; otherwise start the interactive chat flow
+    if "--batch" in sys.argv[1:] or any(arg.startswith("--batch=") for arg in sys.argv[1:]):
+        from hack_seneca.batch import main as batch_main
+        sys.exit(batch_main(sys.argv[1:]))
     chat()
 
 
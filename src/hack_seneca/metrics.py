@@ -0,0 +1,94 @@
+"""In-process metrics for the API server, served by /api/metrics.
+
+Counters only go up, gauges are read from a callback when a snapshot is taken,
+and timings keep a count, total and max plus a bounded sample of recent
+values for p50/p95.
+"""
+import threading
+from collections import deque
+
+SAMPLE_SIZE = 1024
+
+
+class _Timing:
+    __slots__ = ("count", "total", "max", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+
+        def pick(q):
+            return round(ordered[min(int(q * len(ordered)), len(ordered) - 1)], 4) if ordered else None
+
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 4) if self.count else None,
+            "p50": pick(0.5),
+            "p95": pick(0.95),
+            "max": round(self.max, 4),
+        }
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and timings"""
+
+    def __init__(self):
+        self._counters = {}
+        self._gauges = {}
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, amount=1):
+        """Add to a counter"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        """Record one timing in seconds"""
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = _Timing()
+            timing.add(seconds)
+
+    def gauge(self, name, callback):
+        """Register a callback whose return value is reported under name"""
+        with self._lock:
+            self._gauges[name] = callback
+
+    def snapshot(self):
+        """Return every metric as plain JSON-serializable data"""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timings = {name: timing.summary() for name, timing in self._timings.items()}
+        return {
+            "counters": counters,
+            "gauges": {name: callback() for name, callback in gauges.items()},
+            "timings": timings,
+        }
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the process-wide metrics registry"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics()
+    return _metrics
@@ -0,0 +1,60 @@
+"""Execution profiles: how much crew a chat message gets.
+
+- ``fast``: routed messages run one specialist task in a sequential crew
+  without memory. Unclear messages run a hierarchical crew with only the main
+  task, a manager without reasoning, and no memory.
+- ``balanced`` (default): routed messages run one specialist task with crew
+  memory. Unclear messages run the full hierarchical crew.
+- ``full``: every message runs the full hierarchical crew with all three
+  tasks, manager reasoning and memory, ignoring the intent route.
+
+A request picks its profile with the ``profile`` field. Otherwise the first
+matching pattern in HACK_SENECA_TENANT_PROFILES decides, for example
+``user_000*=fast,user_1*=full``. Patterns are fnmatch globs on the user id,
+checked in order. Everything else uses HACK_SENECA_PROFILE. Each run's latency
+and token usage is reported per profile in /api/metrics.
+"""
+import fnmatch
+import os
+
+# profile -> intent route -> PooledCrew crew name
+PROFILES = {
+    "fast": {"manager": "lite_manager", "fitness": "lite_fitness", "nutrition": "lite_nutrition"},
+    "balanced": {"manager": "manager", "fitness": "fitness", "nutrition": "nutrition"},
+    "full": {"manager": "manager", "fitness": "manager", "nutrition": "manager"},
+}
+DEFAULT_PROFILE = os.getenv("HACK_SENECA_PROFILE", "balanced")
+
+
+def parse_tenant_profiles(spec):
+    """Parse "pattern=profile,..." into an ordered list of (pattern, profile)"""
+    rules = []
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        pattern, _, profile = item.partition("=")
+        profile = profile.strip()
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown execution profile {profile!r} for tenant pattern {pattern.strip()!r}")
+        rules.append((pattern.strip(), profile))
+    return rules
+
+
+TENANT_PROFILES = parse_tenant_profiles(os.getenv("HACK_SENECA_TENANT_PROFILES"))
+
+
+def resolve_profile(requested=None, user_id=None, tenants=None, default=None):
+    """Return the profile for a request: explicit choice, then tenant pattern, then the default"""
+    if requested:
+        if requested not in PROFILES:
+            raise ValueError(f"Unknown execution profile: {requested} (choose from {', '.join(PROFILES)})")
+        return requested
+    for pattern, profile in TENANT_PROFILES if tenants is None else tenants:
+        if user_id and fnmatch.fnmatchcase(user_id, pattern):
+            return profile
+    return default or DEFAULT_PROFILE
+
+
+def crew_name(profile, route):
+    """Return which of a PooledCrew's crews runs a route under a profile"""
+    return PROFILES[profile][route or "manager"]
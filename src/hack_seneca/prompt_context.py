@@ -0,0 +1,207 @@
+"""Token-budgeted prompt context for crew kickoffs.
+
+The task descriptions interpolate the user's profile, recent activities,
+measurements, nutrition and conversation history. Interpolated as raw dicts
+and lists, those inputs grow with the data. build_context() rewrites them
+before a kickoff:
+
+- the profile becomes one line of fields in a fixed order
+- each dataset becomes a one-line summary (dates covered, then average, range
+  and latest value of its key fields), followed by as many of the newest rows
+  as the budget allows, as compact tables of every numeric field
+- conversation history keeps its newest lines, up to half the budget
+
+The budget for these inputs together depends on the execution profile and can
+be set with HACK_SENECA_CONTEXT_BUDGET_<PROFILE>. The defaults are 300 (fast),
+600 (balanced) and 1200 (full) tokens. Summaries are always kept, even over
+budget. Field order, number formatting and row order depend only on the data,
+so unchanged data gives byte-identical prompts. The task descriptions put
+their static instructions before the data so providers can cache that prefix.
+
+Tokens are counted with tiktoken (HACK_SENECA_TOKEN_ENCODING, default
+cl100k_base). If the encoding cannot be loaded, for example offline, a
+character-based estimate is used. Prompt tokens of these inputs before and
+after are added up in the profile.<name>.context_raw_tokens and
+profile.<name>.context_tokens counters, next to profile.<name>.context_builds.
+"""
+import os
+import re
+import threading
+
+from .metrics import get_metrics
+
+ENCODING = os.getenv("HACK_SENECA_TOKEN_ENCODING", "cl100k_base")
+DEFAULT_BUDGETS = {"fast": 300, "balanced": 600, "full": 1200}
+
+PROFILE_FIELDS = (
+    ("age", ""), ("weight", "kg"), ("height", "cm"), ("bmi", ""), ("fitness_level", ""), ("goals", ""),
+)
+
+# input key -> (label, fields summarized, fields shown in row tables)
+DATASETS = (
+    ("user_activities", ("activities",
+        ("steps", "calories_burned", "active_minutes", "workout_duration"),
+        ("steps", "calories_burned", "active_minutes", "distance_km", "heart_rate_avg", "workout_duration"))),
+    ("user_measurements", ("measurements",
+        ("weight", "body_fat", "muscle_mass", "waist"),
+        ("weight", "body_fat", "muscle_mass", "bmi", "waist", "chest", "bicep", "thigh", "body_water", "bone_mass"))),
+    ("user_nutrition", ("nutrition",
+        ("calories_consumed", "protein_g", "carbs_g", "fat_g"),
+        ("calories_consumed", "protein_g", "carbs_g", "fat_g", "fiber_g", "sugar_g", "sodium_mg"))),
+)
+
+INPUT_KEYS = ("user_profile", "user_activities", "user_measurements", "user_nutrition", "context")
+
+
+def context_budget(profile):
+    """Return the token budget for a profile's prompt context"""
+    value = os.getenv(f"HACK_SENECA_CONTEXT_BUDGET_{profile.upper()}")
+    return int(value) if value else DEFAULT_BUDGETS.get(profile, DEFAULT_BUDGETS["balanced"])
+
+
+class TokenCounter:
+    """Counts tokens with tiktoken, or estimates them when the encoding is unavailable"""
+
+    def __init__(self, encoding=ENCODING):
+        try:
+            import tiktoken
+            self._encoding = tiktoken.get_encoding(encoding)
+        except Exception as e:
+            print(f"⚠️ Token encoding {encoding} unavailable ({type(e).__name__}), estimating prompt tokens")
+            self._encoding = None
+
+    @property
+    def exact(self):
+        return self._encoding is not None
+
+    def count(self, text):
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        # Roughly one token per word or symbol, and at least one per four characters
+        return max(len(re.findall(r"\w+|[^\w\s]", text)), (len(text) + 3) // 4)
+
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def get_token_counter():
+    """Return the process-wide token counter"""
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                _counter = TokenCounter()
+    return _counter
+
+
+def _num(value):
+    if isinstance(value, float):
+        return f"{value:.1f}".rstrip("0").rstrip(".")
+    return str(value)
+
+
+def format_profile(profile):
+    """Render a profile dict as one line of fields in a fixed order"""
+    parts = []
+    for field, unit in PROFILE_FIELDS:
+        if profile.get(field) is not None:
+            parts.append(f"{field} {_num(profile[field])}{unit}")
+    return ", ".join(parts)
+
+
+def summarize_rows(rows, fields):
+    """One line per dataset: dates covered, then mean, range and latest value of each field"""
+    fields = [f for f in fields if any(isinstance(row.get(f), (int, float)) for row in rows)]
+    dates = sorted(row["date"] for row in rows if row.get("date"))
+    parts = [f"{len(rows)} entries" + (f" {dates[0]}..{dates[-1]}" if dates else "")]
+    for field in fields:
+        values = [row[field] for row in rows if isinstance(row.get(field), (int, float))]
+        mean = sum(values) / len(values)
+        mean = round(mean) if abs(mean) >= 100 else round(mean, 1)
+        parts.append(f"{field} avg {_num(mean)} ({_num(min(values))}-{_num(max(values))}, latest {_num(values[0])})")
+    return "; ".join(parts)
+
+
+def _table(rows, fields):
+    header = "date," + ",".join(fields)
+    lines = [",".join([str(row.get("date", ""))] + [_num(row.get(f, "")) for f in fields]) for row in rows]
+    return header, lines
+
+
+def _tail(text, budget, counter):
+    """Keep the newest lines of text that fit in budget tokens"""
+    lines = text.splitlines()
+    kept = []
+    used = 0
+    for line in reversed(lines):
+        cost = counter.count(line) + 1
+        if kept and used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(reversed(kept))
+
+
+def build_context(inputs, profile, counter=None, metrics=None):
+    """Return a copy of the crew inputs with the data fields compacted to the profile's token budget"""
+    counter = counter or get_token_counter()
+    metrics = metrics or get_metrics()
+    budget = context_budget(profile)
+    raw_tokens = sum(counter.count(str(inputs.get(key, ""))) for key in INPUT_KEYS)
+    built = dict(inputs)
+
+    user_profile = inputs.get("user_profile")
+    if isinstance(user_profile, dict):
+        built["user_profile"] = format_profile(user_profile) or "No profile data available"
+
+    context = inputs.get("context")
+    if isinstance(context, str) and counter.count(context) > budget // 2:
+        built["context"] = _tail(context, budget // 2, counter)
+
+    # Summaries first; they are kept even if they alone exceed the budget
+    tables = []
+    for key, (label, summary_fields, fields) in DATASETS:
+        rows = inputs.get(key)
+        if not isinstance(rows, list):
+            continue
+        rows = [row for row in rows if isinstance(row, dict)]
+        if not rows:
+            built[key] = f"No recent {label} data"
+            continue
+        summary = summarize_rows(rows, summary_fields)
+        used = [f for f in fields if any(f in row for row in rows)]
+        header, lines = _table(rows, used)
+        built[key] = summary
+        tables.append((key, summary, header, lines))
+
+    remaining = budget - sum(counter.count(str(built.get(key, ""))) for key in INPUT_KEYS)
+    # Add the newest rows round-robin across datasets while they fit
+    shown = {key: 0 for key, *_ in tables}
+    full = set()
+    depth = 0
+    while len(full) < len(tables):
+        for key, summary, header, lines in tables:
+            if key in full:
+                continue
+            if depth >= len(lines):
+                full.add(key)
+                continue
+            cost = counter.count(lines[depth]) + 1 + (counter.count(header) + 2 if depth == 0 else 0)
+            if cost > remaining:
+                full.add(key)
+                continue
+            remaining -= cost
+            shown[key] = depth + 1
+        depth += 1
+    for key, summary, header, lines in tables:
+        if shown[key]:
+            built[key] = "\n".join([summary, header, *lines[:shown[key]]])
+
+    tokens = sum(counter.count(str(built.get(key, ""))) for key in INPUT_KEYS)
+    metrics.incr(f"profile.{profile}.context_builds")
+    metrics.incr(f"profile.{profile}.context_raw_tokens", raw_tokens)
+    metrics.incr(f"profile.{profile}.context_tokens", tokens)
+    return built
@@ -0,0 +1,264 @@
+"""Semantic cache of crew replies, checked before a chat kickoff.
+
+A cached reply is reused when a new message is close enough to an earlier one
+asked in the same context. The context is a fingerprint of the crew inputs:
+the profile's fitness level, goal, age and BMI bands, plus the activity and
+calorie bands of the recent rows. With HACK_SENECA_RESPONSE_CACHE_SCOPE=user
+(the default), the user id is part of the fingerprint too. Replies often quote
+the user's own numbers, so only ``bucket`` shares them between users whose
+bands match. The conversation history is not part of the fingerprint, so a
+question asked again later in the same conversation still hits. Follow-ups
+that lean on earlier turns ("what about legs?", "make it shorter") are
+neither looked up nor stored once a conversation has history.
+
+Messages are compared offline with a hashing vectorizer. It uses word unigrams
+and bigrams after lowercasing, dropping stopwords and expanding a few training
+abbreviations ("ppl" -> "push pull legs"). Entries are compared by cosine
+similarity, and only entries mentioning exactly the same numbers are
+candidates, so "3 day split" never answers "4 day split". A reply is reused at
+HACK_SENECA_RESPONSE_CACHE_THRESHOLD similarity (default 0.8).
+
+Entries live in the shared state backend (namespace "response_cache"), so
+every worker shares them. Stores and hit bookkeeping are atomic updates of a
+fingerprint's entry list. Each fingerprint keeps its
+HACK_SENECA_RESPONSE_CACHE_PER_KEY most recently used entries. At most
+HACK_SENECA_RESPONSE_CACHE_MAX_KEYS fingerprints are kept, least recently
+used first, and entries expire after HACK_SENECA_RESPONSE_CACHE_TTL_SECONDS.
+Hits, misses and the hit rate are reported in /api/metrics.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+import zlib
+
+from .conversations import NEW_CONVERSATION
+from .metrics import get_metrics
+from .shared_state import get_state_backend
+
+ENABLED = os.getenv("HACK_SENECA_RESPONSE_CACHE", "1") not in ("0", "false", "no")
+SCOPE = os.getenv("HACK_SENECA_RESPONSE_CACHE_SCOPE", "user")
+THRESHOLD = float(os.getenv("HACK_SENECA_RESPONSE_CACHE_THRESHOLD", "0.8"))
+TTL_SECONDS = float(os.getenv("HACK_SENECA_RESPONSE_CACHE_TTL_SECONDS", "86400"))
+MAX_KEYS = int(os.getenv("HACK_SENECA_RESPONSE_CACHE_MAX_KEYS", "10000"))
+PER_KEY = int(os.getenv("HACK_SENECA_RESPONSE_CACHE_PER_KEY", "32"))
+DIMENSIONS = 1 << 18
+
+STOPWORDS = {
+    "a", "an", "the", "i", "me", "my", "we", "you", "your", "it", "is", "are", "am", "be", "to", "of",
+    "for", "in", "on", "at", "and", "or", "can", "could", "would", "should", "please", "give", "show",
+    "tell", "what", "whats", "how", "some", "any", "do", "does", "this", "that", "with", "about", "hey",
+}
+
+ABBREVIATIONS = {
+    "ppl": "push pull legs",
+    "hiit": "high intensity interval training",
+    "liss": "low intensity steady state cardio",
+    "ul": "upper lower",
+    "pr": "personal record",
+    "pb": "personal record",
+    "bf": "body fat",
+    "cals": "calories",
+    "kcal": "calories",
+    "carb": "carbs",
+    "workouts": "workout",
+    "exercises": "exercise",
+    "meals": "meal",
+    "plans": "plan",
+    "routines": "routine",
+}
+
+# Words and openers that refer back to earlier turns
+FOLLOW_UP_WORDS = {
+    "it", "its", "that", "this", "these", "those", "them", "they", "there", "instead", "else", "again", "also",
+    "same", "another",
+}
+FOLLOW_UP_OPENERS = {"and", "but", "so", "then", "what about", "how about"}
+
+_word = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+
+
+def normalize_message(message):
+    """Lowercase, expand abbreviations and drop stopwords; returns the kept tokens"""
+    tokens = []
+    for token in _word.findall((message or "").lower()):
+        for word in ABBREVIATIONS.get(token, token).split():
+            if word not in STOPWORDS:
+                tokens.append(word)
+    return tokens
+
+
+def is_follow_up(inputs):
+    """True if the message leans on an existing conversation and cannot be answered on its own"""
+    history = inputs.get("context")
+    if not history or history == NEW_CONVERSATION:
+        return False
+    words = _word.findall((inputs.get("user_message") or "").lower())
+    if not words:
+        return False
+    return (words[0] in FOLLOW_UP_OPENERS or " ".join(words[:2]) in FOLLOW_UP_OPENERS
+            or any(word in FOLLOW_UP_WORDS for word in words))
+
+
+def vectorize(tokens):
+    """Hash unigrams and bigrams into a sparse, L2-normalized {index: weight} vector"""
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    vector = {}
+    for feature in features:
+        h = zlib.crc32(feature.encode("utf-8"))
+        index = h % DIMENSIONS
+        vector[index] = vector.get(index, 0.0) + (1.0 if h & (1 << 31) else -1.0)
+    norm = math.sqrt(sum(w * w for w in vector.values()))
+    return {i: w / norm for i, w in vector.items() if w} if norm else {}
+
+
+def cosine(a, b):
+    """Dot product of two normalized sparse vectors"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(i, 0.0) for i, w in a.items())
+
+
+def _band(value, edges):
+    if value is None:
+        return None
+    return sum(value >= edge for edge in edges)
+
+
+def _mean(rows, field):
+    values = [row[field] for row in rows or [] if isinstance(row.get(field), (int, float))]
+    return sum(values) / len(values) if values else None
+
+
+def fingerprint(inputs, scope=SCOPE, variant=None):
+    """Hash the parts of the crew inputs (and the variant, e.g. the execution profile) that shape a reply"""
+    profile = inputs.get("user_profile") or {}
+    context = {
+        "fitness_level": profile.get("fitness_level"),
+        "goals": profile.get("goals"),
+        "age": _band(profile.get("age"), (25, 35, 45, 55, 65)),
+        "bmi": _band(profile.get("bmi"), (18.5, 25, 30)),
+        "active_minutes": _band(_mean(inputs.get("user_activities"), "active_minutes"), (30, 60)),
+        "calories": _band(_mean(inputs.get("user_nutrition"), "calories_consumed"), (1500, 2000, 2500, 3000)),
+    }
+    if scope == "user":
+        context["user_id"] = inputs.get("user_id")
+    if variant is not None:
+        context["variant"] = variant
+    return hashlib.sha1(json.dumps(context, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Nearest-neighbour reply cache keyed by input fingerprint"""
+
+    def __init__(self, state=None, threshold=THRESHOLD, ttl=TTL_SECONDS, max_keys=MAX_KEYS, per_key=PER_KEY,
+                 scope=SCOPE, metrics=None, clock=time.time):
+        self._state = state
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.per_key = per_key
+        self.scope = scope
+        self._clock = clock
+        self._hits = 0
+        self._misses = 0
+        self._metrics = metrics or get_metrics()
+        self._metrics.gauge("response_cache.hit_rate", self.hit_rate)
+
+    @property
+    def state(self):
+        return self._state or get_state_backend()
+
+    def _live_entries(self, value):
+        if value is None:
+            return []
+        cutoff = self._clock() - self.ttl
+        return [entry for entry in value["entries"] if entry["created_at"] > cutoff]
+
+    def lookup(self, inputs, variant=None):
+        """Return (reply, similarity) for the closest cached message, or None on a miss"""
+        if is_follow_up(inputs):
+            self._metrics.incr("response_cache.follow_ups")
+            return None
+        start = time.perf_counter()
+        tokens = normalize_message(inputs.get("user_message"))
+        key = fingerprint(inputs, self.scope, variant)
+        entries = self._live_entries(self.state.get("response_cache", key, refresh_ttl=True))
+        numbers = sorted(t for t in tokens if t[0].isdigit())
+        vector = vectorize(tokens)
+
+        best, best_score = None, 0.0
+        for entry in entries:
+            if entry["numbers"] != numbers:
+                continue
+            score = 1.0 if entry["tokens"] == tokens else cosine(vector, dict(entry["vector"]))
+            if score > best_score:
+                best, best_score = entry, score
+        self._metrics.observe("response_cache.lookup_seconds", time.perf_counter() - start)
+
+        if best is None or best_score < self.threshold:
+            self._misses += 1
+            self._metrics.incr("response_cache.misses")
+            return None
+        self._hits += 1
+        self._metrics.incr("response_cache.hits")
+
+        def touch(value):
+            # Move the hit to the end so the per-fingerprint cap drops the least recently used entry;
+            # if it was evicted or replaced meanwhile, leave the entry list alone
+            entries = self._live_entries(value)
+            for i, entry in enumerate(entries):
+                if entry["tokens"] == best["tokens"] and entry["created_at"] == best["created_at"]:
+                    entries.append(entries.pop(i))
+                    return {"entries": entries}
+            return None
+
+        self.state.update("response_cache", key, touch, ttl=self.ttl, max_entries=self.max_keys)
+        return best["response"], round(best_score, 4)
+
+    def store(self, inputs, response, variant=None):
+        """Remember the reply the crew gave for these inputs"""
+        tokens = normalize_message(inputs.get("user_message"))
+        if not tokens or not response or is_follow_up(inputs):
+            return
+        key = fingerprint(inputs, self.scope, variant)
+        new_entry = {
+            "tokens": tokens,
+            "numbers": sorted(t for t in tokens if t[0].isdigit()),
+            # JSON object keys must be strings, so the sparse vector is kept as pairs
+            "vector": [[i, round(w, 6)] for i, w in vectorize(tokens).items()],
+            "response": response,
+            "created_at": self._clock(),
+        }
+
+        def add(value):
+            entries = [entry for entry in self._live_entries(value) if entry["tokens"] != tokens]
+            entries.append(new_entry)
+            return {"entries": entries[-self.per_key:]}
+
+        self.state.update("response_cache", key, add, ttl=self.ttl, max_entries=self.max_keys)
+        self._metrics.incr("response_cache.stores")
+
+    def hit_rate(self):
+        """Return hits / lookups in this process, or None before the first lookup"""
+        lookups = self._hits + self._misses
+        return round(self._hits / lookups, 4) if lookups else None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Return the process-wide response cache, or None if HACK_SENECA_RESPONSE_CACHE=0"""
+    global _cache
+    if not ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
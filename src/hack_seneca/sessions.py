@@ -0,0 +1,143 @@
+"""Login sessions for the API server.
+
+A session maps an opaque token to a user_id. Sessions are kept in the shared
+state backend (see shared_state.py), so every uvicorn worker can authorize
+every request. They are capped at HACK_SENECA_MAX_SESSIONS (least recently
+used first) and expire after HACK_SENECA_SESSION_TTL_SECONDS without a request.
+
+The user data a chat needs (profile, recent rows, summary) is not pinned to the
+session. It is cached per user in the same backend, capped at
+HACK_SENECA_SESSION_MAX_HYDRATED, and rebuilt with load_user_data on a miss,
+which reads from the materialized summary view. Cached user data is dropped
+as soon as a row for that user is appended, so the next chat sees it.
+"""
+import os
+import secrets
+import threading
+import time
+
+from .data_store import get_data_store
+from .shared_state import get_state_backend
+
+MAX_SESSIONS = int(os.getenv("HACK_SENECA_MAX_SESSIONS", "100000"))
+SESSION_TTL_SECONDS = float(os.getenv("HACK_SENECA_SESSION_TTL_SECONDS", "1800"))
+MAX_HYDRATED = int(os.getenv("HACK_SENECA_SESSION_MAX_HYDRATED", "1000"))
+
+
+class Session:
+    """One logged-in client"""
+
+    __slots__ = ("token", "user_id", "created_at")
+
+    def __init__(self, token, user_id, created_at):
+        self.token = token
+        self.user_id = user_id
+        self.created_at = created_at
+
+
+def _default_loader(user_id):
+    from .main import load_user_data
+    return load_user_data(user_id)
+
+
+class SessionStore:
+    """Token -> session map with idle expiry and lazily re-hydrated user data"""
+
+    def __init__(
+        self,
+        loader=None,
+        store=None,
+        state=None,
+        max_sessions=MAX_SESSIONS,
+        ttl=SESSION_TTL_SECONDS,
+        max_hydrated=MAX_HYDRATED,
+    ):
+        self._loader = loader or _default_loader
+        self._store = store
+        self._state = state
+        self._subscribed = None
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_hydrated = max_hydrated
+        self._invalidations = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return self._state or get_state_backend()
+
+    def _subscribe(self):
+        store = self._store or get_data_store()
+        if self._subscribed is not store:
+            store.subscribe(self._on_append)
+            self._subscribed = store
+
+    def _on_append(self, dataset, record):
+        # Every worker tails the same data, so each one drops the shared copy; that is idempotent
+        with self._lock:
+            self._invalidations += 1
+        self.state.delete("user_data", record["user_id"])
+
+    def create(self, user_id, user_data=None):
+        """Start a session for a user and return it"""
+        self._subscribe()
+        session = Session(secrets.token_urlsafe(32), user_id, time.time())
+        self.state.set(
+            "sessions",
+            session.token,
+            {"user_id": user_id, "created_at": session.created_at},
+            ttl=self.ttl,
+            max_entries=self.max_sessions,
+        )
+        if user_data is not None:
+            self.state.set("user_data", user_id, user_data, max_entries=self.max_hydrated)
+        return session
+
+    def get(self, token):
+        """Return the live session for a token, or None if it is unknown or expired"""
+        if not token:
+            return None
+        data = self.state.get("sessions", token, refresh_ttl=True)
+        if data is None:
+            return None
+        return Session(token, data["user_id"], data["created_at"])
+
+    def end(self, token):
+        """Log a session out; returns False if it did not exist"""
+        return self.state.delete("sessions", token)
+
+    def user_data(self, session):
+        """Return the session user's data, re-hydrating it if it was evicted or invalidated"""
+        self._subscribe()
+        user_id = session.user_id
+        user_data = self.state.get("user_data", user_id)
+        if user_data is not None:
+            return user_data
+
+        with self._lock:
+            invalidations = self._invalidations
+        user_data = self._loader(user_id)
+        with self._lock:
+            # Skip caching if rows arrived while loading; they may be missing from this copy
+            fresh = invalidations == self._invalidations
+        if fresh:
+            self.state.set("user_data", user_id, user_data, max_entries=self.max_hydrated)
+        return user_data
+
+    def stats(self):
+        """Return the number of live sessions and cached user data entries"""
+        return {"sessions": self.state.count("sessions"), "hydrated_users": self.state.count("user_data")}
+
+
+_sessions = None
+_sessions_lock = threading.Lock()
+
+
+def get_session_store():
+    """Return the process-wide session store"""
+    global _sessions
+    if _sessions is None:
+        with _sessions_lock:
+            if _sessions is None:
+                _sessions = SessionStore()
+    return _sessions
@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+"""Hash-partitioned copy of the users_data/ datasets.
+
+``partition_users_data`` splits every fitness-*.json file into N shards by a
+stable hash of user_id. Each shard is a directory laid out exactly like
+users_data/, so a shard is served by an ordinary JSONUserStore (with its own
+ingest log). A user's profile and rows always live in the same shard, so
+``load_user_data`` only ever opens one shard's files.
+
+Layout (each partitioning is a new generation; CURRENT is swapped atomically):
+
+    users_data/shards/CURRENT
+    users_data/shards/gen-<timestamp>/manifest.json
+    users_data/shards/gen-<timestamp>/shard-000/fitness-*.json
+
+Select the backend with HACK_SENECA_DATA_BACKEND=sharded. Bulk jobs can run
+over every shard at once with ``map_shards``, on one long-lived pool of
+spawned worker processes (HACK_SENECA_SHARD_WORKERS, default one per CPU).
+Spawned rather than forked workers are safe to start from the threaded API
+server, and the pool is started once rather than on every call.
+"""
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from .data_store import DATASET_FILES, JSONUserStore, default_users_data_dir
+from .streaming import JSONArrayWriter, iter_json_array
+
+FORMAT_VERSION = 1
+DEFAULT_SHARDS = 16
+
+
+def default_shards_dir():
+    """Return the shards directory, overridable with HACK_SENECA_SHARDS_DIR"""
+    return os.getenv("HACK_SENECA_SHARDS_DIR") or os.path.join(default_users_data_dir(), "shards")
+
+
+def shard_of(user_id, shards):
+    """Return the shard number of a user.
+
+    crc32 rather than hash(): str hashes are salted per process, so they would
+    send a user to a different shard in every worker.
+    """
+    return zlib.crc32(user_id.encode("utf-8")) % shards
+
+
+def shard_path(generation_dir, shard):
+    return os.path.join(generation_dir, f"shard-{shard:03d}")
+
+
+def _source_records(users_data_dir, dataset):
+    """Base file rows followed by rows still in the ingest log"""
+    path = os.path.join(users_data_dir, DATASET_FILES[dataset])
+    if os.path.exists(path):
+        yield from iter_json_array(path)
+    if dataset != "users":
+        from .ingest_log import default_log_dir, log_path, read_log
+        records, _ = read_log(log_path(default_log_dir(users_data_dir), dataset))
+        yield from records
+
+
+def partition(users_data_dir=None, shards_dir=None, shards=DEFAULT_SHARDS, keep=2):
+    """Split users_data/*.json into a new generation of hash shards and make it current"""
+    if shards < 1:
+        raise ValueError("shards must be at least 1")
+    users_data_dir = users_data_dir or default_users_data_dir()
+    shards_dir = shards_dir or default_shards_dir()
+    os.makedirs(shards_dir, exist_ok=True)
+
+    generation = f"gen-{time.strftime('%Y%m%d_%H%M%S')}-{os.getpid()}"
+    out_dir = os.path.join(shards_dir, generation)
+    for shard in range(shards):
+        os.makedirs(shard_path(out_dir, shard))
+
+    manifest = {"version": FORMAT_VERSION, "hash": "crc32", "shards": shards, "rows": {}}
+    for dataset, filename in DATASET_FILES.items():
+        print(f"🧩 Partitioning {dataset} into {shards} shards")
+        files = [open(os.path.join(shard_path(out_dir, s), filename), "w") for s in range(shards)]
+        try:
+            writers = [JSONArrayWriter(f) for f in files]
+            seen = set()
+            for record in _source_records(users_data_dir, dataset):
+                if dataset == "users":
+                    # Keep the first profile per user_id, like the JSON store
+                    if record["user_id"] in seen:
+                        continue
+                    seen.add(record["user_id"])
+                writers[shard_of(record["user_id"], shards)].write(record)
+            for writer in writers:
+                writer.close()
+        finally:
+            for f in files:
+                f.close()
+        manifest["rows"][dataset] = [writer.count for writer in writers]
+        print(f"   {sum(manifest['rows'][dataset])} rows")
+
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+    # Swap the CURRENT pointer atomically so readers never see a half-written generation
+    tmp_pointer = os.path.join(shards_dir, f"CURRENT.{os.getpid()}.tmp")
+    with open(tmp_pointer, "w") as f:
+        f.write(generation)
+    os.replace(tmp_pointer, os.path.join(shards_dir, "CURRENT"))
+
+    # Old generations may still be open in running workers; keep a few around
+    generations = sorted(d for d in os.listdir(shards_dir) if d.startswith("gen-"))
+    for old in generations[:-keep] if keep > 0 else []:
+        if old != generation:
+            shutil.rmtree(os.path.join(shards_dir, old), ignore_errors=True)
+
+    print(f"✅ Shards written to {out_dir}")
+    return out_dir
+
+
+class _Generation:
+    """Manifest and lazily opened per-shard stores of one partitioning"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported shard format version in {path}")
+        self.shards = manifest["shards"]
+        self.rows = manifest["rows"]
+        self.stores = {}
+
+    def shard_dirs(self):
+        return [shard_path(self.path, shard) for shard in range(self.shards)]
+
+
+def current_generation(shards_dir=None):
+    """Return the current partitioning of a shards directory"""
+    shards_dir = shards_dir or default_shards_dir()
+    try:
+        with open(os.path.join(shards_dir, "CURRENT"), "r") as f:
+            pointer = f.read().strip()
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            f"No shards in {shards_dir}; run partition_users_data first"
+        ) from None
+    return _Generation(os.path.join(shards_dir, pointer))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_shard_pool():
+    """Return the process-wide pool of spawned shard workers, starting it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = os.getenv("HACK_SENECA_SHARD_WORKERS")
+                _pool = ProcessPoolExecutor(
+                    max_workers=int(workers) if workers else None, mp_context=get_context("spawn")
+                )
+    return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def map_shards(func, shards_dir=None):
+    """Run ``func(shard_dir)`` for every shard on the shard pool; results come back in shard order.
+
+    ``func`` must be picklable (a module-level function or a functools.partial of one).
+    """
+    shard_dirs = current_generation(shards_dir).shard_dirs()
+    pool = get_shard_pool()
+    try:
+        return list(pool.map(func, shard_dirs))
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool for the next call
+        _discard_pool(pool)
+        raise
+
+
+class ShardedUserStore:
+    """User store that routes every lookup to the one shard holding the user"""
+
+    def __init__(self, shards_dir=None):
+        self.shards_dir = shards_dir or default_shards_dir()
+        self.users_data_dir = self.shards_dir
+        self._pointer = None
+        self._generation = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def _current(self):
+        """Return the current generation, switching when CURRENT changes"""
+        pointer_path = os.path.join(self.shards_dir, "CURRENT")
+        try:
+            with open(pointer_path, "r") as f:
+                pointer = f.read().strip()
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                f"No shards in {self.shards_dir}; run partition_users_data first"
+            ) from None
+
+        if pointer != self._pointer:
+            with self._lock:
+                if pointer != self._pointer:
+                    self._generation = _Generation(os.path.join(self.shards_dir, pointer))
+                    self._pointer = pointer
+        return self._generation
+
+    def _store(self, generation, shard):
+        store = generation.stores.get(shard)
+        if store is None:
+            with self._lock:
+                store = generation.stores.get(shard)
+                if store is None:
+                    store = JSONUserStore(shard_path(generation.path, shard))
+                    for callback in self._subscribers:
+                        store.subscribe(callback)
+                    generation.stores[shard] = store
+        return store
+
+    def shard_store(self, user_id):
+        """Return the JSON store of the shard holding a user"""
+        generation = self._current()
+        return self._store(generation, shard_of(user_id, generation.shards))
+
+    def version(self):
+        """Sync the shards opened so far and return a token that changes when data is reloaded.
+
+        Shards nobody has asked for stay closed; opening one does not change the token.
+        """
+        generation = self._current()
+        reloads = sum(store.version() for store in list(generation.stores.values()))
+        return (generation.path, reloads)
+
+    def subscribe(self, callback):
+        """Call ``callback(dataset, record)`` for every row appended after this point"""
+        with self._lock:
+            self._subscribers.append(callback)
+            stores = list(self._generation.stores.values()) if self._generation else []
+        for store in stores:
+            store.subscribe(callback)
+
+    def append(self, dataset, records):
+        """Append records to the ingest log of each user's shard"""
+        from .ingest_log import validate_record
+        for record in records:
+            validate_record(dataset, record)
+        generation = self._current()
+        by_shard = {}
+        for record in records:
+            by_shard.setdefault(shard_of(record["user_id"], generation.shards), []).append(record)
+        count = 0
+        for shard, batch in by_shard.items():
+            store = self._store(generation, shard)
+            # Load the shard first so the new rows reach subscribers as appends
+            store.version()
+            count += store.append(dataset, batch)
+        return count
+
+    def profile(self, user_id):
+        """Return the profile dict for a user, or None"""
+        return self.shard_store(user_id).profile(user_id)
+
+    def rows(self, dataset, user_id):
+        """Return all rows for a user sorted by date, oldest first (do not mutate)"""
+        return self.shard_store(user_id).rows(dataset, user_id)
+
+    def recent(self, dataset, user_id, limit=None):
+        """Return a user's most recent rows, newest first"""
+        return self.shard_store(user_id).recent(dataset, user_id, limit)
+
+    def date_range(self, dataset, user_id, start=None, end=None, fields=None):
+        """Return a user's rows with start <= date <= end, oldest first"""
+        return self.shard_store(user_id).date_range(dataset, user_id, start, end, fields)
+
+    def rows_by_user(self, dataset):
+        """Return {user_id: rows oldest first} for a whole dataset, opening every shard"""
+        generation = self._current()
+        index = {}
+        for shard in range(generation.shards):
+            index.update(self._store(generation, shard).rows_by_user(dataset))
+        return index
+
+    def count(self, dataset, user_id):
+        """Return the number of rows a user has in a dataset"""
+        return self.shard_store(user_id).count(dataset, user_id)
+
+    def user_count(self):
+        """Return the number of user profiles, from the manifest so no shard is opened"""
+        return sum(self._current().rows["users"])
+
+
+def count_shard_rows(shard_dir):
+    """Process-pool worker: parse one shard and return its row count per dataset"""
+    counts = {}
+    for dataset, filename in DATASET_FILES.items():
+        path = os.path.join(shard_dir, filename)
+        counts[dataset] = sum(1 for _ in iter_json_array(path)) if os.path.exists(path) else 0
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Split users_data/*.json into hash-partitioned shards")
+    parser.add_argument("--users-data-dir", default=None)
+    parser.add_argument("--out", default=None, help="Shards directory (default: users_data/shards)")
+    parser.add_argument("--shards", type=int, default=DEFAULT_SHARDS, help="Number of shards")
+    parser.add_argument("--keep", type=int, default=2, help="Generations to keep for running readers")
+    parser.add_argument("--verify", action="store_true", help="Re-read every shard in parallel afterwards")
+    args = parser.parse_args(argv)
+    out_dir = partition(args.users_data_dir, args.out, args.shards, args.keep)
+
+    if args.verify:
+        generation = current_generation(args.out)
+        print(f"🔎 Verifying {generation.shards} shards in parallel...")
+        counts = map_shards(count_shard_rows, args.out)
+        for dataset in DATASET_FILES:
+            parsed = [c[dataset] for c in counts]
+            if parsed != generation.rows[dataset]:
+                raise SystemExit(f"❌ {dataset}: shard row counts {parsed} do not match the manifest")
+        print(f"✅ All shards in {out_dir} parse and match the manifest")
+
+
+if __name__ == "__main__":
+    main()
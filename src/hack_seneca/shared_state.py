@@ -0,0 +1,234 @@
+"""Key/value state shared by every API worker process.
+
+Sessions, cached user data and response caches are stored here rather than
+in module globals, so ``uvicorn --workers N`` can route any request to any
+worker. Values are JSON-serializable and live in a namespace ("sessions",
+"user_data", ...). Each entry can have an idle TTL, which reads may refresh,
+and each namespace can be capped at a number of entries, evicting the least
+recently used. ``update`` applies a read-modify-write to one entry atomically,
+so concurrent writers neither lose updates nor bring back evicted entries.
+
+Pick the backend with HACK_SENECA_STATE_BACKEND:
+
+- ``memory`` (default): a per-process dict. Use it with a single worker.
+- ``sqlite``: a WAL-mode SQLite file (HACK_SENECA_STATE_PATH, default
+  users_data/state.db) that every worker on the box opens.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from .data_store import default_users_data_dir
+
+
+def default_state_path():
+    """Return the shared state database path, overridable with HACK_SENECA_STATE_PATH"""
+    return os.getenv("HACK_SENECA_STATE_PATH") or os.path.join(default_users_data_dir(), "state.db")
+
+
+class MemoryStateBackend:
+    """Per-process state: an LRU per namespace with per-entry idle TTLs"""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    def _entries(self, namespace):
+        entries = self._namespaces.get(namespace)
+        if entries is None:
+            entries = self._namespaces[namespace] = OrderedDict()
+        return entries
+
+    def _purge(self, entries, now):
+        expired = [key for key, (_, _, expires_at) in entries.items() if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del entries[key]
+
+    def get(self, namespace, key, refresh_ttl=False):
+        """Return a value, or None if it is missing or expired"""
+        now = self._clock()
+        with self._lock:
+            entries = self._entries(namespace)
+            entry = entries.get(key)
+            if entry is None:
+                return None
+            value, ttl, expires_at = entry
+            if expires_at is not None and expires_at <= now:
+                del entries[key]
+                return None
+            if refresh_ttl and ttl is not None:
+                entry[2] = now + ttl
+            entries.move_to_end(key)
+            return value
+
+    def _set_locked(self, entries, key, value, ttl, max_entries, now):
+        entries[key] = [value, ttl, now + ttl if ttl is not None else None]
+        entries.move_to_end(key)
+        if max_entries is not None and len(entries) > max_entries:
+            self._purge(entries, now)
+            while len(entries) > max_entries:
+                entries.popitem(last=False)
+
+    def set(self, namespace, key, value, ttl=None, max_entries=None):
+        """Store a value, evicting expired and then least recently used entries"""
+        now = self._clock()
+        with self._lock:
+            self._set_locked(self._entries(namespace), key, value, ttl, max_entries, now)
+
+    def update(self, namespace, key, func, ttl=None, max_entries=None):
+        """Atomically replace a value with func(value), where value is None if it is missing
+        or expired; if func returns None the entry is left as it is. Returns the new value."""
+        now = self._clock()
+        with self._lock:
+            entries = self._entries(namespace)
+            entry = entries.get(key)
+            live = entry is not None and (entry[2] is None or entry[2] > now)
+            value = func(entry[0] if live else None)
+            if value is not None:
+                self._set_locked(entries, key, value, ttl, max_entries, now)
+            return value
+
+    def delete(self, namespace, key):
+        """Remove a value; returns False if it was not there"""
+        with self._lock:
+            return self._entries(namespace).pop(key, None) is not None
+
+    def count(self, namespace):
+        """Return the number of live entries in a namespace"""
+        with self._lock:
+            entries = self._entries(namespace)
+            self._purge(entries, self._clock())
+            return len(entries)
+
+
+class SQLiteStateBackend:
+    """State in one SQLite file shared by every worker process on the machine"""
+
+    def __init__(self, path=None, clock=time.time):
+        self.path = path or default_state_path()
+        self._clock = clock
+        self._local = threading.local()
+
+    def _conn(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "ttl REAL, expires_at REAL, accessed_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_state_accessed ON state (namespace, accessed_at)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace, key, refresh_ttl=False):
+        """Return a value, or None if it is missing or expired"""
+        now = self._clock()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, ttl, expires_at FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        value, ttl, expires_at = row
+        if expires_at is not None and expires_at <= now:
+            conn.execute(
+                "DELETE FROM state WHERE namespace = ? AND key = ? AND expires_at <= ?", (namespace, key, now)
+            )
+            return None
+        if refresh_ttl and ttl is not None:
+            expires_at = now + ttl
+        conn.execute(
+            "UPDATE state SET accessed_at = ?, expires_at = ? WHERE namespace = ? AND key = ?",
+            (now, expires_at, namespace, key),
+        )
+        return json.loads(value)
+
+    def _write(self, conn, namespace, key, value, ttl, max_entries, now):
+        conn.execute(
+            "INSERT OR REPLACE INTO state (namespace, key, value, ttl, expires_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), ttl, now + ttl if ttl is not None else None, now),
+        )
+        if max_entries is not None:
+            (count,) = conn.execute("SELECT COUNT(*) FROM state WHERE namespace = ?", (namespace,)).fetchone()
+            if count > max_entries:
+                conn.execute(
+                    "DELETE FROM state WHERE namespace = ? AND expires_at <= ?", (namespace, now)
+                )
+                conn.execute(
+                    "DELETE FROM state WHERE rowid IN (SELECT rowid FROM state WHERE namespace = ? "
+                    "ORDER BY accessed_at LIMIT max(0, (SELECT COUNT(*) FROM state WHERE namespace = ?) - ?))",
+                    (namespace, namespace, max_entries),
+                )
+
+    def set(self, namespace, key, value, ttl=None, max_entries=None):
+        """Store a value, evicting expired and then least recently used entries"""
+        now = self._clock()
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._write(conn, namespace, key, value, ttl, max_entries, now)
+
+    def update(self, namespace, key, func, ttl=None, max_entries=None):
+        """Atomically replace a value with func(value), where value is None if it is missing
+        or expired; if func returns None the entry is left as it is. Returns the new value."""
+        now = self._clock()
+        conn = self._conn()
+        with conn:
+            # The write lock is taken before the read, so no other writer can interleave
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT value FROM state WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, now),
+            ).fetchone()
+            value = func(json.loads(row[0]) if row is not None else None)
+            if value is not None:
+                self._write(conn, namespace, key, value, ttl, max_entries, now)
+            return value
+
+    def delete(self, namespace, key):
+        """Remove a value; returns False if it was not there"""
+        cursor = self._conn().execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+        return cursor.rowcount > 0
+
+    def count(self, namespace):
+        """Return the number of live entries in a namespace"""
+        (count,) = self._conn().execute(
+            "SELECT COUNT(*) FROM state WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, self._clock()),
+        ).fetchone()
+        return count
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def create_state_backend(backend=None):
+    """Create a shared state backend for a backend name ("memory" or "sqlite")"""
+    backend = (backend or os.getenv("HACK_SENECA_STATE_BACKEND") or "memory").lower()
+    if backend == "memory":
+        return MemoryStateBackend()
+    if backend == "sqlite":
+        return SQLiteStateBackend()
+    raise ValueError(f"Unknown state backend: {backend}")
+
+
+def get_state_backend():
+    """Return the process-wide state backend selected by HACK_SENECA_STATE_BACKEND"""
+    global _state
+    if _state is None:
+        with _state_lock:
+            if _state is None:
+                _state = create_state_backend()
+    return _state
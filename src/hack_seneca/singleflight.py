@@ -0,0 +1,77 @@
+"""Single-flight coalescing of identical in-flight calls.
+
+Retries and double-clicks send the same chat message again while the first
+kickoff is still running. SingleFlight runs one call per key at a time and
+hands its result (or exception) to every caller that arrived meanwhile. The
+shared call is shielded, so a caller that disconnects does not cancel it for
+the others. ``share`` also hands followers a handle the leader created, such
+as the event stream of a streaming run.
+
+Coalescing is per process and per event loop. For chat kickoffs, the calls
+that ran and the calls that were saved are reported as
+chat.singleflight.leaders and chat.singleflight.coalesced in /api/metrics.
+"""
+import asyncio
+import threading
+
+from .metrics import get_metrics
+
+
+class SingleFlight:
+    """Key -> (handle, in-flight task) map for one event loop"""
+
+    def __init__(self, name="singleflight", metrics=None):
+        self.name = name
+        self._tasks = {}
+        self._metrics = metrics or get_metrics()
+        self._metrics.gauge(f"{name}.in_flight", lambda: len(self._tasks))
+
+    async def do(self, key, fn):
+        """Await fn() once per key at a time; concurrent callers with the same key share its outcome"""
+        _, task, _ = self.share(key, lambda: (None, fn()))
+        return await asyncio.shield(task)
+
+    def share(self, key, start):
+        """Join the call in flight for key, or begin one with start() -> (handle, awaitable).
+
+        Returns ``(handle, future, leader)``: the leader's handle, a future of
+        the awaitable's outcome and whether this caller started it. The key
+        stays in flight until the future is done. If start() raises, nothing
+        is registered.
+        """
+        entry = self._tasks.get(key)
+        if entry is not None:
+            self._metrics.incr(f"{self.name}.coalesced")
+            return entry[0], entry[1], False
+        handle, awaitable = start()
+        task = asyncio.ensure_future(awaitable)
+        self._metrics.incr(f"{self.name}.leaders")
+        self._tasks[key] = (handle, task)
+        task.add_done_callback(lambda done: self._forget(key, done))
+        return handle, task, True
+
+    def _forget(self, key, task):
+        entry = self._tasks.get(key)
+        if entry is not None and entry[1] is task:
+            del self._tasks[key]
+        # Mark the exception retrieved in case every caller went away before it was raised
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self):
+        """Return the number of keys with a call running"""
+        return len(self._tasks)
+
+
+_chat_flights = None
+_chat_flights_lock = threading.Lock()
+
+
+def get_chat_single_flight():
+    """Return the process-wide single-flight group for chat kickoffs"""
+    global _chat_flights
+    if _chat_flights is None:
+        with _chat_flights_lock:
+            if _chat_flights is None:
+                _chat_flights = SingleFlight("chat.singleflight")
+    return _chat_flights
@@ -0,0 +1,273 @@
+"""Mergeable quantile sketches for "how do I compare" cohort stats.
+
+A cohort is a (fitness_level, goals) pair from fitness-users.json. For each
+cohort and tracked metric we keep a KLL sketch of the per-record values, fed
+once from the data store and then one record at a time as rows are ingested.
+A user's percentile ranks their latest record against the sketch, so a
+record is compared with records rather than a multi-day mean with single
+days. The rank is a binary search over the sketch's cached sorted items, so
+lookups stay sub-millisecond no matter how large the population.
+
+Population-wide ranks come from merging the cohort sketches, which is what
+makes KLL a good fit here.
+"""
+import bisect
+import math
+import random
+import threading
+
+from .data_store import get_data_store
+from .summary_view import get_summary_view
+
+# metric -> dataset it is recorded in
+METRICS = {
+    "steps": "activities",
+    "calories_burned": "activities",
+    "calories_consumed": "nutrition",
+    "protein_g": "nutrition",
+    "body_fat": "measurements",
+}
+
+DEFAULT_K = 200
+
+
+class KLLSketch:
+    """KLL quantile sketch (Karnin, Lang & Liberty) with cached rank lookups"""
+
+    def __init__(self, k=DEFAULT_K, seed=None):
+        self.k = k
+        self.n = 0
+        self.compactors = []
+        self._size = 0
+        self._max_size = 0
+        self._rng = random.Random(seed)
+        self._sorted = None
+        self._grow()
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _grow(self):
+        self.compactors.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def _compact(self, level):
+        items = self.compactors[level]
+        last = items.pop() if len(items) % 2 else None
+        items.sort()
+        # Keep every other item at double weight, starting at a random offset
+        promoted = items[self._rng.randint(0, 1)::2]
+        items.clear()
+        if last is not None:
+            items.append(last)
+        return promoted
+
+    def _compress(self):
+        for level in range(len(self.compactors)):
+            if len(self.compactors[level]) >= self._capacity(level):
+                if level + 1 >= len(self.compactors):
+                    self._grow()
+                self.compactors[level + 1].extend(self._compact(level))
+                self._size = sum(len(c) for c in self.compactors)
+                if self._size < self._max_size:
+                    break
+
+    def update(self, value):
+        """Add one value to the sketch"""
+        self.compactors[0].append(value)
+        self.n += 1
+        self._size += 1
+        self._sorted = None
+        if self._size >= self._max_size:
+            self._compress()
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        while len(self.compactors) < len(other.compactors):
+            self._grow()
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self._size = sum(len(c) for c in self.compactors)
+        self._sorted = None
+        while self._size >= self._max_size:
+            self._compress()
+        return self
+
+    def _sorted_items(self):
+        if self._sorted is None:
+            weighted = sorted(
+                (value, 1 << level)
+                for level, items in enumerate(self.compactors)
+                for value in items
+            )
+            values = [value for value, _ in weighted]
+            cumulative = []
+            total = 0
+            for _, weight in weighted:
+                total += weight
+                cumulative.append(total)
+            self._sorted = (values, cumulative, total)
+        return self._sorted
+
+    def rank(self, value):
+        """Approximate fraction of values <= value"""
+        values, cumulative, total = self._sorted_items()
+        if not total:
+            return None
+        i = bisect.bisect_right(values, value)
+        return cumulative[i - 1] / total if i else 0.0
+
+    def quantile(self, q):
+        """Approximate value at quantile q in [0, 1]"""
+        values, cumulative, total = self._sorted_items()
+        if not total:
+            return None
+        i = bisect.bisect_left(cumulative, q * total)
+        return values[min(i, len(values) - 1)]
+
+
+def cohort_of(profile):
+    """Return the (fitness_level, goals) cohort for a profile"""
+    profile = profile or {}
+    return (profile.get("fitness_level") or "unknown", profile.get("goals") or "unknown")
+
+
+class CohortSketches:
+    """KLL sketches per (cohort, metric), kept current as records are ingested"""
+
+    def __init__(self, store=None, k=DEFAULT_K, view=None):
+        self._store = store
+        self._view = view
+        self._subscribed = None
+        self.k = k
+        self._sketches = {}
+        self._population = {}
+        self._version = None
+        self._rebuilding = False
+        # Re-entrant: rebuilding reads the store, which may deliver appended rows to _on_append
+        self._lock = threading.RLock()
+
+    @property
+    def store(self):
+        store = self._store or get_data_store()
+        if self._subscribed is not store:
+            store.subscribe(self._on_append)
+            self._subscribed = store
+        return store
+
+    def _sketch(self, cohort, metric):
+        sketch = self._sketches.get((cohort, metric))
+        if sketch is None:
+            sketch = self._sketches[(cohort, metric)] = KLLSketch(self.k)
+        return sketch
+
+    def _add(self, dataset, record, profile):
+        cohort = cohort_of(profile)
+        for metric, metric_dataset in METRICS.items():
+            value = record.get(metric)
+            if metric_dataset == dataset and isinstance(value, (int, float)):
+                self._sketch(cohort, metric).update(value)
+                self._population.pop(metric, None)
+
+    def _rebuild(self):
+        store = self.store
+        self._sketches = {}
+        self._population = {}
+        print("📐 Building cohort percentile sketches...")
+        self._rebuilding = True
+        try:
+            for dataset in sorted(set(METRICS.values())):
+                for user_id, rows in store.rows_by_user(dataset).items():
+                    profile = store.profile(user_id)
+                    for record in rows:
+                        self._add(dataset, record, profile)
+        finally:
+            self._rebuilding = False
+
+    def _sync(self):
+        # A base-data reload means the sketches no longer describe the data
+        version = self.store.version()
+        with self._lock:
+            if version != self._version:
+                self._rebuild()
+                self._version = version
+
+    def _on_append(self, dataset, record):
+        with self._lock:
+            if self._version is not None and not self._rebuilding:
+                self._add(dataset, record, self.store.profile(record["user_id"]))
+
+    def _population_sketch(self, metric):
+        sketch = self._population.get(metric)
+        if sketch is None:
+            sketch = KLLSketch(self.k)
+            for (_, sketch_metric), cohort_sketch in self._sketches.items():
+                if sketch_metric == metric:
+                    sketch.merge(cohort_sketch)
+            self._population[metric] = sketch
+        return sketch
+
+    def cohort_stats(self, cohort, metric):
+        """Return n and the quartiles of one cohort's metric"""
+        self._sync()
+        with self._lock:
+            sketch = self._sketches.get((cohort, metric))
+            if sketch is None or not sketch.n:
+                return {"n": 0}
+            return {
+                "n": sketch.n,
+                "p25": sketch.quantile(0.25),
+                "p50": sketch.quantile(0.5),
+                "p75": sketch.quantile(0.75),
+            }
+
+    def percentiles(self, user_id):
+        """Where a user's latest numbers fall within their cohort and the whole population,
+        or None if the user has no profile"""
+        self._sync()
+        summary = (self._view or get_summary_view()).get(user_id)
+        if summary.profile is None:
+            return None
+        cohort = cohort_of(summary.profile)
+        metrics = {}
+        with self._lock:
+            for metric, dataset in METRICS.items():
+                window = summary.windows[dataset]
+                if not window.rows:
+                    continue
+                # The sketches hold single records, so rank a single record too
+                latest = window.rows[0]
+                value = latest.get(metric)
+                if value is None:
+                    continue
+                sketch = self._sketches.get((cohort, metric))
+                cohort_rank = sketch.rank(value) if sketch is not None else None
+                population_rank = self._population_sketch(metric).rank(value)
+                metrics[metric] = {
+                    "value": round(value, 2),
+                    "date": latest.get("date"),
+                    "cohort_percentile": None if cohort_rank is None else round(cohort_rank * 100, 1),
+                    "population_percentile": None if population_rank is None else round(population_rank * 100, 1),
+                    "cohort_size": sketch.n if sketch is not None else 0,
+                }
+        return {
+            "user_id": user_id,
+            "cohort": {"fitness_level": cohort[0], "goals": cohort[1]},
+            "metrics": metrics,
+        }
+
+
+_sketches = None
+_sketches_lock = threading.Lock()
+
+
+def get_cohort_sketches():
+    """Return the process-wide cohort sketches"""
+    global _sketches
+    if _sketches is None:
+        with _sketches_lock:
+            if _sketches is None:
+                _sketches = CohortSketches()
+    return _sketches
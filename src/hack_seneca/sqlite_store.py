@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+"""SQLite-backed user data store.
+
+Each dataset is a table of (user_id, date, data) where data is the original
+JSON row, with a composite (user_id, date DESC) index so "last N rows for a
+user" is an indexed range read instead of a full-file scan.
+
+Import the JSON files once with ``import_sqlite`` and select the backend with
+HACK_SENECA_DATA_BACKEND=sqlite (HACK_SENECA_SQLITE_PATH sets the database).
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+
+from .data_store import DATASET_FILES, default_users_data_dir, project
+from .streaming import iter_json_array
+
+ROW_DATASETS = ("activities", "measurements", "nutrition")
+IMPORT_BATCH_SIZE = 5000
+
+
+def default_sqlite_path():
+    """Return the database path, overridable with HACK_SENECA_SQLITE_PATH"""
+    return os.getenv("HACK_SENECA_SQLITE_PATH") or os.path.join(default_users_data_dir(), "fitness.db")
+
+
+def create_schema(conn):
+    """Create the tables and (user_id, date DESC) indexes if they do not exist"""
+    conn.execute("CREATE TABLE IF NOT EXISTS users (user_id TEXT PRIMARY KEY, data TEXT NOT NULL)")
+    for dataset in ROW_DATASETS:
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {dataset} ("
+            "id INTEGER PRIMARY KEY, user_id TEXT NOT NULL, date TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{dataset}_user_date ON {dataset} (user_id, date DESC)"
+        )
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def import_json(users_data_dir=None, db_path=None):
+    """Replace the database contents with the users_data JSON files"""
+    users_data_dir = users_data_dir or default_users_data_dir()
+    db_path = db_path or default_sqlite_path()
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            create_schema(conn)
+            conn.execute("DELETE FROM users")
+            for dataset in ROW_DATASETS:
+                conn.execute(f"DELETE FROM {dataset}")
+
+            users_file = os.path.join(users_data_dir, DATASET_FILES["users"])
+            if os.path.exists(users_file):
+                print(f"📥 Importing users from {users_file}")
+                # INSERT OR IGNORE keeps the first profile per user_id, like the JSON store
+                conn.executemany(
+                    "INSERT OR IGNORE INTO users (user_id, data) VALUES (?, ?)",
+                    ((u["user_id"], json.dumps(u)) for u in iter_json_array(users_file)),
+                )
+
+            for dataset in ROW_DATASETS:
+                path = os.path.join(users_data_dir, DATASET_FILES[dataset])
+                if not os.path.exists(path):
+                    continue
+                print(f"📥 Importing {dataset} from {path}")
+                rows = ((r["user_id"], r.get("date", ""), json.dumps(r)) for r in iter_json_array(path))
+                for batch in _batched(rows, IMPORT_BATCH_SIZE):
+                    conn.executemany(
+                        f"INSERT INTO {dataset} (user_id, date, data) VALUES (?, ?, ?)", batch
+                    )
+        # Bumping user_version tells running readers the base data was replaced
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        conn.execute(f"PRAGMA user_version = {version + 1}")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    print(f"✅ SQLite database written to {db_path}")
+    return db_path
+
+
+class SQLiteUserStore:
+    """User data store reading from the SQLite database via indexed range reads"""
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or default_sqlite_path()
+        self.users_data_dir = self.db_path
+        self._local = threading.local()
+        self._subscribers = []
+        self._seen_ids = None
+        self._seen_version = None
+        self._poll_lock = threading.Lock()
+
+    def _conn(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if not os.path.exists(self.db_path):
+                raise FileNotFoundError(f"No SQLite database at {self.db_path}; run import_sqlite first")
+            conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _table(dataset):
+        if dataset not in ROW_DATASETS:
+            raise KeyError(f"Unknown dataset: {dataset}")
+        return dataset
+
+    def _max_ids(self, conn):
+        return {
+            dataset: conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {dataset}").fetchone()[0]
+            for dataset in ROW_DATASETS
+        }
+
+    def version(self):
+        """Deliver rows appended since the last call to subscribers and return the
+        import generation, which only changes when import_sqlite replaces the data"""
+        conn = self._conn()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        with self._poll_lock:
+            if version != self._seen_version or self._seen_ids is None:
+                self._seen_version = version
+                self._seen_ids = self._max_ids(conn)
+                return version
+
+            new_rows = []
+            for dataset in ROW_DATASETS:
+                cursor = conn.execute(
+                    f"SELECT id, data FROM {dataset} WHERE id > ? ORDER BY id",
+                    (self._seen_ids[dataset],),
+                )
+                for row_id, data in cursor:
+                    self._seen_ids[dataset] = row_id
+                    new_rows.append((dataset, json.loads(data)))
+
+        for dataset, record in new_rows:
+            for callback in self._subscribers:
+                callback(dataset, record)
+        return version
+
+    def subscribe(self, callback):
+        """Call ``callback(dataset, record)`` for every row appended after this point"""
+        self._subscribers.append(callback)
+
+    def append(self, dataset, records):
+        """Insert a batch of records in one transaction"""
+        from .ingest_log import validate_record
+        for record in records:
+            validate_record(dataset, record)
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO {self._table(dataset)} (user_id, date, data) VALUES (?, ?, ?)",
+                ((r["user_id"], r["date"], json.dumps(r)) for r in records),
+            )
+        self.version()
+        return len(records)
+
+    def profile(self, user_id):
+        """Return the profile dict for a user, or None"""
+        row = self._conn().execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def rows(self, dataset, user_id):
+        """Return all rows for a user sorted by date, oldest first"""
+        cursor = self._conn().execute(
+            f"SELECT data FROM {self._table(dataset)} WHERE user_id = ? ORDER BY date, id DESC",
+            (user_id,),
+        )
+        return [json.loads(data) for (data,) in cursor]
+
+    def recent(self, dataset, user_id, limit=None):
+        """Return a user's most recent rows, newest first"""
+        cursor = self._conn().execute(
+            f"SELECT data FROM {self._table(dataset)} WHERE user_id = ? "
+            "ORDER BY date DESC, id LIMIT ?",
+            (user_id, -1 if limit is None else max(limit, 0)),
+        )
+        return [json.loads(data) for (data,) in cursor]
+
+    def date_range(self, dataset, user_id, start=None, end=None, fields=None):
+        """Return a user's rows with start <= date <= end, oldest first, as an index range read"""
+        cursor = self._conn().execute(
+            f"SELECT data FROM {self._table(dataset)} WHERE user_id = ? AND date >= ? AND date <= ? "
+            "ORDER BY date, id DESC",
+            (user_id, start or "", end or "\uffff"),
+        )
+        return project((json.loads(data) for (data,) in cursor), fields)
+
+    def rows_by_user(self, dataset):
+        """Return {user_id: rows oldest first} for a whole dataset"""
+        index = {}
+        cursor = self._conn().execute(
+            f"SELECT user_id, data FROM {self._table(dataset)} ORDER BY user_id, date, id DESC"
+        )
+        for user_id, data in cursor:
+            index.setdefault(user_id, []).append(json.loads(data))
+        return index
+
+    def count(self, dataset, user_id):
+        """Return the number of rows a user has in a dataset"""
+        row = self._conn().execute(
+            f"SELECT COUNT(*) FROM {self._table(dataset)} WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return row[0]
+
+    def user_count(self):
+        """Return the number of user profiles in the store"""
+        return self._conn().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import users_data/*.json into the SQLite backend")
+    parser.add_argument("--users-data-dir", default=None)
+    parser.add_argument("--db", default=None, help="Database path (default: users_data/fitness.db)")
+    args = parser.parse_args(argv)
+    import_json(args.users_data_dir, args.db)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Incremental parsing of large top-level JSON arrays.
+
+The users_data files are a single JSON array of flat records. For multi-GB
+files (fitness-measurements.json in production) json.load has to materialize
+every row before we can filter by user, so instead we decode one element at a
+time from a bounded read buffer and keep only the rows we need.
+"""
+import heapq
+import json
+
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(path, chunk_size=CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array one at a time"""
+    decoder = json.JSONDecoder()
+    with open(path, "r") as f:
+        buf = ""
+        pos = 0
+        eof = False
+        started = False
+
+        while True:
+            # Skip separators between elements
+            while pos < len(buf) and buf[pos] in _WHITESPACE + ",":
+                if buf[pos] == "," and not started:
+                    raise ValueError(f"{path}: expected '[' at start of file")
+                pos += 1
+
+            if pos >= len(buf):
+                if eof:
+                    raise ValueError(f"{path}: unexpected end of JSON array")
+                buf = f.read(chunk_size)
+                pos = 0
+                eof = not buf
+                continue
+
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"{path}: expected '[' at start of file")
+                started = True
+                pos += 1
+                continue
+
+            if buf[pos] == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The element straddles the buffer boundary: drop what we have
+                # already consumed and read the next chunk
+                more = f.read(chunk_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+
+            # A number at the very end of the buffer may have been cut short
+            if end == len(buf) and not eof and not isinstance(item, (dict, list, str)):
+                more = f.read(chunk_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+
+            yield item
+            pos = end
+
+
+def scan_user_rows(path, user_id, limit=None, chunk_size=CHUNK_SIZE):
+    """Stream a dataset file and keep one user's rows.
+
+    Returns ``(rows, total)`` where ``rows`` is newest first and holds at most
+    ``limit`` rows (all of them when ``limit`` is None), and ``total`` is the
+    number of rows the user has in the file. Memory stays bounded by the read
+    buffer plus ``limit`` rows.
+    """
+    total = 0
+    if limit is None:
+        rows = []
+        for record in iter_json_array(path, chunk_size):
+            if record.get("user_id") == user_id:
+                rows.append(record)
+                total += 1
+        rows.sort(key=lambda r: r.get("date", ""), reverse=True)
+        return rows, total
+
+    # Min-heap of the newest `limit` rows; the negated sequence number keeps
+    # the comparison away from the dicts and prefers earlier rows on date ties,
+    # matching a stable sort of the whole file
+    heap = []
+    for seq, record in enumerate(iter_json_array(path, chunk_size)):
+        if record.get("user_id") != user_id:
+            continue
+        total += 1
+        if limit <= 0:
+            continue
+        entry = (record.get("date", ""), -seq, record)
+        if len(heap) < limit:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+
+    heap.sort(key=lambda e: e[:2], reverse=True)
+    return [record for _, _, record in heap], total
+
+
+class JSONArrayWriter:
+    """Write records one at a time as a JSON array in the users_data indent=2 layout"""
+
+    def __init__(self, f):
+        self.f = f
+        self.count = 0
+        f.write("[")
+
+    def write(self, record):
+        body = json.dumps(record, indent=2).replace("\n", "\n  ")
+        self.f.write(("\n  " if not self.count else ",\n  ") + body)
+        self.count += 1
+
+    def close(self):
+        self.f.write("\n]" if self.count else "]")
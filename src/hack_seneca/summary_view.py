@@ -0,0 +1,227 @@
+"""Incrementally maintained per-user summary view.
+
+load_user_data used to rebuild the summary strings from raw rows on every
+login. The view keeps, per user, the newest rows of each dataset in a small
+fixed-size window together with running sums of the averaged fields, so a new
+activity, nutrition or measurement record is folded in with O(1) work and the
+chat prompt inputs are read straight from the view.
+
+Entries are hydrated lazily from the data store, kept in an LRU bounded by
+HACK_SENECA_SUMMARY_MAX_USERS, and dropped when the store reloads its base
+data. Rows appended through the store are delivered to apply() as they appear.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from .data_store import get_data_store
+
+# Window sizes match the "last N entries" load_user_data has always shown
+WINDOWS = {
+    "activities": (7, ("steps", "calories_burned")),
+    "measurements": (5, ()),
+    "nutrition": (7, ("calories_consumed", "protein_g")),
+}
+
+MAX_USERS = int(os.getenv("HACK_SENECA_SUMMARY_MAX_USERS", "100000"))
+
+
+class _Window:
+    """Newest rows of one dataset, newest first, with running sums of tracked fields"""
+
+    __slots__ = ("size", "fields", "rows", "sums")
+
+    def __init__(self, size, fields, rows=()):
+        self.size = size
+        self.fields = fields
+        self.rows = list(rows)[:size]
+        self.sums = {field: sum(row[field] for row in self.rows) for field in fields}
+
+    def add(self, row):
+        """Fold a new record into the window; returns False if it is too old to matter"""
+        date = row.get("date", "")
+        rows = self.rows
+        # New records go after existing rows with the same date, matching a
+        # stable newest-first sort of the file with the record appended
+        i = 0
+        while i < len(rows) and rows[i].get("date", "") >= date:
+            i += 1
+        if i >= self.size:
+            return False
+
+        rows.insert(i, row)
+        for field in self.fields:
+            self.sums[field] += row[field]
+        if len(rows) > self.size:
+            dropped = rows.pop()
+            for field in self.fields:
+                self.sums[field] -= dropped[field]
+        return True
+
+    def mean(self, field):
+        return self.sums[field] / len(self.rows) if self.rows else None
+
+
+def format_profile(profile):
+    return (
+        f"Age: {profile['age']}, Weight: {profile['weight']}kg, Height: {profile['height']}cm, "
+        f"BMI: {profile['bmi']}, Fitness Level: {profile['fitness_level']}, Goals: {profile['goals']}"
+    )
+
+
+class UserSummary:
+    """Materialized summary of one user's profile and recent data"""
+
+    __slots__ = ("user_id", "profile", "windows")
+
+    def __init__(self, user_id, profile, windows):
+        self.user_id = user_id
+        self.profile = profile
+        self.windows = windows
+
+    def recent(self, dataset):
+        """Return the windowed recent rows of a dataset, newest first"""
+        return list(self.windows[dataset].rows)
+
+    def summary(self):
+        """Return the summary dict load_user_data exposes"""
+        summary = {}
+        if self.profile:
+            summary["profile"] = format_profile(self.profile)
+
+        activities = self.windows["activities"]
+        if activities.rows:
+            summary["activities"] = (
+                f"Recent avg: {activities.mean('steps'):.0f} steps/day, "
+                f"{activities.mean('calories_burned'):.0f} calories burned/day"
+            )
+
+        measurements = self.windows["measurements"].rows
+        if len(measurements) >= 2:
+            latest, previous = measurements[0], measurements[1]
+            weight_change = latest["weight"] - previous["weight"]
+            summary["measurements"] = (
+                f"Latest: {latest['weight']}kg, {latest['body_fat']}% body fat. "
+                f"Weight change: {weight_change:+.1f}kg since last measurement"
+            )
+
+        nutrition = self.windows["nutrition"]
+        if nutrition.rows:
+            summary["nutrition"] = (
+                f"Recent avg: {nutrition.mean('calories_consumed'):.0f} calories/day, "
+                f"{nutrition.mean('protein_g'):.0f}g protein/day"
+            )
+        return summary
+
+
+class SummaryView:
+    """LRU of per-user summaries, hydrated from the data store and updated per record"""
+
+    def __init__(self, store=None, max_users=MAX_USERS):
+        self._store = store
+        self._subscribed = None
+        self.max_users = max_users
+        self._entries = OrderedDict()
+        self._hydrating = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    @property
+    def store(self):
+        store = self._store or get_data_store()
+        if self._subscribed is not store:
+            # Rows appended through the store (from any process) are folded in as they appear
+            store.subscribe(self.apply)
+            self._subscribed = store
+        return store
+
+    def _check_version(self):
+        # Reloading base data from disk invalidates every materialized entry
+        version = self.store.version()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+
+    def _hydrate(self, user_id):
+        store = self.store
+        windows = {
+            dataset: _Window(size, fields, store.recent(dataset, user_id, size))
+            for dataset, (size, fields) in WINDOWS.items()
+        }
+        return UserSummary(user_id, store.profile(user_id), windows)
+
+    def get(self, user_id):
+        """Return the UserSummary for a user, hydrating it on a miss"""
+        self._check_version()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+                return entry
+            # [in-flight hydrations, whether a record arrived meanwhile]
+            self._hydrating.setdefault(user_id, [0, False])[0] += 1
+
+        try:
+            entry = self._hydrate(user_id)
+        except Exception:
+            with self._lock:
+                self._release(user_id)
+            raise
+
+        with self._lock:
+            stale = self._release(user_id)
+            if stale:
+                # A record for this user arrived while we read the store; it may
+                # or may not be in this snapshot, so serve it without caching it
+                return entry
+            entry = self._entries.setdefault(user_id, entry)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _release(self, user_id):
+        """Finish one hydration of a user; returns True if it raced with an update"""
+        state = self._hydrating[user_id]
+        state[0] -= 1
+        if state[0] == 0:
+            del self._hydrating[user_id]
+        return state[1]
+
+    def apply(self, dataset, record):
+        """Fold a newly ingested record into the user's summary, if it is materialized"""
+        user_id = record["user_id"]
+        with self._lock:
+            state = self._hydrating.get(user_id)
+            if state is not None:
+                state[1] = True
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return False  # hydrated from the store on the next read
+            if dataset == "users":
+                entry.profile = record
+                return True
+            return entry.windows[dataset].add(record)
+
+    def invalidate(self, user_id=None):
+        """Drop one user's summary, or all of them"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+
+_view = None
+_view_lock = threading.Lock()
+
+
+def get_summary_view():
+    """Return the process-wide summary view"""
+    global _view
+    if _view is None:
+        with _view_lock:
+            if _view is None:
+                _view = SummaryView()
+    return _view
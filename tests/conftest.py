@@ -0,0 +1,22 @@
+import os
+
+import pytest
+
+# API tests import crewai; keep its telemetry from reaching the network
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+
+
+class Clock:
+    """Settable stand-in for time.time"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
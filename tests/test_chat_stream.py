@@ -0,0 +1,103 @@
+import asyncio
+import json
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from hack_seneca import api_server
+from hack_seneca.chat_stream import _emit
+from hack_seneca.conversations import NEW_CONVERSATION
+from hack_seneca.kickoff_executor import KickoffExecutor
+from hack_seneca.metrics import Metrics
+from hack_seneca.singleflight import SingleFlight
+
+
+class FakeSessions:
+    def get(self, token):
+        return SimpleNamespace(user_id="user_1") if token == "token" else None
+
+    def user_data(self, session):
+        return {"profile": {"name": "Ana"}}
+
+
+class FakeConversations:
+    def __init__(self):
+        self.appended = []
+
+    def context(self, user_id):
+        return NEW_CONVERSATION
+
+    def append(self, user_id, message, reply):
+        self.appended.append((user_id, message, reply))
+
+
+class FakeCrew:
+    """Emits one token, then blocks until released"""
+
+    def __init__(self):
+        self.kickoffs = 0
+        self.release = threading.Event()
+
+    def kickoff(self, inputs, stream=False, route=None, profile=None):
+        self.kickoffs += 1
+        _emit({"type": "token", "chunk": "Hello"})
+        assert self.release.wait(5)
+        return "Hello there"
+
+
+class FakePool:
+    def __init__(self, crew):
+        self.crew = crew
+
+    @contextmanager
+    def checkout(self):
+        yield self.crew
+
+
+@pytest.fixture
+def server(monkeypatch):
+    crew = FakeCrew()
+    conversations = FakeConversations()
+    flights = SingleFlight("test", metrics=Metrics())
+    executor = KickoffExecutor(workers=2, queue_depth=4, per_user=4, metrics=Metrics())
+    monkeypatch.setattr(api_server, "get_session_store", lambda: FakeSessions())
+    monkeypatch.setattr(api_server, "get_conversation_store", lambda: conversations)
+    monkeypatch.setattr(api_server, "get_response_cache", lambda: None)
+    monkeypatch.setattr(api_server, "get_crew_pool", lambda: FakePool(crew))
+    monkeypatch.setattr(api_server, "get_kickoff_executor", lambda: executor)
+    monkeypatch.setattr(api_server, "get_chat_single_flight", lambda: flights)
+    yield SimpleNamespace(crew=crew, conversations=conversations, flights=flights)
+    crew.release.set()
+
+
+async def read_events(response):
+    body = "".join([chunk async for chunk in response.body_iterator])
+    return [json.loads(block.split("data: ", 1)[1]) for block in body.strip().split("\n\n")]
+
+
+def test_concurrent_identical_stream_requests_share_one_kickoff(server):
+    request = api_server.ChatRequest(user_id="user_1", session_token="token",
+                                     message="Plan my  workout for tomorrow")
+    duplicate = request.model_copy(update={"message": "Plan my workout for tomorrow"})
+
+    async def main():
+        leader = await api_server.api_chat_stream(request)
+        follower = await api_server.api_chat_stream(duplicate)
+        assert server.flights.in_flight() == 1
+        readers = [asyncio.ensure_future(read_events(r)) for r in (leader, follower)]
+        await asyncio.sleep(0.05)
+        server.crew.release.set()
+        return await asyncio.gather(*readers)
+
+    streams = asyncio.run(main())
+    assert server.crew.kickoffs == 1
+    for events in streams:
+        types = [event["type"] for event in events]
+        assert types == ["intent", "token", "final"]
+        assert events[-1]["response"] == "Hello there"
+    assert server.conversations.appended == [("user_1", "Plan my  workout for tomorrow", "Hello there")]
+    counters = server.flights._metrics.snapshot()["counters"]
+    assert (counters["test.leaders"], counters["test.coalesced"]) == (1, 1)
+    assert server.flights.in_flight() == 0
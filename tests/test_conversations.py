@@ -0,0 +1,80 @@
+import pytest
+
+from hack_seneca.conversations import NEW_CONVERSATION, ConversationStore
+from hack_seneca.metrics import Metrics
+
+
+class WordCounter:
+    """Deterministic stand-in for tiktoken: one token per whitespace-separated word"""
+
+    def count(self, text):
+        return len(text.split())
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    return ConversationStore(
+        str(tmp_path / "conversations.db"), budget=120, ttl=3600, counter=WordCounter(), metrics=Metrics(),
+        clock=clock,
+    )
+
+
+def exchange(i, words=8):
+    question = f"Question {i} about my training plan. " + "detail " * words
+    reply = f"Answer {i} with advice. " + "more " * words
+    return question, reply
+
+
+def test_new_user_gets_the_new_conversation_line(store):
+    assert store.context("user_00001") == NEW_CONVERSATION
+
+
+def test_history_stays_within_budget_and_keeps_newest_exchange(store):
+    counter = WordCounter()
+    for i in range(40):
+        store.append("user_00001", *exchange(i))
+        assert counter.count(store.context("user_00001")) <= store.budget
+
+    context = store.context("user_00001")
+    question, reply = exchange(39)
+    assert f"User: {question.strip()}" in context
+    assert f"Assistant: {reply.strip()}" in context
+    assert context.startswith("Earlier in this conversation:")
+    # Folded exchanges become one summary line each, and the oldest are dropped
+    assert "- User: Question 38" not in context
+    assert "Question 0 " not in context
+
+
+def test_long_turns_are_clipped(store):
+    store.append("user_00001", "word " * 1000, "reply " * 1000)
+    context = store.context("user_00001")
+    assert WordCounter().count(context) <= store.budget
+    assert "..." in context
+
+
+def test_users_are_separate_and_clear_forgets(store):
+    store.append("user_00001", "Hi", "Hello")
+    assert store.context("user_00002") == NEW_CONVERSATION
+    assert store.clear("user_00001")
+    assert store.context("user_00001") == NEW_CONVERSATION
+    assert not store.clear("user_00001")
+
+
+def test_idle_conversations_expire(store, clock):
+    store.append("user_00001", "Hi", "Hello")
+    clock.now += 3601
+    assert store.context("user_00001") == NEW_CONVERSATION
+    assert store.purge() == 1
+
+
+def test_long_turns_and_headers_fit_the_budget(store):
+    counter = WordCounter()
+    for i in range(6):
+        # One long sentence each, so the summary lines are long too
+        question = f"Question {i} " + " ".join(f"about{j}" for j in range(58))
+        reply = f"Answer {i} " + " ".join(f"advice{j}" for j in range(58))
+        store.append("user_00001", question, reply)
+        context = store.context("user_00001")
+        assert counter.count(context) <= store.budget
+        assert f"User: Question {i} " in context
+        assert f"Assistant: Answer {i} " in context
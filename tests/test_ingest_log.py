@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from hack_seneca.data_store import JSONUserStore
+from hack_seneca.ingest_log import GroupCommitLog, compact, default_log_dir, log_path, read_log, validate_record
+
+
+def activity(**fields):
+    record = {
+        "user_id": "user_00001", "date": "2025-03-01", "steps": 8000, "calories_burned": 420,
+        "active_minutes": 45, "distance_km": 6.2, "heart_rate_avg": 118, "workout_duration": 40,
+    }
+    record.update(fields)
+    return record
+
+
+def test_valid_record_passes():
+    validate_record("activities", activity())
+
+
+@pytest.mark.parametrize("value", ["yesterday", "2025-13-01", "2025-02-30", "2025-3-1", "20250301", "", None, 20250301])
+def test_bad_dates_are_rejected(value):
+    with pytest.raises(ValueError, match="date"):
+        validate_record("activities", activity(date=value))
+
+
+def test_missing_numeric_field_is_rejected():
+    record = activity()
+    del record["steps"]
+    with pytest.raises(ValueError, match="steps"):
+        validate_record("activities", record)
+
+
+@pytest.mark.parametrize("value", ["8000", None, True, [8000]])
+def test_non_numeric_field_is_rejected(value):
+    with pytest.raises(ValueError, match="steps"):
+        validate_record("activities", activity(steps=value))
+
+
+def test_each_dataset_requires_its_own_fields():
+    with pytest.raises(ValueError, match="calories_consumed"):
+        validate_record("nutrition", {"user_id": "user_00001", "date": "2025-03-01"})
+    with pytest.raises(ValueError, match="weight"):
+        validate_record("measurements", {"user_id": "user_00001", "date": "2025-03-01"})
+
+
+def test_unknown_dataset_and_missing_user_are_rejected():
+    with pytest.raises(ValueError, match="Unknown dataset"):
+        validate_record("sleep", activity())
+    with pytest.raises(ValueError, match="user_id"):
+        validate_record("activities", activity(user_id=""))
+
+
+def test_invalid_batch_writes_nothing(tmp_path):
+    log = GroupCommitLog(str(tmp_path))
+    with pytest.raises(ValueError):
+        log.append("activities", [activity(), activity(date="yesterday")])
+    assert not os.path.exists(log_path(str(tmp_path), "activities"))
+
+    assert log.append("activities", [activity(), activity(date="2025-03-02")]) == 2
+    with open(log_path(str(tmp_path), "activities")) as f:
+        assert len(f.readlines()) == 2
+
+
+def test_stale_reader_after_compaction_reads_only_new_records(tmp_path):
+    log = GroupCommitLog(str(tmp_path / "ingest_log"))
+    path = log_path(log.log_dir, "activities")
+    log.append("activities", [activity(date=f"2025-03-{day:02d}") for day in range(1, 4)])
+    _, stale = read_log(path)
+
+    compact(str(tmp_path), log.log_dir)
+    # Grow the new log well past the stale reader's offset
+    fresh = [activity(date=f"2025-04-{day:02d}", steps=day) for day in range(1, 11)]
+    log.append("activities", fresh)
+    assert os.path.getsize(path) > stale[1]
+
+    records, _ = read_log(path, stale)
+    assert records == fresh
+
+
+def test_store_tailing_the_log_survives_compaction(tmp_path):
+    store = JSONUserStore(str(tmp_path))
+    store.append("activities", [activity(date=f"2025-03-{day:02d}") for day in range(1, 4)])
+    assert len(store.rows("activities", "user_00001")) == 3
+
+    compact(str(tmp_path))
+    GroupCommitLog(default_log_dir(str(tmp_path))).append(
+        "activities", [activity(date=f"2025-04-{day:02d}") for day in range(1, 11)]
+    )
+    rows = store.rows("activities", "user_00001")
+    assert len(rows) == 13
+    assert [row["date"] for row in rows] == sorted(row["date"] for row in rows)
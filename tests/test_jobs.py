@@ -0,0 +1,68 @@
+import pytest
+
+from hack_seneca.jobs import JobQueue, QueueFull
+
+
+@pytest.fixture
+def jobs(tmp_path, clock):
+    return JobQueue(str(tmp_path / "jobs.db"), max_queued=3, lease=60, max_attempts=2, clock=clock)
+
+
+def test_claims_oldest_job_once(jobs, clock):
+    first = jobs.submit("user_00001", {"message": "a"})
+    clock.now += 1
+    second = jobs.submit("user_00002", {"message": "b"})
+
+    job = jobs.claim("w1")
+    assert job["id"] == first
+    assert job["payload"] == {"message": "a"}
+    assert job["attempts"] == 1
+    assert jobs.claim("w2")["id"] == second
+    assert jobs.claim("w3") is None
+
+
+def test_complete_stores_result_for_the_lease_holder_only(jobs):
+    job_id = jobs.submit("user_00001", {})
+    jobs.claim("w1")
+    assert not jobs.complete(job_id, "w2", "stolen")
+    assert jobs.complete(job_id, "w1", "reply")
+    job = jobs.get(job_id)
+    assert (job["status"], job["result"]) == ("done", "reply")
+    assert not jobs.complete(job_id, "w1", "again")
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(jobs, clock):
+    job_id = jobs.submit("user_00001", {})
+    jobs.claim("w1")
+    clock.now += 30
+    assert jobs.claim("w2") is None
+
+    clock.now += 31
+    job = jobs.claim("w2")
+    assert (job["id"], job["worker"], job["attempts"]) == (job_id, "w2", 2)
+    # The first worker lost the job and can no longer finish it
+    assert not jobs.complete(job_id, "w1", "late")
+    assert jobs.complete(job_id, "w2", "reply")
+
+
+def test_job_fails_after_max_attempts(jobs, clock):
+    job_id = jobs.submit("user_00001", {})
+    jobs.claim("w1")
+    clock.now += 61
+    jobs.claim("w2")
+    clock.now += 61
+    assert jobs.claim("w3") is None
+    job = jobs.get(job_id)
+    assert job["status"] == "failed"
+    assert "stopped responding" in job["error"]
+
+
+def test_queue_is_bounded(jobs):
+    for _ in range(3):
+        jobs.submit("user_00001", {})
+    with pytest.raises(QueueFull):
+        jobs.submit("user_00001", {})
+    # A cached reply is stored as done and does not count against the bound
+    job_id = jobs.submit("user_00001", {}, result="cached")
+    assert jobs.get(job_id)["status"] == "done"
+    assert jobs.stats()["queued"] == 3
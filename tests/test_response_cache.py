@@ -0,0 +1,52 @@
+import pytest
+
+from hack_seneca.conversations import ConversationStore
+from hack_seneca.metrics import Metrics
+from hack_seneca.response_cache import ResponseCache
+from hack_seneca.shared_state import MemoryStateBackend
+
+
+@pytest.fixture
+def conversations(tmp_path, clock):
+    return ConversationStore(str(tmp_path / "conversations.db"), metrics=Metrics(), clock=clock)
+
+
+@pytest.fixture
+def cache(clock):
+    return ResponseCache(state=MemoryStateBackend(), metrics=Metrics(), clock=clock)
+
+
+def inputs(conversations, message):
+    return {
+        "user_message": message,
+        "user_id": "user_00001",
+        "user_profile": {"fitness_level": "beginner", "goals": "lose weight", "age": 30, "bmi": 27.0},
+        "context": conversations.context("user_00001"),
+    }
+
+
+def ask(cache, conversations, message, reply):
+    """One chat turn: look the message up, store the crew's reply on a miss, record the exchange"""
+    turn = inputs(conversations, message)
+    cached = cache.lookup(turn, "balanced")
+    if cached is None:
+        cache.store(turn, reply, "balanced")
+    conversations.append("user_00001", message, cached[0] if cached else reply)
+    return cached
+
+
+def test_repeated_question_in_one_conversation_hits(cache, conversations):
+    assert ask(cache, conversations, "Give me a 3 day workout plan", "Day 1: squats") is None
+    assert ask(cache, conversations, "How much protein should I eat?", "About 120 g") is None
+
+    # The history has grown by two exchanges since the first ask
+    assert ask(cache, conversations, "give me a 3 day workout plan", "unused") == ("Day 1: squats", 1.0)
+    counters = cache._metrics.snapshot()["counters"]
+    assert (counters["response_cache.hits"], counters["response_cache.misses"]) == (1, 2)
+
+
+def test_follow_ups_skip_the_cache(cache, conversations):
+    ask(cache, conversations, "Give me a 3 day workout plan", "Day 1: squats")
+    assert ask(cache, conversations, "Make it shorter", "Day 1: squats, 20 minutes") is None
+    assert ask(cache, conversations, "Make it shorter", "Day 1: squats, 15 minutes") is None
+    assert cache._metrics.snapshot()["counters"]["response_cache.follow_ups"] == 2
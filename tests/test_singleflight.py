@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from hack_seneca.metrics import Metrics
+from hack_seneca.singleflight import SingleFlight
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_identical_calls_share_one_run():
+    async def main():
+        flights = SingleFlight("test", metrics=Metrics())
+        calls = []
+        release = asyncio.Event()
+
+        async def work():
+            calls.append(1)
+            await release.wait()
+            return "reply"
+
+        callers = [asyncio.ensure_future(flights.do("user:hi", work)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert flights.in_flight() == 1
+        release.set()
+        results = await asyncio.gather(*callers)
+        return calls, results, flights
+
+    calls, results, flights = run(main())
+    assert calls == [1]
+    assert results == ["reply"] * 5
+    assert flights.in_flight() == 0
+    counters = flights._metrics.snapshot()["counters"]
+    assert (counters["test.leaders"], counters["test.coalesced"]) == (1, 4)
+
+
+def test_different_keys_and_later_calls_run_separately():
+    async def main():
+        flights = SingleFlight("test", metrics=Metrics())
+        calls = []
+
+        async def work(key):
+            calls.append(key)
+            await asyncio.sleep(0)
+            return key
+
+        await asyncio.gather(flights.do("a", lambda: work("a")), flights.do("b", lambda: work("b")))
+        await flights.do("a", lambda: work("a"))
+        return calls
+
+    assert run(main()) == ["a", "b", "a"]
+
+
+def test_exception_reaches_every_caller():
+    async def main():
+        flights = SingleFlight("test", metrics=Metrics())
+
+        async def work():
+            await asyncio.sleep(0)
+            raise RuntimeError("crew failed")
+
+        return await asyncio.gather(*(flights.do("k", work) for _ in range(3)), return_exceptions=True)
+
+    results = run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_run():
+    async def main():
+        flights = SingleFlight("test", metrics=Metrics())
+        release = asyncio.Event()
+        finished = []
+
+        async def work():
+            await release.wait()
+            finished.append(1)
+            return "reply"
+
+        first = asyncio.ensure_future(flights.do("k", work))
+        second = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        release.set()
+        return await second, finished, flights.in_flight()
+
+    assert run(main()) == ("reply", [1], 0)
+
+
+def test_run_finishes_even_if_every_caller_leaves():
+    async def main():
+        flights = SingleFlight("test", metrics=Metrics())
+        finished = asyncio.Event()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            finished.set()
+            return "reply"
+
+        caller = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.wait_for(finished.wait(), 1)
+        await asyncio.sleep(0)
+        return flights.in_flight()
+
+    assert run(main()) == 0
@@ -0,0 +1,107 @@
+import json
+
+import numpy as np
+import pytest
+
+from hack_seneca.data_store import JSONUserStore
+from hack_seneca.sessions import SessionStore
+from hack_seneca.shared_state import MemoryStateBackend
+from hack_seneca.sketches import CohortSketches, KLLSketch
+from hack_seneca.summary_view import SummaryView
+
+
+def rank_error(values, sketch, q):
+    """Distance between q and the true rank of the sketch's q-quantile"""
+    estimate = sketch.quantile(q)
+    return abs(np.searchsorted(values, estimate, side="right") / len(values) - q)
+
+
+@pytest.mark.parametrize("distribution", ["normal", "lognormal", "uniform"])
+def test_quantiles_track_numpy_percentile(distribution):
+    rng = np.random.default_rng(7)
+    values = getattr(rng, distribution)(size=50_000)
+    sketch = KLLSketch(seed=1)
+    for value in values:
+        sketch.update(float(value))
+
+    values.sort()
+    assert sketch.n == len(values)
+    assert len(sketch._sorted_items()[0]) < 2_000
+    for q in (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99):
+        assert rank_error(values, sketch, q) < 0.02
+        # Rank and quantile agree with numpy's percentile to the same tolerance
+        assert abs(sketch.rank(float(np.percentile(values, q * 100))) - q) < 0.02
+
+
+def test_merged_sketches_match_the_union():
+    rng = np.random.default_rng(11)
+    parts = [rng.normal(loc, 1.0, size=10_000) for loc in (0.0, 3.0, 6.0)]
+    merged = KLLSketch(seed=2)
+    for i, part in enumerate(parts):
+        sketch = KLLSketch(seed=10 + i)
+        for value in part:
+            sketch.update(float(value))
+        merged.merge(sketch)
+
+    values = np.sort(np.concatenate(parts))
+    assert merged.n == len(values)
+    for q in (0.1, 0.5, 0.9):
+        assert rank_error(values, merged, q) < 0.02
+
+
+def test_empty_sketch_has_no_quantiles():
+    sketch = KLLSketch()
+    assert sketch.quantile(0.5) is None
+    assert sketch.rank(1.0) is None
+
+
+@pytest.fixture
+def population(tmp_path):
+    """A users_data directory with two users in one cohort and three days of activities each"""
+    users = [
+        {"user_id": f"user_0000{i}", "age": 30, "weight": 70.0, "height": 175, "bmi": 22.9,
+         "fitness_level": "intermediate", "goals": "endurance"}
+        for i in (1, 2)
+    ]
+    activities = [
+        {"user_id": f"user_0000{i}", "date": f"2025-03-0{day}", "steps": 1000 * i * day, "calories_burned": 100 * day,
+         "active_minutes": 30, "distance_km": 1.0, "heart_rate_avg": 110, "workout_duration": 30}
+        for i in (1, 2) for day in (1, 2, 3)
+    ]
+    for name, rows in (("users", users), ("activities", activities), ("measurements", []), ("nutrition", [])):
+        (tmp_path / f"fitness-{name}.json").write_text(json.dumps(rows))
+    store = JSONUserStore(str(tmp_path))
+    return store, CohortSketches(store, view=SummaryView(store))
+
+
+def test_percentiles_rank_the_latest_record(population):
+    _, sketches = population
+    steps = sketches.percentiles("user_00001")["metrics"]["steps"]
+    # The latest record (3000 steps) is compared with the six single-day records
+    assert (steps["value"], steps["date"], steps["cohort_size"]) == (3000, "2025-03-03", 6)
+    assert steps["cohort_percentile"] == pytest.approx(100 * 4 / 6, abs=0.1)
+
+
+def test_unknown_user_has_no_percentiles(population):
+    _, sketches = population
+    assert sketches.percentiles("user_99999") is None
+
+
+def test_percentile_endpoint_requires_the_users_session_and_404s_unknown_users(population, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from hack_seneca import api_server
+
+    store, sketches = population
+    sessions = SessionStore(loader=lambda user_id: {}, store=store, state=MemoryStateBackend())
+    monkeypatch.setattr(api_server, "get_session_store", lambda: sessions)
+    monkeypatch.setattr(api_server, "get_cohort_sketches", lambda: sketches)
+    client = TestClient(api_server.app)
+    token = sessions.create("user_00001").token
+    stranger = sessions.create("user_99999").token
+
+    assert client.get("/api/users/user_00001/percentiles").status_code == 401
+    assert client.get("/api/users/user_00002/percentiles", params={"session_token": token}).status_code == 401
+    assert client.get("/api/users/user_00001/percentiles", params={"session_token": token}).status_code == 200
+    response = client.get("/api/users/user_99999/percentiles", params={"session_token": stranger})
+    assert response.status_code == 404